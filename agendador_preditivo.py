@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Agendamento preditivo do controle automático da bomba
+No modo polling o controle consulta a API a cada 3 ciclos, esteja a umidade
+em 31% ou em 60%. Aqui cada device tem a taxa de secagem (bomba desligada) e
+a de molhagem (bomba ligada) estimadas pelas leituras recentes; com elas o
+agendador prevê quando o limiar que importa (30% com a bomba desligada, 70%
+com ela ligada) vai ser cruzado e marca a próxima avaliação para esse
+instante, numa fila de prioridade (heapq) única para a frota. Longe do
+limiar um device custa uma avaliação a cada `intervalo_max`; uma leitura que
+já cruzou o limiar é avaliada na hora.
+
+    python agendador_preditivo.py   # compara com a cadência fixa no modelo físico
+"""
+
+import heapq
+import itertools
+import math
+import time
+
+from controle_bomba import ControleHisterese
+from histograma import HistogramaLatencia
+
+class _EstadoDispositivo:
+    """Regressão linear com peso exponencial (no tempo) sobre o trecho atual da bomba
+
+    As somas ficam com o tempo relativo à leitura mais recente (t = 0), então o
+    intercepto é o nível suavizado de agora e a inclinação, a taxa em %/s.
+    """
+
+    __slots__ = ("tempo", "bomba", "ultima", "s0", "st", "stt", "su", "suu", "stu", "taxas",
+                 "ultima_avaliacao", "vencimento", "entrada", "em_avaliacao", "cruzou_em")
+
+    def __init__(self):
+        self.tempo = None
+        self.bomba = None
+        self.ultima = None
+        self.s0 = self.st = self.stt = self.su = self.suu = self.stu = 0.0
+        # Última taxa estimada em cada estado da bomba: vale como palpite no começo de um trecho
+        self.taxas = [None, None]
+        self.ultima_avaliacao = None
+        self.vencimento = None
+        self.entrada = None
+        self.em_avaliacao = False
+        self.cruzou_em = None
+
+    def adicionar(self, agora, umidade, bomba, janela):
+        if self.tempo is not None and bomba == self.bomba and agora >= self.tempo:
+            dt = agora - self.tempo
+            decaimento = math.exp(-dt / janela)
+            self.stt = decaimento * (self.stt - 2 * dt * self.st + dt * dt * self.s0)
+            self.stu = decaimento * (self.stu - dt * self.su)
+            self.st = decaimento * (self.st - dt * self.s0)
+            self.s0 *= decaimento
+            self.su *= decaimento
+            self.suu *= decaimento
+        else:
+            # Bomba mudou (ou relógio voltou): outra reta a partir daqui
+            if self.bomba is not None:
+                ajuste = self.ajuste()
+                if ajuste is not None:
+                    self.taxas[self.bomba] = ajuste[1]
+            self.s0 = self.st = self.stt = self.su = self.suu = self.stu = 0.0
+        self.s0 += 1.0
+        self.su += umidade
+        self.suu += umidade * umidade
+        self.tempo = agora
+        self.bomba = bomba
+        self.ultima = umidade
+
+    def ajuste(self, min_amostras=3):
+        """(nível agora, taxa %/s, erro padrão da taxa, desvio das leituras) ou None"""
+        if self.s0 < min_amostras:
+            return None
+        variancia_t = self.stt - self.st * self.st / self.s0
+        if variancia_t <= 1e-9:
+            return None
+        taxa = (self.stu - self.st * self.su / self.s0) / variancia_t
+        nivel = (self.su - taxa * self.st) / self.s0
+        residuo = self.suu - self.su * self.su / self.s0 - taxa * (self.stu - self.st * self.su / self.s0)
+        desvio = math.sqrt(max(0.0, residuo) / max(1.0, self.s0 - 2))
+        return nivel, taxa, desvio / math.sqrt(variancia_t), desvio
+
+class AgendadorPreditivo:
+    """Fila de prioridade com a próxima avaliação do controle de cada device
+
+    - `observar(device_id, agora, umidade, bomba)` a cada leitura (sem rede);
+    - `devido(device_id, agora)` num loop por device, ou `vencidos(agora)` para
+      retirar da fila todos os devices a avaliar;
+    - `avaliado(device_id, agora)` depois de cada avaliação.
+
+    A folga até o limiar desconta `margem` pontos e `desvios` desvios-padrão do
+    ruído das leituras; o tempo até o cruzamento usa a taxa acrescida de
+    `desvios` erros padrão e só `fracao` dele é esperado. Entre duas avaliações
+    passam de `intervalo_min` a `intervalo_max` segundos, exceto quando uma
+    leitura já cruzou o limiar.
+    """
+
+    def __init__(self, controle=None, intervalo_min=15.0, intervalo_max=600.0, janela=900.0,
+                 margem=1.0, desvios=3.0, fracao=0.8, min_amostras=5):
+        self.controle = controle or ControleHisterese()
+        self.intervalo_min = intervalo_min
+        self.intervalo_max = intervalo_max
+        self.janela = janela
+        self.margem = margem
+        self.desvios = desvios
+        self.fracao = fracao
+        self.min_amostras = min_amostras
+
+        self.dispositivos = {}
+        self._fila = []
+        self._sequencia = itertools.count()
+        self.observacoes = 0
+        self.avaliacoes = 0
+        self.avaliacoes_cruzamento = 0
+        # Do primeiro cruzamento observado até a avaliação que o trata
+        self.resposta = HistogramaLatencia()
+
+    def _limiar(self, bomba):
+        return self.controle.limiar_desativacao if bomba else self.controle.limiar_ativacao
+
+    def _previsao(self, estado, agora):
+        """Instante previsto para a próxima avaliação (antes dos limites mín./máx.)"""
+        if self.controle.decidir(estado.ultima, estado.bomba):
+            return agora
+        ajuste = estado.ajuste(self.min_amostras)
+        if ajuste is not None:
+            nivel, taxa, erro_taxa, desvio = ajuste
+        elif estado.taxas[estado.bomba] is not None:
+            nivel, taxa, erro_taxa, desvio = estado.ultima, estado.taxas[estado.bomba], 0.0, 0.0
+        else:
+            # Sem histórico neste estado da bomba: cadência mínima até aprender a taxa
+            return agora
+        # Ligada, a umidade sobe até o limiar de desligar; desligada, desce até o de ligar
+        sentido = 1.0 if estado.bomba else -1.0
+        folga = sentido * (self._limiar(estado.bomba) - nivel) - self.margem - self.desvios * desvio
+        aproximacao = sentido * taxa + self.desvios * erro_taxa
+        if folga <= 0:
+            return agora
+        if aproximacao <= 0:
+            return math.inf
+        return agora + self.fracao * folga / aproximacao
+
+    def _agendar(self, device_id, estado, agora):
+        if estado.ultima_avaliacao is None:
+            vencimento = agora
+        elif self.controle.decidir(estado.ultima, estado.bomba):
+            vencimento = agora
+        else:
+            vencimento = min(max(self._previsao(estado, agora), estado.ultima_avaliacao + self.intervalo_min),
+                             estado.ultima_avaliacao + self.intervalo_max)
+        adiantou = estado.vencimento is None or vencimento < estado.vencimento
+        estado.vencimento = vencimento
+        # Uma entrada por device na fila: só entra outra se o vencimento adiantou;
+        # se atrasou, a entrada antiga é reposicionada quando sair da fila
+        if adiantou and not estado.em_avaliacao:
+            estado.entrada = next(self._sequencia)
+            heapq.heappush(self._fila, (vencimento, estado.entrada, device_id))
+            if len(self._fila) > 2 * len(self.dispositivos) + 64:
+                self._compactar()
+        return vencimento
+
+    def _compactar(self):
+        """Refaz a fila só com as entradas válidas (loops que usam devido() não esvaziam a fila)"""
+        self._fila = [(e.vencimento, e.entrada, d) for d, e in self.dispositivos.items()
+                      if e.entrada is not None and not e.em_avaliacao]
+        heapq.heapify(self._fila)
+
+    def observar(self, device_id, agora, umidade, bomba):
+        """Registra uma leitura do device e retorna o instante da próxima avaliação"""
+        estado = self.dispositivos.get(device_id)
+        if estado is None:
+            estado = self.dispositivos[device_id] = _EstadoDispositivo()
+        estado.adicionar(agora, umidade, bool(bomba), self.janela)
+        self.observacoes += 1
+        if estado.cruzou_em is None and self.controle.decidir(umidade, estado.bomba):
+            estado.cruzou_em = agora
+        elif estado.cruzou_em is not None and not self.controle.decidir(umidade, estado.bomba):
+            # A bomba mudou (evento, app) antes da avaliação
+            estado.cruzou_em = None
+        return self._agendar(device_id, estado, agora)
+
+    def devido(self, device_id, agora):
+        """True se o controle do device deve ser avaliado agora"""
+        estado = self.dispositivos.get(device_id)
+        return estado is None or (not estado.em_avaliacao and estado.vencimento <= agora)
+
+    def vencidos(self, agora):
+        """Retira da fila os devices com avaliação vencida (ficam pendentes até avaliado())"""
+        devidos = []
+        while self._fila and self._fila[0][0] <= agora:
+            _, entrada, device_id = heapq.heappop(self._fila)
+            estado = self.dispositivos.get(device_id)
+            if estado is None or entrada != estado.entrada or estado.em_avaliacao:
+                continue
+            if estado.vencimento > agora:
+                estado.entrada = next(self._sequencia)
+                heapq.heappush(self._fila, (estado.vencimento, estado.entrada, device_id))
+                continue
+            estado.em_avaliacao = True
+            estado.entrada = None
+            devidos.append(device_id)
+        return devidos
+
+    def proximo_vencimento(self):
+        """Instante da avaliação mais próxima na fila (pode estar adiantado) ou None"""
+        return self._fila[0][0] if self._fila else None
+
+    def avaliado(self, device_id, agora):
+        """Registra que o controle do device foi avaliado; retorna a próxima avaliação"""
+        estado = self.dispositivos.get(device_id)
+        if estado is None:
+            estado = self.dispositivos[device_id] = _EstadoDispositivo()
+        self.avaliacoes += 1
+        if estado.cruzou_em is not None:
+            self.avaliacoes_cruzamento += 1
+            self.resposta.registrar(agora - estado.cruzou_em)
+            estado.cruzou_em = None
+        estado.ultima_avaliacao = agora
+        estado.em_avaliacao = False
+        estado.vencimento = None
+        if estado.tempo is None:
+            estado.vencimento = agora + self.intervalo_min
+            estado.entrada = next(self._sequencia)
+            heapq.heappush(self._fila, (estado.vencimento, estado.entrada, device_id))
+            return estado.vencimento
+        return self._agendar(device_id, estado, agora)
+
+    def remover(self, device_id):
+        self.dispositivos.pop(device_id, None)
+
+    def estatisticas(self):
+        return {
+            "dispositivos": len(self.dispositivos),
+            "observacoes": self.observacoes,
+            "avaliacoes": self.avaliacoes,
+            "avaliacoes_por_observacao": self.avaliacoes / self.observacoes if self.observacoes else 0.0,
+            "avaliacoes_cruzamento": self.avaliacoes_cruzamento,
+            "resposta_cruzamento": self.resposta.resumo(),
+        }
+
+def comparar_agendamentos(num_dispositivos=50, horas=48.0, intervalo=5.0, ciclos_fixos=3, seed=1, **opcoes):
+    """Cadência fixa (a cada `ciclos_fixos` ciclos) x agendador preditivo, sem rede
+
+    Os dois lados simulam as mesmas leituras do modelo físico (gerador_umidade)
+    com a histerese aplicada só nas avaliações. Mede as avaliações (GETs na
+    API no modo polling), o atraso entre a primeira leitura da sequência atual
+    de leituras cruzadas e a avaliação que a trata e quanto a umidade passou
+    dos limiares.
+    """
+    from gerador_umidade import GeradorUmidade
+
+    controle = opcoes.pop("controle", None) or ControleHisterese()
+    ciclos = int(horas * 3600 / intervalo)
+    resultados = {}
+    for nome in ("fixo", "preditivo"):
+        modelo = GeradorUmidade(dt=intervalo, seed=seed)
+        fluxos = [modelo.fluxo(seed=seed * 100003 + i) for i in range(num_dispositivos)]
+        bombas = [False] * num_dispositivos
+        cruzou = [None] * num_dispositivos
+        agendador = AgendadorPreditivo(controle, **opcoes) if nome == "preditivo" else None
+        atrasos = HistogramaLatencia()
+        avaliacoes = 0
+        abaixo = acima = 0.0
+        inicio = time.perf_counter()
+        for ciclo in range(1, ciclos + 1):
+            agora = ciclo * intervalo
+            for i, fluxo in enumerate(fluxos):
+                umidade = fluxo.proximo(bombas[i])
+                abaixo = max(abaixo, controle.limiar_ativacao - umidade)
+                acima = max(acima, umidade - controle.limiar_desativacao)
+                if controle.decidir(umidade, bombas[i]):
+                    if cruzou[i] is None:
+                        cruzou[i] = agora
+                else:
+                    # Leitura ruidosa voltou para dentro dos limiares: o atraso conta
+                    # a partir da sequência atual de leituras cruzadas
+                    cruzou[i] = None
+                if agendador is not None:
+                    agendador.observar(i, agora, umidade, bombas[i])
+                    if not agendador.devido(i, agora):
+                        continue
+                elif ciclo % ciclos_fixos:
+                    continue
+                avaliacoes += 1
+                if controle.decidir(umidade, bombas[i]):
+                    bombas[i] = not bombas[i]
+                    if cruzou[i] is not None:
+                        atrasos.registrar(agora - cruzou[i])
+                    cruzou[i] = None
+                if agendador is not None:
+                    agendador.avaliado(i, agora)
+        resultados[nome] = {
+            "avaliacoes": avaliacoes,
+            "avaliacoes_por_device_hora": avaliacoes / num_dispositivos / horas,
+            "atraso_resposta": atrasos.resumo(),
+            "ultrapassagem_max_pontos": max(abaixo, acima),
+            "tempo_cpu_segundos": time.perf_counter() - inicio,
+        }
+    resultados["reducao_avaliacoes"] = (1 - resultados["preditivo"]["avaliacoes"] / resultados["fixo"]["avaliacoes"]
+                                        if resultados["fixo"]["avaliacoes"] else 0.0)
+    return resultados
+
+def main():
+    print("⏱️  AGENDAMENTO PREDITIVO DO CONTROLE DA BOMBA")
+    print("=" * 60)
+    try:
+        num_dispositivos = int(input("Número de devices (padrão: 50): ") or "50")
+        horas = float(input("Horas simuladas (padrão: 48): ") or "48")
+        intervalo = float(input("Intervalo entre leituras em segundos (padrão: 5): ") or "5")
+    except ValueError:
+        num_dispositivos, horas, intervalo = 50, 48.0, 5.0
+
+    print(f"\n🚀 {num_dispositivos} devices, {horas:g}h, leitura a cada {intervalo:g}s (modelo físico)...")
+    resultados = comparar_agendamentos(num_dispositivos, horas, intervalo)
+    print(f"\n{'agendamento':<12} {'avaliações':>11} {'/device/h':>10} {'atraso p50':>11} "
+          f"{'atraso máx':>11} {'ultrapassagem':>14}")
+    for nome in ("fixo", "preditivo"):
+        r = resultados[nome]
+        atraso = r["atraso_resposta"]
+        print(f"{nome:<12} {r['avaliacoes']:>11} {r['avaliacoes_por_device_hora']:>10.1f} "
+              f"{atraso['p50_ms'] / 1000:>10.1f}s {atraso['max_ms'] / 1000:>10.1f}s "
+              f"{r['ultrapassagem_max_pontos']:>12.0f} pt")
+    print(f"\n📉 Avaliações (GETs de controle) a menos: {resultados['reducao_avaliacoes']:.0%}")
+
+if __name__ == "__main__":
+    main()
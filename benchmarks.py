@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Suíte de benchmarks dos caminhos quentes do simulador e do cliente
+Mede a geração de leituras, a serialização dos payloads, a decisão da
+bomba, um ciclo completo contra o servidor local e a vazão da frota com
+vários tamanhos. Os resultados são comparados com uma linha de base em JSON;
+qualquer medida pior que o limite de regressão faz o script sair com 1.
+
+    python benchmarks.py --salvar           # mede e grava a linha de base
+    python benchmarks.py                    # mede e compara com a linha de base
+    python benchmarks.py --filtro payload --rapido
+    python benchmarks.py --comparar-com origin/main   # linha de base medida agora num commit
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+LINHA_DE_BASE_PADRAO = os.path.join(os.path.dirname(os.path.abspath(__file__)), "linha_de_base_benchmarks.json")
+VERSAO = 1
+
+# Regressão tolerada: medidas de CPU oscilam menos que as que passam pela rede
+LIMITE_CPU = 0.25
+LIMITE_REDE = 0.40
+
+class Benchmark:
+    """Uma medida: `medir(rapido)` retorna o valor na `unidade` informada"""
+
+    def __init__(self, nome, medir, unidade="µs/op", maior_melhor=False, limite=LIMITE_CPU, rede=False):
+        self.nome = nome
+        self.medir = medir
+        self.unidade = unidade
+        self.maior_melhor = maior_melhor
+        self.limite = limite
+        self.rede = rede
+
+def _por_operacao_us(funcao, repeticoes, rodadas=5):
+    """µs por chamada (melhor de `rodadas`; o mínimo é o menos afetado por ruído)"""
+    melhor = float("inf")
+    for _ in range(rodadas):
+        inicio = time.perf_counter()
+        for _ in range(repeticoes):
+            funcao()
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor / repeticoes * 1e6
+
+def _calibracao():
+    """µs de uma carga fixa em Python puro (dict, random, json), a régua da velocidade da máquina
+
+    As comparações usam valor / calibração: a velocidade da máquina naquele
+    momento (CPU compartilhada, modo de energia) se cancela e sobra a
+    variação do código.
+    """
+    rng = random.Random(1)
+
+    def carga():
+        json.dumps({"umidade_solo": int(rng.uniform(0, 100)), "timestamp": 1700000000000, "device_id": "ESP32"})
+    return _por_operacao_us(carga, 1000, rodadas=7)
+
+def _mediana(funcao, rodadas):
+    return statistics.median(funcao() for _ in range(rodadas))
+
+class ServidorBenchmark:
+    """servidor_local.py em outro processo, para não disputar o GIL com o cliente medido"""
+
+    def __init__(self, capacidade=1024):
+        self.capacidade = capacidade
+        self.processo = None
+        self.api_url = None
+
+    def __enter__(self):
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            porta = sock.getsockname()[1]
+        script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "servidor_local.py")
+        self.processo = subprocess.Popen(
+            [sys.executable, script, "--porta", str(porta), "--capacidade", str(self.capacidade)],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        self.api_url = f"http://127.0.0.1:{porta}/api"
+        limite = time.monotonic() + 10
+        while time.monotonic() < limite:
+            try:
+                if requests.get(f"{self.api_url}/health", timeout=1).status_code == 200:
+                    return self
+            except requests.exceptions.ConnectionError:
+                time.sleep(0.05)
+        self.__exit__()
+        raise RuntimeError("Servidor local não respondeu em 10s")
+
+    def __exit__(self, *exc):
+        if self.processo is not None:
+            self.processo.terminate()
+            self.processo.wait(timeout=10)
+            self.processo = None
+
+def _leitura(i=0):
+    return {"umidade_solo": 30 + i % 60, "timestamp": 1700000000000 + i * 5000, "device_id": f"ESP32_SIM_{i % 100:05d}"}
+
+def benchmarks_cpu():
+    """Caminhos sem rede: leitura, payloads e decisão da bomba"""
+    from controle_bomba import ControleHisterese
+    from formato_binario import codificar_leituras
+    from gerador_umidade import GeradorUmidade
+    from lote_sensores import serializar_lote
+    from payloads import corpo_controle, corpo_leitura
+    from simulador_esp32 import ESP32Simulator
+
+    def gerar_dados(modelo):
+        def medir(rapido):
+            simulador = ESP32Simulator("http://127.0.0.1:9/api", rng=random.Random(1), verbosidade=0,
+                                       fonte_umidade=GeradorUmidade(seed=1).fluxo() if modelo else None)
+            return _por_operacao_us(simulador.gerar_dados_sensores, 2000 if rapido else 20000)
+        return medir
+
+    leitura = _leitura()
+    lote = [_leitura(i) for i in range(100)]
+    controle = ControleHisterese()
+    umidades = [i % 101 for i in range(101)]
+
+    def decidir():
+        decidir = controle.decidir
+        for umidade in umidades:
+            decidir(umidade, umidade > 50)
+
+    def decidir_vetor(rapido):
+        import numpy as np
+
+        rng = np.random.default_rng(1)
+        umidade = rng.integers(0, 101, 100_000).astype(np.int8)
+        bomba = rng.random(100_000) < 0.3
+        return _por_operacao_us(lambda: controle.decidir_vetor(umidade, bomba), 20 if rapido else 200) / 1000
+
+    return [
+        Benchmark("leitura.gerar_dados_sensores", gerar_dados(False)),
+        Benchmark("leitura.gerar_dados_sensores_modelo_fisico", gerar_dados(True)),
+        Benchmark("payload.corpo_leitura",
+                  lambda rapido: _por_operacao_us(lambda: corpo_leitura(leitura), 5000 if rapido else 50000)),
+        Benchmark("payload.corpo_controle",
+                  lambda rapido: _por_operacao_us(lambda: corpo_controle("activate", "Umidade baixa", "automatic"),
+                                                  5000 if rapido else 50000)),
+        Benchmark("payload.lote_json_100",
+                  lambda rapido: _por_operacao_us(lambda: serializar_lote(lote), 200 if rapido else 2000)),
+        Benchmark("payload.lote_binario_100",
+                  lambda rapido: _por_operacao_us(lambda: codificar_leituras(lote), 200 if rapido else 2000)),
+        Benchmark("controle.decidir_101_leituras",
+                  lambda rapido: _por_operacao_us(decidir, 500 if rapido else 5000)),
+        Benchmark("controle.decidir_vetor_100k", decidir_vetor, unidade="ms/op"),
+    ]
+
+def benchmarks_rede(servidor):
+    """Ciclo completo e vazão da frota contra o servidor local"""
+    from eventos_discretos import SimulacaoAcelerada
+    from frota_esp32 import FrotaESP32
+    from simulador_esp32 import ESP32Simulator
+
+    def ciclo(controle_local):
+        def medir(rapido):
+            # Um ciclo de simular_ciclo_completo, sem o sleep entre ciclos
+            simulador = ESP32Simulator(servidor.api_url, rng=random.Random(1), verbosidade=0,
+                                       controle_local=controle_local)
+            simulador.device_id = "ESP32_BENCH"
+            ciclos = iter(range(1, 10 ** 9))
+            for _ in range(20):
+                simulador.executar_ciclo(next(ciclos))
+            return _mediana(lambda: _por_operacao_us(lambda: simulador.executar_ciclo(next(ciclos)),
+                                                     50 if rapido else 300, rodadas=1), 3) / 1000
+        return medir
+
+    def acelerada(num_dispositivos):
+        def medir(rapido):
+            simulacao = SimulacaoAcelerada(servidor.api_url, num_dispositivos=num_dispositivos, intervalo=5.0,
+                                           seed=1)
+            ciclos = 500 if rapido else 3000
+            resumo = simulacao.executar(ciclos * 5.0 / num_dispositivos, finalizar=False)
+            return resumo["ciclos"] / resumo["tempo_real_segundos"]
+        return medir
+
+    def frota(num_dispositivos):
+        def medir(rapido):
+            # Sem intervalo entre ciclos: cada device envia assim que a resposta anterior chega
+            frota = FrotaESP32(servidor.api_url, num_dispositivos=num_dispositivos, intervalo=0.0, jitter=0.0,
+                               limite_conexoes=min(100, num_dispositivos), seed=1)
+            return asyncio.run(frota.executar(1.0 if rapido else 3.0))["requisicoes_por_segundo"]
+        return medir
+
+    lista = [
+        Benchmark("ciclo.executar_ciclo_controle_local", ciclo(True), unidade="ms/ciclo", limite=LIMITE_REDE,
+                  rede=True),
+        Benchmark("ciclo.executar_ciclo_polling", ciclo(False), unidade="ms/ciclo", limite=LIMITE_REDE, rede=True),
+        Benchmark("frota.acelerada_100", acelerada(100), unidade="ciclos/s", maior_melhor=True,
+                  limite=LIMITE_REDE, rede=True),
+    ]
+    for num_dispositivos in (10, 100, 1000):
+        lista.append(Benchmark(f"frota.asyncio_{num_dispositivos}", frota(num_dispositivos), unidade="req/s",
+                               maior_melhor=True, limite=LIMITE_REDE, rede=True))
+    return lista
+
+def ambiente():
+    """O que mais muda os números entre máquinas; avisado se diferir da linha de base"""
+    try:
+        import orjson  # noqa: F401
+        tem_orjson = True
+    except ImportError:
+        tem_orjson = False
+    return {
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "processador": platform.machine(),
+        "nucleos": os.cpu_count(),
+        "orjson": tem_orjson,
+    }
+
+def executar(filtro=None, rapido=False, rede=True, repeticoes=1, verbose=True):
+    """Roda os benchmarks (os que contêm `filtro` no nome) e retorna {nome: resultado}
+
+    Cada medida de CPU fica entre duas amostras da calibração e é dividida
+    pela média das duas, então uma lentidão passageira da máquina afeta a
+    medida e a sua calibração juntas. Com `repeticoes` > 1 a suíte inteira
+    roda várias vezes e fica, para cada benchmark, a passada de menor custo
+    já normalizado. As medidas de rede não são divididas pela calibração.
+    """
+    resultados = {}
+    calibracoes = []
+
+    def rodar(lista):
+        for benchmark in lista:
+            if filtro and filtro not in benchmark.nome:
+                continue
+            calibracao = None
+            if benchmark.rede:
+                valor = benchmark.medir(rapido)
+            else:
+                antes = calibracoes[-1] if calibracoes else _calibracao()
+                valor = benchmark.medir(rapido)
+                calibracoes.append(_calibracao())
+                calibracao = (antes + calibracoes[-1]) / 2
+            resultado = {"valor": valor, "unidade": benchmark.unidade, "maior_melhor": benchmark.maior_melhor,
+                         "limite": benchmark.limite, "calibracao_us": calibracao}
+            anterior = resultados.get(benchmark.nome)
+            if anterior is None or _custo_relativo(resultado, True) < _custo_relativo(anterior, True):
+                resultados[benchmark.nome] = resultado
+            if verbose:
+                print(f"   {benchmark.nome:<45} {valor:>12.3f} {benchmark.unidade}", file=sys.stderr)
+
+    for _ in range(max(1, repeticoes)):
+        rodar(benchmarks_cpu())
+    if rede:
+        with ServidorBenchmark() as servidor:
+            for _ in range(max(1, repeticoes)):
+                rodar(benchmarks_rede(servidor))
+    return resultados
+
+def _custo_relativo(resultado, normalizar):
+    """Valor em que menor é melhor, dividido pela calibração se `normalizar`"""
+    valor = resultado["valor"]
+    custo = 1.0 / valor if resultado["maior_melhor"] and valor else valor
+    return custo / resultado["calibracao_us"] if normalizar and resultado.get("calibracao_us") else custo
+
+def comparar(resultados, linha_de_base, limite=None, normalizar=True):
+    """Variação de cada medida em relação à linha de base; positiva = pior
+
+    A variação é custo_atual/custo_base - 1, com custo = tempo (ou 1/vazão)
+    dividido pela calibração medida junto, então o mesmo limite vale para as
+    duas direções e para máquinas em velocidades diferentes. Só medidas com
+    calibração dos dois lados são normalizadas.
+    """
+    comparacao = {}
+    base = linha_de_base.get("resultados", {})
+    for nome, atual in resultados.items():
+        anterior = base.get(nome)
+        if anterior is None:
+            comparacao[nome] = {**atual, "base": None, "variacao": None, "status": "novo"}
+            continue
+        normalizado = normalizar and bool(anterior.get("calibracao_us")) and bool(atual.get("calibracao_us"))
+        custo_base = _custo_relativo(anterior, normalizado)
+        variacao = _custo_relativo(atual, normalizado) / custo_base - 1 if custo_base else float("inf")
+        tolerado = limite if limite is not None else anterior.get("limite", atual["limite"])
+        if variacao > tolerado:
+            status = "regressao"
+        elif variacao < -tolerado:
+            status = "melhora"
+        else:
+            status = "ok"
+        comparacao[nome] = {**atual, "base": anterior["valor"], "variacao": variacao, "limite": tolerado,
+                            "status": status}
+    return comparacao
+
+def ler_linha_de_base(caminho):
+    try:
+        with open(caminho, encoding="utf-8") as arquivo:
+            return json.load(arquivo)
+    except FileNotFoundError:
+        return None
+
+def salvar_linha_de_base(caminho, resultados, anterior=None):
+    """Grava os resultados; medidas não executadas agora (ex.: --filtro) mantêm o valor anterior"""
+    combinados = dict((anterior or {}).get("resultados", {}))
+    combinados.update(resultados)
+    with open(caminho, "w", encoding="utf-8") as arquivo:
+        json.dump({"versao": VERSAO, "criado_em": time.strftime("%Y-%m-%dT%H:%M:%S"), "ambiente": ambiente(),
+                   "resultados": combinados}, arquivo, indent=2, ensure_ascii=False)
+        arquivo.write("\n")
+
+def medir_referencia(ref, argumentos=()):
+    """Mede a suíte no commit `ref` (git worktree temporário) e retorna a linha de base
+
+    Base e mudança são medidas na mesma máquina e na mesma hora, então a
+    comparação funciona no CI sem arquivo versionado.
+    """
+    raiz = os.path.dirname(os.path.abspath(__file__))
+    with tempfile.TemporaryDirectory() as temporario:
+        arvore = os.path.join(temporario, "arvore")
+        caminho = os.path.join(temporario, "linha_de_base.json")
+        subprocess.run(["git", "-C", raiz, "worktree", "add", "--detach", arvore, ref],
+                       check=True, capture_output=True)
+        try:
+            print(f"📏 Medindo a linha de base em {ref}", file=sys.stderr)
+            subprocess.run([sys.executable, os.path.join(arvore, "benchmarks.py"), "--salvar",
+                            "--linha-de-base", caminho, *argumentos], check=True, stdout=subprocess.DEVNULL)
+            return ler_linha_de_base(caminho)
+        finally:
+            subprocess.run(["git", "-C", raiz, "worktree", "remove", "--force", arvore], capture_output=True)
+
+ICONES = {"ok": "✅", "melhora": "🚀", "regressao": "❌", "novo": "🆕"}
+
+def imprimir_comparacao(comparacao):
+    print(f"{'benchmark':<45} {'base':>12} {'atual':>12} {'variação':>9}  unidade")
+    for nome, r in comparacao.items():
+        base = f"{r['base']:.3f}" if r["base"] is not None else "-"
+        variacao = f"{r['variacao'] * 100:+.1f}%" if r["variacao"] is not None else "-"
+        print(f"{ICONES[r['status']]} {nome:<43} {base:>12} {r['valor']:>12.3f} {variacao:>9}  {r['unidade']}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks do simulador com linha de base e limite de regressão")
+    parser.add_argument("--linha-de-base", dest="linha_de_base", default=LINHA_DE_BASE_PADRAO,
+                        help="Arquivo JSON da linha de base")
+    parser.add_argument("--salvar", action="store_true", help="Grava os resultados como nova linha de base")
+    parser.add_argument("--filtro", help="Só os benchmarks cujo nome contém este texto")
+    parser.add_argument("--limite", type=float,
+                        help=f"Regressão tolerada para todos (padrão: {LIMITE_CPU} CPU, {LIMITE_REDE} rede)")
+    parser.add_argument("--rapido", action="store_true", help="Menos repetições (mais ruído)")
+    parser.add_argument("--repeticoes", type=int, default=3,
+                        help="Passadas da suíte; fica a melhor de cada benchmark (padrão: 3)")
+    parser.add_argument("--sem-rede", dest="rede", action="store_false",
+                        help="Pula os benchmarks contra o servidor local")
+    parser.add_argument("--absoluto", dest="normalizar", action="store_false",
+                        help="Compara os valores brutos, sem dividir pela calibração da máquina")
+    parser.add_argument("--comparar-com", dest="comparar_com", metavar="REF",
+                        help="Mede a linha de base agora no commit REF (ex.: origin/main) em vez de ler o arquivo")
+    parser.add_argument("--saida", help="Grava a comparação em JSON neste arquivo")
+    args = parser.parse_args(argv)
+
+    print("⏱️  BENCHMARKS DO SIMULADOR", file=sys.stderr)
+    if args.comparar_com:
+        argumentos = ["--repeticoes", str(args.repeticoes)]
+        argumentos += ["--filtro", args.filtro] if args.filtro else []
+        argumentos += [] if args.rede else ["--sem-rede"]
+        argumentos += ["--rapido"] if args.rapido else []
+        try:
+            linha_de_base = medir_referencia(args.comparar_com, argumentos)
+        except subprocess.CalledProcessError as e:
+            detalhe = (e.stderr or b"").decode(errors="replace").strip()
+            print(f"❌ Não foi possível medir {args.comparar_com}: {detalhe or e}", file=sys.stderr)
+            return 2
+    else:
+        linha_de_base = ler_linha_de_base(args.linha_de_base)
+    resultados = executar(args.filtro, args.rapido, args.rede, args.repeticoes)
+
+    if linha_de_base is not None and linha_de_base.get("ambiente") != ambiente():
+        print(f"⚠️  Linha de base medida em outro ambiente: {linha_de_base.get('ambiente')}", file=sys.stderr)
+    comparacao = comparar(resultados, linha_de_base or {}, args.limite, args.normalizar)
+    print()
+    imprimir_comparacao(comparacao)
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            json.dump({"ambiente": ambiente(), "comparacao": comparacao}, arquivo, indent=2, ensure_ascii=False)
+    if args.salvar:
+        salvar_linha_de_base(args.linha_de_base, resultados, ler_linha_de_base(args.linha_de_base))
+        print(f"\n💾 Linha de base gravada em {args.linha_de_base}")
+        return 0
+
+    regressoes = [nome for nome, r in comparacao.items() if r["status"] == "regressao"]
+    if linha_de_base is None:
+        print(f"\nℹ️  Sem linha de base em {args.linha_de_base}; use --salvar para criar uma")
+    elif regressoes:
+        print(f"\n❌ {len(regressoes)} regressão(ões) acima do limite: {', '.join(regressoes)}")
+        return 1
+    else:
+        print("\n✅ Nenhuma regressão acima do limite")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
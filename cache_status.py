@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cache de leitura do cliente HTTP do simulador
+GETs de status e estatísticas da bomba ficam em cache por um TTL por
+endpoint; depois de vencidos são revalidados com If-None-Match (304 sem
+corpo quando nada mudou). Os POSTs do próprio simulador em /control
+invalidam o status e as estatísticas do device. Contadores de hit/miss
+mostram quanto tráfego de leitura uma frota com dashboards economizaria.
+"""
+
+import threading
+import time
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+from gravacao_trafego import extrair_device
+from transporte_resiliente import chave_endpoint
+
+# Segundos em que a resposta é usada sem consultar a API. As regras casam pelo
+# fim do caminho, então valem com qualquer prefixo na URL base (ex.: /api)
+TTLS_PADRAO = {
+    "GET /pump/{id}/status": 15.0,
+    "GET /pump/{id}/stats": 60.0,
+    "GET /devices": 60.0,
+}
+
+# POST bem-sucedido -> endpoints do mesmo device que deixam de valer
+INVALIDACOES_PADRAO = {
+    "POST /pump/{id}/control": ("GET /pump/{id}/status", "GET /pump/{id}/stats"),
+}
+
+class EntradaCache:
+    """Resposta guardada: o suficiente para remontar um requests.Response"""
+
+    __slots__ = ("endpoint", "device_id", "status", "headers", "conteudo", "encoding", "reason",
+                 "etag", "expira")
+
+    def __init__(self, endpoint, device_id, response, expira):
+        self.endpoint = endpoint
+        self.device_id = device_id
+        self.status = response.status_code
+        self.headers = CaseInsensitiveDict(response.headers)
+        self.conteudo = response.content
+        self.encoding = response.encoding
+        self.reason = response.reason
+        self.etag = response.headers.get("ETag")
+        self.expira = expira
+
+    def resposta(self, request, origem):
+        response = requests.Response()
+        response.status_code = self.status
+        response.headers = CaseInsensitiveDict(self.headers)
+        response.headers["X-Cache"] = origem
+        response._content = self.conteudo
+        response.encoding = self.encoding
+        response.reason = self.reason
+        response.url = request.url
+        response.request = request
+        return response
+
+class CacheStatus:
+    """Cache por URL com TTL por endpoint, revalidação por ETag e invalidação por POST
+
+    `relogio` segue o do simulador (relógio virtual no modo acelerado).
+    """
+
+    def __init__(self, ttls=None, invalidacoes=None, relogio=time.monotonic, max_entradas=10000,
+                 metricas=None):
+        self.ttls = dict(TTLS_PADRAO if ttls is None else ttls)
+        self.invalidacoes = dict(INVALIDACOES_PADRAO if invalidacoes is None else invalidacoes)
+        self.relogio = relogio
+        self.max_entradas = max_entradas
+        self.metricas = metricas
+        self.entradas = {}
+        self._regras = {}
+        # {endpoint: {"hits", "misses", "revalidados", "invalidacoes"}}
+        self.contadores = {}
+        self.bytes_economizados = 0
+        self._lock = threading.Lock()
+
+    def instalar(self, sessao):
+        """Passa a usar o cache em todas as requisições da sessão"""
+        return AdaptadorCache.instalar(sessao, self)
+
+    def _regra(self, metodo, url):
+        """Endpoint da tabela de TTLs/invalidações que casa com a requisição (ou None)"""
+        chave = chave_endpoint(metodo, url)
+        regra = self._regras.get(chave, False)
+        if regra is False:
+            metodo, caminho = chave.split(" ", 1)
+            regra = next((r for r in list(self.ttls) + list(self.invalidacoes)
+                          if r.split(" ", 1)[0] == metodo and caminho.endswith(r.split(" ", 1)[1])), None)
+            self._regras[chave] = regra
+        return regra
+
+    def _contar(self, endpoint, resultado):
+        contadores = self.contadores.get(endpoint)
+        if contadores is None:
+            contadores = self.contadores[endpoint] = {"hits": 0, "misses": 0, "revalidados": 0,
+                                                     "invalidacoes": 0}
+        contadores[resultado] += 1
+        if self.metricas is not None:
+            self.metricas.incrementar("cache_total", endpoint=endpoint, resultado=resultado)
+
+    def enviar(self, adaptador, request, **kwargs):
+        endpoint = self._regra(request.method, request.url)
+        if endpoint in self.ttls:
+            return self._enviar_get(adaptador, request, endpoint, **kwargs)
+
+        response = adaptador.send(request, **kwargs)
+        alvos = self.invalidacoes.get(endpoint)
+        if alvos and response.status_code < 400:
+            self.invalidar(extrair_device(request.url, None), alvos)
+        return response
+
+    def _enviar_get(self, adaptador, request, endpoint, **kwargs):
+        agora = self.relogio()
+        with self._lock:
+            entrada = self.entradas.get(request.url)
+            if entrada is not None and agora < entrada.expira:
+                self._contar(endpoint, "hits")
+                self.bytes_economizados += len(entrada.conteudo)
+                return entrada.resposta(request, "HIT")
+        if entrada is not None and entrada.etag:
+            request.headers["If-None-Match"] = entrada.etag
+
+        response = adaptador.send(request, **kwargs)
+        with self._lock:
+            if response.status_code == 304 and entrada is not None:
+                response.close()
+                entrada.expira = agora + self.ttls[endpoint]
+                self._contar(endpoint, "revalidados")
+                self.bytes_economizados += len(entrada.conteudo)
+                return entrada.resposta(request, "REVALIDATED")
+            self._contar(endpoint, "misses")
+            if response.status_code == 200:
+                if len(self.entradas) >= self.max_entradas and request.url not in self.entradas:
+                    # Descarta a entrada mais antiga (dicts mantêm a ordem de inserção)
+                    del self.entradas[next(iter(self.entradas))]
+                self.entradas[request.url] = EntradaCache(
+                    endpoint, extrair_device(request.url, None), response, agora + self.ttls[endpoint])
+            else:
+                self.entradas.pop(request.url, None)
+        return response
+
+    def invalidar(self, device_id=None, endpoints=None):
+        """Remove as entradas de um device (ou todas), opcionalmente só de alguns endpoints"""
+        with self._lock:
+            for url, entrada in list(self.entradas.items()):
+                if device_id is not None and entrada.device_id != device_id:
+                    continue
+                if endpoints is not None and entrada.endpoint not in endpoints:
+                    continue
+                del self.entradas[url]
+                self._contar(entrada.endpoint, "invalidacoes")
+
+    def estatisticas(self):
+        """Totais e contadores por endpoint; taxa de acerto = respostas sem corpo trafegado"""
+        with self._lock:
+            por_endpoint = {endpoint: dict(c) for endpoint, c in self.contadores.items()}
+        hits = sum(c["hits"] for c in por_endpoint.values())
+        revalidados = sum(c["revalidados"] for c in por_endpoint.values())
+        misses = sum(c["misses"] for c in por_endpoint.values())
+        consultas = hits + revalidados + misses
+        return {
+            "hits": hits,
+            "revalidados": revalidados,
+            "misses": misses,
+            "requisicoes_evitadas": hits,
+            "taxa_acerto": (hits + revalidados) / consultas if consultas else 0.0,
+            "bytes_economizados": self.bytes_economizados,
+            "entradas": len(self.entradas),
+            "endpoints": por_endpoint,
+        }
+
+class AdaptadorCache(BaseAdapter):
+    """Envolve o adaptador HTTP de uma sessão e responde pelo CacheStatus
+
+    Instalado por último, fica por fora dos observadores (métricas, gravação):
+    eles só veem o que de fato foi à rede.
+    """
+
+    def __init__(self, interno, cache):
+        super().__init__()
+        self.interno = interno
+        self.cache = cache
+
+    @classmethod
+    def instalar(cls, sessao, cache):
+        """Envolve todos os adaptadores da sessão (uma vez por cache)"""
+        for prefixo, adaptador in list(sessao.adapters.items()):
+            atual = adaptador
+            while getattr(atual, "cache", None) is not cache and hasattr(atual, "interno"):
+                atual = atual.interno
+            if getattr(atual, "cache", None) is not cache:
+                sessao.mount(prefixo, cls(adaptador, cache))
+        return sessao
+
+    def send(self, request, **kwargs):
+        return self.cache.enviar(self.interno, request, **kwargs)
+
+    def close(self):
+        self.interno.close()
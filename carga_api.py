@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Gerador de carga para a API do regador
+Modos de malha aberta (taxa de chegada constante) e malha fechada
+(N workers concorrentes), com histogramas de latência por endpoint e
+correção de omissão coordenada
+"""
+
+import csv
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from histograma import HistogramaLatencia
+from transporte_http import TransporteHTTP, resumo_conexoes
+
+class EndpointCarga:
+    """Endpoint alvo do teste de carga; `payload` é um dict ou uma função que gera um"""
+
+    def __init__(self, nome, metodo, url, payload=None, peso=1):
+        self.nome = nome
+        self.metodo = metodo
+        self.url = url
+        self.payload = payload
+        self.peso = peso
+
+    def corpo(self):
+        return self.payload() if callable(self.payload) else self.payload
+
+class ResultadoEndpoint:
+    """Contadores e histogramas (bruto e corrigido) de um endpoint"""
+
+    def __init__(self):
+        self.bruto = HistogramaLatencia()
+        self.corrigido = HistogramaLatencia()
+        self.sucessos = 0
+        self.falhas = 0
+        self.status = {}
+
+    def resumo(self):
+        return {
+            "sucessos": self.sucessos,
+            "falhas": self.falhas,
+            "status": dict(self.status),
+            "latencia": self.bruto.resumo(),
+            "latencia_corrigida": self.corrigido.resumo(),
+        }
+
+class TesteCarga:
+    """Executa um teste de carga sobre os endpoints informados"""
+
+    def __init__(self, endpoints, headers=None, timeout=10):
+        self.endpoints = list(endpoints)
+        self.headers = dict(headers or {})
+        self.timeout = timeout
+        self.resultados = {e.nome: ResultadoEndpoint() for e in self.endpoints}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.transporte = None
+        self.modo = None
+        self.duracao = 0.0
+
+        # Sequência ponderada para distribuir as requisições entre os endpoints
+        self._sequencia = [e for e in self.endpoints for _ in range(e.peso)]
+        if not self._sequencia:
+            raise ValueError("Informe ao menos um endpoint")
+
+    def _sessao(self, tamanho_pool):
+        """Uma requests.Session por thread, todas sobre um pool do tamanho da concorrência"""
+        sessao = getattr(self._local, "sessao", None)
+        if sessao is None:
+            with self._lock:
+                if self.transporte is None:
+                    self.transporte = TransporteHTTP(tamanho_pool=tamanho_pool)
+            sessao = self.transporte.sessao()
+            sessao.headers.update(self.headers)
+            self._local.sessao = sessao
+        return sessao
+
+    def _executar(self, endpoint, agendado, intervalo_esperado, tamanho_pool):
+        """Executa uma requisição e registra a latência bruta e a corrigida"""
+        sessao = self._sessao(tamanho_pool)
+        inicio = time.perf_counter()
+        try:
+            response = sessao.request(endpoint.metodo, endpoint.url, json=endpoint.corpo(), timeout=self.timeout)
+            status = response.status_code
+        except requests.exceptions.RequestException:
+            status = None
+        fim = time.perf_counter()
+
+        resultado = self.resultados[endpoint.nome]
+        with self._lock:
+            resultado.bruto.registrar(fim - inicio)
+            if agendado is not None:
+                # Malha aberta: latência medida a partir do instante planejado
+                resultado.corrigido.registrar(fim - agendado)
+            else:
+                resultado.corrigido.registrar_corrigido(fim - inicio, intervalo_esperado)
+            chave = str(status) if status is not None else "erro"
+            resultado.status[chave] = resultado.status.get(chave, 0) + 1
+            if status is not None and status < 400:
+                resultado.sucessos += 1
+            else:
+                resultado.falhas += 1
+
+    def executar_aberto(self, taxa, duracao, max_workers=64):
+        """Malha aberta: dispara `taxa` req/s independentemente das respostas"""
+        if taxa <= 0:
+            raise ValueError(f"taxa deve ser maior que 0 req/s (recebido {taxa})")
+        self.modo = "aberto"
+        intervalo = 1.0 / taxa
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            i = 0
+            while True:
+                agendado = inicio + i * intervalo
+                if agendado - inicio >= duracao:
+                    break
+                espera = agendado - time.perf_counter()
+                if espera > 0:
+                    time.sleep(espera)
+                endpoint = self._sequencia[i % len(self._sequencia)]
+                executor.submit(self._executar, endpoint, agendado, None, max_workers)
+                i += 1
+        self.duracao = time.perf_counter() - inicio
+        return self.resumo()
+
+    def executar_fechado(self, workers, duracao, intervalo_esperado=None):
+        """Malha fechada: `workers` threads enviando uma requisição após a outra
+
+        `intervalo_esperado` (segundos entre requisições de um worker) habilita a
+        correção de omissão coordenada no histograma corrigido.
+        """
+        self.modo = "fechado"
+        inicio = time.perf_counter()
+        fim = inicio + duracao
+
+        def worker(indice):
+            i = indice
+            while time.perf_counter() < fim:
+                endpoint = self._sequencia[i % len(self._sequencia)]
+                self._executar(endpoint, None, intervalo_esperado, workers)
+                i += 1
+
+        threads = [threading.Thread(target=worker, args=(n,), daemon=True) for n in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.duracao = time.perf_counter() - inicio
+        return self.resumo()
+
+    def resumo(self):
+        total = sum(r.sucessos + r.falhas for r in self.resultados.values())
+        return {
+            "modo": self.modo,
+            "duracao_segundos": self.duracao,
+            "total_requisicoes": total,
+            "requisicoes_por_segundo": total / self.duracao if self.duracao else 0,
+            "endpoints": {nome: r.resumo() for nome, r in self.resultados.items()},
+            "conexoes": self.transporte.estatisticas() if self.transporte else None,
+        }
+
+    def exportar_json(self, caminho):
+        with open(caminho, "w", encoding="utf-8") as arquivo:
+            json.dump(self.resumo(), arquivo, indent=2, ensure_ascii=False)
+
+    def exportar_csv(self, caminho):
+        """Uma linha por endpoint e tipo de latência (bruta/corrigida)"""
+        campos = ["endpoint", "tipo", "sucessos", "falhas", "contagem", "media_ms",
+                  "min_ms", "p50_ms", "p90_ms", "p99_ms", "p99.9_ms", "max_ms"]
+        with open(caminho, "w", encoding="utf-8", newline="") as arquivo:
+            escritor = csv.DictWriter(arquivo, fieldnames=campos)
+            escritor.writeheader()
+            for nome, resultado in self.resultados.items():
+                for tipo, histograma in (("bruta", resultado.bruto), ("corrigida", resultado.corrigido)):
+                    linha = {"endpoint": nome, "tipo": tipo,
+                             "sucessos": resultado.sucessos, "falhas": resultado.falhas}
+                    linha.update(histograma.resumo())
+                    escritor.writerow(linha)
+
+def imprimir_resumo(resumo):
+    """Mostra o resultado do teste de carga no terminal"""
+    print("\n" + "=" * 50)
+    print(f"RESULTADO DO TESTE DE CARGA ({resumo['modo']})")
+    print("=" * 50)
+    print(f"Total de requisições: {resumo['total_requisicoes']}")
+    print(f"Taxa: {resumo['requisicoes_por_segundo']:.1f} req/s")
+    if resumo.get("conexoes"):
+        print(resumo_conexoes(resumo["conexoes"]))
+    for nome, dados in resumo["endpoints"].items():
+        bruta, corrigida = dados["latencia"], dados["latencia_corrigida"]
+        print(f"\n{nome}: {dados['sucessos']} sucessos, {dados['falhas']} falhas")
+        print(f"   p50/p90/p99/p99.9: {bruta['p50_ms']:.1f}/{bruta['p90_ms']:.1f}/"
+              f"{bruta['p99_ms']:.1f}/{bruta['p99.9_ms']:.1f} ms")
+        print(f"   corrigido:         {corrigida['p50_ms']:.1f}/{corrigida['p90_ms']:.1f}/"
+              f"{corrigida['p99_ms']:.1f}/{corrigida['p99.9_ms']:.1f} ms")
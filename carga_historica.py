@@ -0,0 +1,402 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Carga histórica de leituras dos sensores (backfill)
+Lê as leituras de uma fonte em fluxo (modelo físico de umidade ou CSV) e as
+envia em lotes para POST /sensors com concorrência limitada. Só os lotes em
+voo ficam em memória, então a carga pode ter centenas de milhões de linhas.
+Um checkpoint guarda quantas linhas da fonte já foram confirmadas em
+sequência, e uma execução interrompida retoma de onde parou.
+
+    python carga_historica.py   # interativo
+    python regador_cli.py historico --dispositivos 500 --dias 90 --checkpoint carga.json
+"""
+
+import csv
+import itertools
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+
+from formato_binario import CONTENT_TYPE_BINARIO, CONTENT_TYPE_JSON, codificar_leituras, negociar_binario
+from histograma import HistogramaLatencia
+from lote_sensores import serializar_lote
+from simulador_esp32 import API_URL_PADRAO
+from transporte_http import TransporteHTTP, resumo_conexoes
+from transporte_resiliente import SessaoResiliente
+
+COLUNAS_CSV = ("device_id", "umidade_solo", "timestamp")
+
+class FonteGerada:
+    """Leituras sintéticas de N devices a cada `intervalo` segundos, em ordem de tempo
+
+    As umidades vêm do modelo físico (gerador_umidade.FluxoFrota) com a bomba na
+    histerese. Com a mesma seed a sequência é sempre a mesma, e pular linhas só
+    reexecuta o modelo, sem montar as leituras puladas.
+    """
+
+    def __init__(self, num_dispositivos, inicio_ms, fim_ms, intervalo=300.0, prefixo="ESP32_SIM_", seed=0):
+        self.num_dispositivos = int(num_dispositivos)
+        self.inicio_ms = int(inicio_ms)
+        self.fim_ms = int(fim_ms)
+        self.intervalo = float(intervalo)
+        self.prefixo = prefixo
+        self.seed = seed
+        self.intervalo_ms = int(round(self.intervalo * 1000))
+        if self.intervalo_ms <= 0 or self.fim_ms <= self.inicio_ms:
+            raise ValueError("Período vazio: informe fim > início e intervalo > 0")
+        self.passos = -(-(self.fim_ms - self.inicio_ms) // self.intervalo_ms)
+        self.total = self.passos * self.num_dispositivos
+
+    @property
+    def descricao(self):
+        return {"tipo": "gerada", "dispositivos": self.num_dispositivos, "inicio_ms": self.inicio_ms,
+                "fim_ms": self.fim_ms, "intervalo": self.intervalo, "prefixo": self.prefixo, "seed": self.seed}
+
+    def linhas(self, pular=0):
+        from gerador_umidade import GeradorUmidade
+
+        fluxo = GeradorUmidade(dt=self.intervalo, seed=self.seed).fluxo_frota(self.num_dispositivos)
+        ids = [f"{self.prefixo}{i:05d}" for i in range(1, self.num_dispositivos + 1)]
+        passo_inicial, resto = divmod(pular, self.num_dispositivos)
+        for _ in range(min(passo_inicial, self.passos)):
+            fluxo.proximo()
+        for passo in range(passo_inicial, self.passos):
+            timestamp = self.inicio_ms + passo * self.intervalo_ms
+            leituras = fluxo.proximo().tolist()
+            inicio = resto if passo == passo_inicial else 0
+            for device_id, umidade in zip(ids[inicio:], leituras[inicio:]):
+                yield {"umidade_solo": umidade, "timestamp": timestamp, "device_id": device_id}
+
+class FonteCSV:
+    """Leituras de um CSV com as colunas device_id, umidade_solo e timestamp (ms)
+
+    Linhas inválidas interrompem a carga com o número da linha: o checkpoint
+    fica no último lote confirmado e a carga retoma depois da correção.
+    """
+
+    def __init__(self, caminho):
+        self.caminho = os.path.abspath(caminho)
+        self.total = None
+        with open(self.caminho, newline="", encoding="utf-8") as arquivo:
+            cabecalho = next(csv.reader(arquivo), [])
+        faltando = [coluna for coluna in COLUNAS_CSV if coluna not in cabecalho]
+        if faltando:
+            raise ValueError(f"{caminho}: colunas ausentes no CSV: {', '.join(faltando)}")
+
+    @property
+    def descricao(self):
+        return {"tipo": "csv", "caminho": self.caminho, "bytes": os.path.getsize(self.caminho)}
+
+    def linhas(self, pular=0):
+        with open(self.caminho, newline="", encoding="utf-8") as arquivo:
+            leitor = csv.DictReader(arquivo)
+            for numero, linha in enumerate(itertools.islice(leitor, pular, None), start=pular + 2):
+                try:
+                    yield {"umidade_solo": int(linha["umidade_solo"]), "timestamp": int(linha["timestamp"]),
+                           "device_id": linha["device_id"]}
+                except (TypeError, ValueError):
+                    raise ValueError(f"{self.caminho}:{numero}: linha inválida: {linha!r}")
+
+def fonte_de_descricao(descricao):
+    """Recria a fonte gravada em um checkpoint"""
+    descricao = dict(descricao)
+    tipo = descricao.pop("tipo", None)
+    if tipo == "gerada":
+        return FonteGerada(descricao["dispositivos"], descricao["inicio_ms"], descricao["fim_ms"],
+                           descricao["intervalo"], descricao["prefixo"], descricao["seed"])
+    if tipo == "csv":
+        return FonteCSV(descricao["caminho"])
+    raise ValueError(f"Fonte desconhecida no checkpoint: {tipo!r}")
+
+def ler_checkpoint(caminho):
+    """Conteúdo do checkpoint, ou None se ele ainda não existe"""
+    try:
+        with open(caminho, encoding="utf-8") as arquivo:
+            return json.load(arquivo)
+    except FileNotFoundError:
+        return None
+
+class FalhaCarga(Exception):
+    """Lote que não pôde ser enviado nem com novas tentativas; a carga para no checkpoint"""
+
+class CargaHistorica:
+    """Envia as leituras de uma fonte para POST /sensors em lotes, com checkpoint
+
+    Até `concorrencia` lotes são enviados ao mesmo tempo e no máximo o dobro
+    fica montado em memória. Os lotes terminam fora de ordem; o checkpoint
+    avança só até o último lote com todos os anteriores confirmados, então ao
+    retomar no máximo os lotes em voo na interrupção são reenviados.
+    """
+
+    def __init__(self, api_base_url, fonte, tamanho_lote=1000, concorrencia=4, formato_binario=False,
+                 checkpoint=None, intervalo_checkpoint=5.0, intervalo_relatorio=5.0,
+                 tentativas=5, timeout=(3.05, 30), verbose=True):
+        self.api_base_url = api_base_url.rstrip("/")
+        self.fonte = fonte
+        self.tamanho_lote = tamanho_lote
+        self.concorrencia = concorrencia
+        self.formato_binario = formato_binario
+        self.checkpoint = checkpoint
+        self.intervalo_checkpoint = intervalo_checkpoint
+        self.intervalo_relatorio = intervalo_relatorio
+        self.verbose = verbose
+
+        # Backoff e disjuntor da sessão resiliente; sem fila offline, quem
+        # guarda o que falta enviar é o checkpoint
+        self.session = SessaoResiliente(timeout=timeout, tentativas=tentativas, backoff_max=30.0,
+                                        tamanho_fila=0)
+        # Uma conexão mantida aberta por lote em voo
+        self.conexoes = TransporteHTTP(tamanho_pool=concorrencia)
+        self.conexoes.instalar(self.session)
+        self.session.headers.update({'User-Agent': 'ESP32-Backfill/1.0'})
+
+        self.latencias = HistogramaLatencia()
+        self.retomado_de = 0
+        self.linhas_confirmadas = 0
+        self.linhas_enviadas = 0
+        self.rejeitadas = []
+        self.lotes = 0
+        self.bytes = 0
+        self.erro = None
+        self.interrompido = False
+        self._proximo_lote = 0
+        self._concluidos = {}
+
+    def _log(self, mensagem):
+        if self.verbose:
+            print(mensagem)
+
+    def _retomar(self):
+        """Linhas já confirmadas segundo o checkpoint (0 sem checkpoint)"""
+        if not self.checkpoint:
+            return 0
+        estado = ler_checkpoint(self.checkpoint)
+        if estado is None:
+            return 0
+        if estado.get("fonte") != self.fonte.descricao:
+            raise ValueError(f"{self.checkpoint}: checkpoint de outra fonte ({estado.get('fonte')})")
+        self.rejeitadas = [tuple(faixa) for faixa in estado.get("rejeitadas", [])]
+        return int(estado["linhas_confirmadas"])
+
+    def _salvar_checkpoint(self):
+        if not self.checkpoint:
+            return
+        estado = {
+            "fonte": self.fonte.descricao,
+            "linhas_confirmadas": self.linhas_confirmadas,
+            "total": self.fonte.total,
+            "rejeitadas": self.rejeitadas,
+            "atualizado_em": int(time.time() * 1000),
+        }
+        # Grava ao lado e troca: uma interrupção no meio não corrompe o checkpoint
+        temporario = f"{self.checkpoint}.tmp"
+        with open(temporario, "w", encoding="utf-8") as arquivo:
+            json.dump(estado, arquivo)
+        os.replace(temporario, self.checkpoint)
+
+    def _post(self, lote):
+        """POST /sensors no formato negociado; retorna (response, bytes enviados)
+
+        O formato é negociado em executar(); se a API responder 415 ao binário,
+        volta para JSON e reenvia. Um 400 (lote inválido) não muda o formato.
+        """
+        url = f"{self.api_base_url}/sensors"
+        if self.formato_binario:
+            try:
+                corpo = codificar_leituras(lote)
+            except ValueError:
+                corpo = None  # lote fora dos limites do quadro (ex.: > 49 dias): vai em JSON
+            if corpo is not None:
+                response = self.session.post(url, data=corpo, headers={'Content-Type': CONTENT_TYPE_BINARIO})
+                if response.status_code != 415:
+                    return response, len(corpo)
+                if self.formato_binario:
+                    self.formato_binario = False
+                    self._log("⚠️  A API recusou o formato binário (415); voltando para JSON")
+        corpo = serializar_lote(lote)
+        return self.session.post(url, data=corpo, headers={'Content-Type': CONTENT_TYPE_JSON}), len(corpo)
+
+    def _enviar_lote(self, lote):
+        """Executado nas threads: envia um lote e retorna (aceito, latência, bytes)"""
+        inicio = time.perf_counter()
+        response, tamanho = self._post(lote)
+        latencia = time.perf_counter() - inicio
+        if response.status_code == 413:
+            raise FalhaCarga(f"Lote de {len(lote)} leituras grande demais para a API (413); reduza o lote")
+        if response.status_code >= 500 or response.status_code == 429:
+            # A sessão só repete o POST em recusas explícitas (429/503 com Retry-After)
+            raise FalhaCarga(f"API respondeu {response.status_code}; o lote fica para a retomada pelo checkpoint")
+        return response.status_code < 400, latencia, tamanho
+
+    def _concluir(self, futuro, indice, inicio, fim):
+        """Registra o resultado de um lote e avança a marca contínua de confirmados"""
+        try:
+            aceito, latencia, tamanho = futuro.result()
+        except (requests.exceptions.RequestException, FalhaCarga) as e:
+            if self.erro is None:
+                self.erro = str(e)
+                self._log(f"❌ Lote {indice} (linhas {inicio}-{fim}) falhou: {e}")
+            return
+        self.lotes += 1
+        self.bytes += tamanho
+        self.latencias.registrar(latencia)
+        if aceito:
+            self.linhas_enviadas += fim - inicio
+        else:
+            # Dados inválidos não passam numa nova tentativa: a faixa fica anotada e a carga segue
+            self.rejeitadas.append((inicio, fim))
+            self._log(f"⚠️  Lote {indice} (linhas {inicio}-{fim}) rejeitado pela API")
+        self._concluidos[indice] = fim
+        while self._proximo_lote in self._concluidos:
+            self.linhas_confirmadas = self._concluidos.pop(self._proximo_lote)
+            self._proximo_lote += 1
+
+    def _relatar(self, inicio, ultimo):
+        """Progresso desde o último relatório; retorna (instante, linhas) para o próximo"""
+        agora = time.perf_counter()
+        taxa = (self.linhas_enviadas - ultimo[1]) / max(agora - ultimo[0], 1e-9)
+        linha = f"📦 {self.linhas_confirmadas:,} linhas"
+        total = self.fonte.total
+        if total:
+            linha += f" de {total:,} ({self.linhas_confirmadas / total * 100:.1f}%)"
+        linha += f" | {taxa:,.0f} linhas/s"
+        media = self.linhas_enviadas / max(agora - inicio, 1e-9)
+        if total and media > 0:
+            linha += f" | faltam ~{(total - self.linhas_confirmadas) / media / 60:.1f} min"
+        self._log(linha)
+        return agora, self.linhas_enviadas
+
+    def executar(self, max_linhas=None):
+        """Envia a fonte (ou só as próximas `max_linhas`) e retorna o resumo"""
+        self.retomado_de = self.linhas_confirmadas = self._retomar()
+        if self.retomado_de:
+            self._log(f"🔁 Retomando do checkpoint: {self.retomado_de:,} linhas já confirmadas")
+        if self.formato_binario and not negociar_binario(self.session, self.api_base_url):
+            # Sem Accept-Post com o formato (ou sem resposta): não arrisca lotes em binário
+            self.formato_binario = False
+            self._log("⚠️  A API não anuncia o formato binário (Accept-Post); usando JSON")
+        linhas = self.fonte.linhas(self.retomado_de)
+        if max_linhas is not None:
+            linhas = itertools.islice(linhas, max_linhas)
+
+        inicio = ultimo_checkpoint = time.perf_counter()
+        ultimo_relatorio = (inicio, 0)
+        pendentes = {}
+        posicao = self.retomado_de
+        executor = ThreadPoolExecutor(max_workers=self.concorrencia)
+        try:
+            for indice in itertools.count():
+                if self.erro is not None:
+                    break
+                lote = list(itertools.islice(linhas, self.tamanho_lote))
+                if not lote:
+                    break
+                # Só monta o próximo lote quando há vaga: a memória fica limitada aos lotes em voo
+                while len(pendentes) >= 2 * self.concorrencia:
+                    feitos, _ = wait(pendentes, return_when=FIRST_COMPLETED)
+                    for futuro in feitos:
+                        self._concluir(futuro, *pendentes.pop(futuro))
+                futuro = executor.submit(self._enviar_lote, lote)
+                pendentes[futuro] = (indice, posicao, posicao + len(lote))
+                posicao += len(lote)
+
+                agora = time.perf_counter()
+                if agora - ultimo_checkpoint >= self.intervalo_checkpoint:
+                    self._salvar_checkpoint()
+                    ultimo_checkpoint = agora
+                if agora - ultimo_relatorio[0] >= self.intervalo_relatorio:
+                    ultimo_relatorio = self._relatar(inicio, ultimo_relatorio)
+        except KeyboardInterrupt:
+            self.interrompido = True
+            self._log("\n⏹️  Carga interrompida; aguardando os lotes em voo para gravar o checkpoint")
+        except ValueError as e:
+            # Linha inválida na fonte: para no último lote confirmado
+            self.erro = str(e)
+            self._log(f"❌ {e}")
+        finally:
+            # Interrompida ou com erro, os lotes que nem começaram ficam para a próxima execução
+            executor.shutdown(wait=True, cancel_futures=self.interrompido or self.erro is not None)
+            for futuro, faixa in pendentes.items():
+                if not futuro.cancelled():
+                    self._concluir(futuro, *faixa)
+            self._salvar_checkpoint()
+
+        duracao = time.perf_counter() - inicio
+        self._relatar(inicio, (inicio, 0))
+        total = self.fonte.total
+        return {
+            "fonte": self.fonte.descricao,
+            "total": total,
+            "retomado_de": self.retomado_de,
+            "linhas_confirmadas": self.linhas_confirmadas,
+            "linhas_enviadas": self.linhas_enviadas,
+            "linhas_rejeitadas": sum(fim - inicio for inicio, fim in self.rejeitadas),
+            "lotes": self.lotes,
+            "bytes": self.bytes,
+            "duracao_segundos": duracao,
+            "linhas_por_segundo": self.linhas_enviadas / duracao if duracao > 0 else 0.0,
+            "bytes_por_segundo": self.bytes / duracao if duracao > 0 else 0.0,
+            "latencia_lote": self.latencias.resumo(),
+            "formato": "binario" if self.formato_binario else "json",
+            "transporte": self.session.estatisticas(),
+            "conexoes": self.conexoes.estatisticas(),
+            "concluida": self.erro is None and not self.interrompido and (
+                self.linhas_confirmadas == total if total is not None else max_linhas is None),
+            "interrompida": self.interrompido,
+            "erro": self.erro,
+        }
+
+def main():
+    print("🗄️  CARGA HISTÓRICA DE LEITURAS")
+    print("=" * 60)
+
+    api_url = input(f"URL da API (padrão: {API_URL_PADRAO}): ").strip() or API_URL_PADRAO
+    checkpoint = input("Arquivo de checkpoint (padrão: carga_historica.json): ").strip() or "carga_historica.json"
+    estado = ler_checkpoint(checkpoint)
+    if estado is not None:
+        fonte = fonte_de_descricao(estado["fonte"])
+        print(f"🔁 Checkpoint encontrado: {estado['linhas_confirmadas']:,} linhas confirmadas")
+    else:
+        caminho_csv = input("CSV de origem (vazio = gerar com o modelo físico): ").strip()
+        if caminho_csv:
+            fonte = FonteCSV(caminho_csv)
+        else:
+            try:
+                num_dispositivos = int(input("Número de devices (padrão: 100): ") or "100")
+                dias = float(input("Dias de histórico (padrão: 30): ") or "30")
+                intervalo = float(input("Intervalo entre leituras em segundos (padrão: 300): ") or "300")
+            except ValueError:
+                num_dispositivos, dias, intervalo = 100, 30.0, 300.0
+            fim_ms = int(time.time() * 1000)
+            fonte = FonteGerada(num_dispositivos, fim_ms - int(dias * 86400 * 1000), fim_ms, intervalo)
+    try:
+        concorrencia = int(input("Lotes simultâneos (padrão: 4): ") or "4")
+        tamanho_lote = int(input("Leituras por lote (padrão: 1000): ") or "1000")
+    except ValueError:
+        concorrencia, tamanho_lote = 4, 1000
+
+    if fonte.total:
+        print(f"\n🚀 Enviando {fonte.total:,} leituras em lotes de {tamanho_lote} ({concorrencia} simultâneos)")
+    carga = CargaHistorica(api_url, fonte, tamanho_lote=tamanho_lote, concorrencia=concorrencia,
+                           checkpoint=checkpoint)
+    resumo = carga.executar()
+
+    print("\n" + "=" * 60)
+    print(f"📊 {resumo['linhas_enviadas']:,} linhas em {resumo['duracao_segundos']:.1f}s "
+          f"({resumo['linhas_por_segundo']:,.0f} linhas/s, {resumo['bytes_por_segundo'] / 1e6:.2f} MB/s)")
+    print(f"   Lotes: {resumo['lotes']} | p50 {resumo['latencia_lote']['p50_ms']:.1f} ms | "
+          f"p99 {resumo['latencia_lote']['p99_ms']:.1f} ms | repetições {resumo['transporte']['repeticoes']}")
+    print(f"   {resumo_conexoes(resumo['conexoes'])}")
+    if resumo["linhas_rejeitadas"]:
+        print(f"⚠️  {resumo['linhas_rejeitadas']:,} linhas rejeitadas pela API (faixas no checkpoint)")
+    if resumo["concluida"]:
+        print("✅ Carga concluída")
+    else:
+        print(f"⏸️  Carga parcial: rode de novo com o checkpoint {checkpoint} para continuar")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cenários de tempestade de reconexão (thundering herd)
+Quedas de energia ou do roteador fazem a frota inteira reconectar no mesmo
+instante e enviar a primeira leitura junta. Os cenários montam essas
+interrupções sobre a FrotaESP32 (reinício sincronizado, implantação em
+ondas, partição parcial, descarga do backlog acumulado offline) e medem, a
+cada segundo, a latência e a taxa de erros do backend: antes, durante a
+tempestade e quanto tempo ele leva para se recuperar.
+"""
+
+import asyncio
+import time
+from collections import deque
+
+from frota_esp32 import FrotaESP32
+from histograma import HistogramaLatencia
+from lote_sensores import serializar_lote
+from simulador_esp32 import API_URL_PADRAO, gerar_leitura
+
+ENERGIA = "energia"  # device desliga: perde o estado e as leituras em RAM
+REDE = "rede"        # device segue ligado, só sem alcançar o backend
+
+class Interrupcao:
+    """Janela em que uma faixa da frota fica fora do ar
+
+    `faixa` seleciona os devices por posição ((0.0, 0.3) = os primeiros 30%).
+    Cada device volta em `inicio + duracao + U(0, dispersao_retorno)`, o tempo
+    que o conectarWiFi() leva em cada um. Com `backlog` as leituras feitas
+    offline são guardadas e enviadas num único POST em massa na volta.
+    """
+
+    def __init__(self, inicio, duracao, faixa=(0.0, 1.0), dispersao_retorno=0.0,
+                 tipo=ENERGIA, backlog=False):
+        if tipo not in (ENERGIA, REDE):
+            raise ValueError(f"Tipo de interrupção desconhecido: {tipo}")
+        self.inicio = inicio
+        self.duracao = duracao
+        self.faixa = faixa
+        self.dispersao_retorno = dispersao_retorno
+        self.tipo = tipo
+        self.backlog = backlog and tipo == REDE
+
+    def dispositivos(self, total):
+        return range(round(self.faixa[0] * total), round(self.faixa[1] * total))
+
+# Primitivas: cada uma retorna a lista de interrupções do cenário
+
+def reinicio_sincronizado(inicio=20.0, duracao=10.0, dispersao_retorno=2.0):
+    """Queda de energia: a frota inteira desliga e volta junta"""
+    return [Interrupcao(inicio, duracao, dispersao_retorno=dispersao_retorno, tipo=ENERGIA)]
+
+def implantacao_escalonada(inicio=20.0, ondas=4, espacamento=10.0, duracao=5.0, dispersao_retorno=1.0):
+    """Atualização de firmware em ondas: cada fração da frota reinicia numa vez"""
+    return [
+        Interrupcao(inicio + onda * espacamento, duracao, faixa=(onda / ondas, (onda + 1) / ondas),
+                    dispersao_retorno=dispersao_retorno, tipo=ENERGIA)
+        for onda in range(ondas)
+    ]
+
+def particao_parcial(inicio=20.0, duracao=20.0, fracao=0.3, dispersao_retorno=1.0):
+    """Parte da frota perde o backend (ex.: um roteador) e a outra segue normal"""
+    return [Interrupcao(inicio, duracao, faixa=(0.0, fracao), dispersao_retorno=dispersao_retorno, tipo=REDE)]
+
+def descarga_backlog(inicio=20.0, duracao=30.0, fracao=1.0, dispersao_retorno=1.0):
+    """Rede fora com leituras acumuladas: na volta cada device descarrega o backlog"""
+    return [Interrupcao(inicio, duracao, faixa=(0.0, fracao), dispersao_retorno=dispersao_retorno,
+                        tipo=REDE, backlog=True)]
+
+CENARIOS = {
+    "reinicio": reinicio_sincronizado,
+    "ondas": implantacao_escalonada,
+    "particao": particao_parcial,
+    "backlog": descarga_backlog,
+}
+
+class FrotaTempestade(FrotaESP32):
+    """FrotaESP32 que obedece às interrupções e registra a linha do tempo por segundo"""
+
+    def __init__(self, api_base_url=API_URL_PADRAO, interrupcoes=(), max_backlog=120, **kwargs):
+        super().__init__(api_base_url, **kwargs)
+        self.interrupcoes = list(interrupcoes)
+        self.max_backlog = max_backlog
+        # {device_id: [(inicio, retorno, interrupcao)]} em segundos desde o início
+        self.janelas = {disp.device_id: [] for disp in self.dispositivos}
+        for interrupcao in self.interrupcoes:
+            for i in interrupcao.dispositivos(len(self.dispositivos)):
+                retorno = (interrupcao.inicio + interrupcao.duracao
+                           + self.rng.uniform(0, interrupcao.dispersao_retorno))
+                self.janelas[self.dispositivos[i].device_id].append((interrupcao.inicio, retorno, interrupcao))
+        self.backlogs = {}
+        self.leituras_descartadas = 0
+        # {segundo: [requisicoes, erros, HistogramaLatencia]}
+        self.linha_do_tempo = {}
+        self._t0 = None
+
+    def _registrar(self, endpoint, sucesso, latencia):
+        super()._registrar(endpoint, sucesso, latencia)
+        segundo = int(time.monotonic() - self._t0)
+        balde = self.linha_do_tempo.get(segundo)
+        if balde is None:
+            balde = self.linha_do_tempo[segundo] = [0, 0, HistogramaLatencia()]
+        balde[0] += 1
+        if not sucesso:
+            balde[1] += 1
+        balde[2].registrar(latencia)
+
+    def _janela_atual(self, disp, agora):
+        for janela in self.janelas[disp.device_id]:
+            if janela[0] <= agora < janela[1]:
+                return janela
+        return None
+
+    def _desligar(self, disp):
+        """Perda de energia: estado e leituras em RAM somem"""
+        backlog = self.backlogs.pop(disp.device_id, None)
+        if backlog:
+            self.leituras_descartadas += len(backlog)
+        disp.pump_active = False
+        disp.pump_start_time = None
+        disp.ciclo = 0
+
+    async def _descarregar(self, sessao, disp):
+        backlog = self.backlogs.pop(disp.device_id)
+        await self._requisicao(sessao, "POST", "/sensors", "/sensors (backlog)",
+                               data=serializar_lote(list(backlog)))
+
+    async def _loop_dispositivo(self, sessao, disp, fim):
+        loop = asyncio.get_running_loop()
+        await asyncio.sleep(self.rng.uniform(0, self.intervalo))
+        proximo = loop.time()
+        desligado = False
+
+        while self.is_running and loop.time() < fim:
+            janela = self._janela_atual(disp, loop.time() - self._t0)
+            if janela is None:
+                desligado = False
+                if self.backlogs.get(disp.device_id):
+                    await self._descarregar(sessao, disp)
+                await self._ciclo(sessao, disp)
+            else:
+                _, retorno, interrupcao = janela
+                if interrupcao.tipo == ENERGIA and not desligado:
+                    self._desligar(disp)
+                    desligado = True
+                elif interrupcao.backlog:
+                    backlog = self.backlogs.get(disp.device_id)
+                    if backlog is None:
+                        backlog = self.backlogs[disp.device_id] = deque(maxlen=self.max_backlog)
+                    if len(backlog) == backlog.maxlen:
+                        self.leituras_descartadas += 1
+                    backlog.append(gerar_leitura(disp.device_id, disp.base_humidity, disp.humidity_variation,
+                                                 self.rng, disp.fonte_umidade, disp.pump_active))
+            proximo += self.intervalo + self.rng.uniform(-self.jitter, self.jitter)
+            if janela is not None:
+                # Na volta o device não espera a cadência: envia assim que reconecta,
+                # e os ciclos seguintes ficam em fase com os dos outros que voltaram juntos
+                proximo = min(proximo, self._t0 + janela[1])
+            await asyncio.sleep(max(0.0, proximo - loop.time()))
+
+    async def executar(self, duracao_segundos):
+        # loop.time() do asyncio é o time.monotonic(), usado também em _registrar
+        self._t0 = asyncio.get_running_loop().time()
+        return await super().executar(duracao_segundos)
+
+def _agregar(baldes):
+    histograma = HistogramaLatencia()
+    requisicoes = erros = 0
+    for balde in baldes:
+        requisicoes += balde[0]
+        erros += balde[1]
+        histograma.mesclar(balde[2])
+    return requisicoes, erros, histograma
+
+def analisar_tempestade(frota, duracao, janela_estavel=5, tolerancia=2.0, fracao_trafego=0.5):
+    """Base (antes da primeira interrupção), pico da tempestade e tempo de recuperação
+
+    Recuperado = `janela_estavel` segundos seguidos com p99 <= tolerancia x p99
+    da base e taxa de erros até 1 ponto percentual acima da base, contados a
+    partir do primeiro device que volta. Segundos sem requisições não provam
+    nada: a janela também precisa de pelo menos `fracao_trafego` do tráfego
+    da base no mesmo tempo (e de alguma requisição), senão um intervalo sem
+    tráfego contaria como recuperação.
+    """
+    segundos = int(duracao) + 1
+    linha = []
+    for segundo in range(segundos):
+        requisicoes, erros, histograma = frota.linha_do_tempo.get(segundo, (0, 0, HistogramaLatencia()))
+        linha.append({
+            "segundo": segundo,
+            "requisicoes": requisicoes,
+            "erros": erros,
+            "taxa_erros": erros / requisicoes if requisicoes else 0.0,
+            "p50_ms": histograma.percentil(50) * 1000,
+            "p99_ms": histograma.percentil(99) * 1000,
+        })
+
+    janelas = [janela for lista in frota.janelas.values() for janela in lista]
+    if not janelas:
+        return {"linha_do_tempo": linha}
+    inicio_queda = min(j[0] for j in janelas)
+    inicio_tempestade = min(j[1] for j in janelas)
+    fim_retornos = max(j[1] for j in janelas)
+
+    # Base: depois da fase inicial (um intervalo) e antes da primeira queda
+    inicio_base = int(min(frota.intervalo, inicio_queda / 2))
+    segundos_base = range(inicio_base, int(inicio_queda))
+    requisicoes_base, erros_base, histograma_base = _agregar(
+        frota.linha_do_tempo[s] for s in segundos_base if s in frota.linha_do_tempo)
+    duracao_base = max(1, len(segundos_base))
+    p99_base = histograma_base.percentil(99) * 1000
+    taxa_erros_base = erros_base / requisicoes_base if requisicoes_base else 0.0
+
+    tempestade = linha[int(inicio_tempestade):]
+    pico = max((s["requisicoes"] for s in tempestade), default=0)
+    requisicoes_por_segundo_base = requisicoes_base / duracao_base
+    limite_p99 = tolerancia * p99_base
+    limite_erros = taxa_erros_base + 0.01
+
+    minimo_requisicoes = max(1.0, fracao_trafego * requisicoes_por_segundo_base * janela_estavel)
+
+    def estavel(s):
+        return s["p99_ms"] <= limite_p99 and s["taxa_erros"] <= limite_erros
+
+    recuperacao = None
+    for i in range(len(tempestade) - janela_estavel + 1):
+        janela = tempestade[i:i + janela_estavel]
+        if (janela[0]["requisicoes"] and sum(s["requisicoes"] for s in janela) >= minimo_requisicoes
+                and all(estavel(s) for s in janela if s["requisicoes"])):
+            recuperacao = tempestade[i]["segundo"] - inicio_tempestade
+            break
+
+    return {
+        "linha_do_tempo": linha,
+        "base": {
+            "requisicoes_por_segundo": requisicoes_por_segundo_base,
+            "p99_ms": p99_base,
+            "taxa_erros": taxa_erros_base,
+        },
+        "tempestade": {
+            "inicio_queda": inicio_queda,
+            "primeiro_retorno": inicio_tempestade,
+            "ultimo_retorno": fim_retornos,
+            "pico_requisicoes_por_segundo": pico,
+            # Quantas vezes a taxa normal a frota chega a concentrar num segundo
+            "fator_pico": pico / requisicoes_por_segundo_base if requisicoes_por_segundo_base else None,
+            "pico_p99_ms": max((s["p99_ms"] for s in tempestade), default=0.0),
+            "pico_taxa_erros": max((s["taxa_erros"] for s in tempestade), default=0.0),
+        },
+        "recuperacao_segundos": max(0.0, recuperacao) if recuperacao is not None else None,
+    }
+
+def executar_cenario(api_base_url, interrupcoes, num_dispositivos=100, intervalo=5.0, jitter=0.5,
+                     duracao=90.0, seed=None, janela_estavel=5, tolerancia=2.0, **kwargs):
+    """Roda a frota com as interrupções e retorna o relatório da tempestade"""
+    frota = FrotaTempestade(api_base_url, interrupcoes=interrupcoes, num_dispositivos=num_dispositivos,
+                            intervalo=intervalo, jitter=jitter, seed=seed, **kwargs)
+    resumo = asyncio.run(frota.executar(duracao))
+    relatorio = analisar_tempestade(frota, duracao, janela_estavel, tolerancia)
+    relatorio["frota"] = resumo
+    relatorio["leituras_descartadas"] = frota.leituras_descartadas
+    return relatorio
+
+def imprimir_linha_do_tempo(relatorio, largura=40):
+    linha = relatorio["linha_do_tempo"]
+    maximo = max((s["requisicoes"] for s in linha), default=0) or 1
+    for s in linha:
+        barra = "█" * round(s["requisicoes"] / maximo * largura)
+        erros = f" ❌ {s['erros']}" if s["erros"] else ""
+        print(f"{s['segundo']:>4}s {s['requisicoes']:>5} req  p99 {s['p99_ms']:>7.1f} ms {barra}{erros}")
+
+def main():
+    print("🌩️  SIMULADOR ESP32 - TEMPESTADE DE RECONEXÃO")
+    print("=" * 60)
+
+    api_url = input(f"URL da API (padrão: {API_URL_PADRAO}): ").strip() or API_URL_PADRAO
+    print("Cenários: 1) reinício sincronizado  2) implantação em ondas  3) partição parcial  4) backlog")
+    nome = {"1": "reinicio", "2": "ondas", "3": "particao", "4": "backlog"}.get(
+        input("Escolha o cenário (padrão: 1): ").strip(), "reinicio")
+    try:
+        num_dispositivos = int(input("Número de devices (padrão: 100): ") or "100")
+        intervalo = float(input("Intervalo entre ciclos em segundos (padrão: 5): ") or "5")
+        duracao = float(input("Duração em segundos (padrão: 90): ") or "90")
+    except ValueError:
+        num_dispositivos, intervalo, duracao = 100, 5.0, 90.0
+
+    print(f"\n🚀 Cenário '{nome}' com {num_dispositivos} devices por {duracao:.0f}s")
+    try:
+        relatorio = executar_cenario(api_url, CENARIOS[nome](), num_dispositivos=num_dispositivos,
+                                     intervalo=intervalo, duracao=duracao)
+    except KeyboardInterrupt:
+        print("\n⏹️  Cenário interrompido pelo usuário")
+        return
+
+    print("\n" + "=" * 60)
+    imprimir_linha_do_tempo(relatorio)
+    print("=" * 60)
+    base, tempestade = relatorio["base"], relatorio["tempestade"]
+    print(f"📊 Base: {base['requisicoes_por_segundo']:.1f} req/s, p99 {base['p99_ms']:.1f} ms, "
+          f"{base['taxa_erros'] * 100:.1f}% erros")
+    print(f"🌩️  Tempestade: pico {tempestade['pico_requisicoes_por_segundo']} req/s "
+          f"({tempestade['fator_pico'] or 0:.1f}x a base), "
+          f"p99 {tempestade['pico_p99_ms']:.1f} ms, {tempestade['pico_taxa_erros'] * 100:.1f}% erros")
+    if relatorio["recuperacao_segundos"] is None:
+        print("⚠️  O backend não se recuperou até o fim do cenário")
+    else:
+        print(f"✅ Recuperação em {relatorio['recuperacao_segundos']:.0f}s após o primeiro retorno")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Controle automático da bomba por histerese
+Avalia cada leitura localmente: ativa abaixo de 30% e desativa acima de 70%
+"""
+
+LIMIAR_ATIVACAO = 30
+LIMIAR_DESATIVACAO = 70
+
+ATIVAR = "activate"
+DESATIVAR = "deactivate"
+
+class ControleHisterese:
+    """Regra de histerese 30%/70% aplicada às leituras produzidas pelo device"""
+
+    def __init__(self, limiar_ativacao=LIMIAR_ATIVACAO, limiar_desativacao=LIMIAR_DESATIVACAO):
+        if limiar_ativacao >= limiar_desativacao:
+            raise ValueError("limiar_ativacao deve ser menor que limiar_desativacao")
+        self.limiar_ativacao = limiar_ativacao
+        self.limiar_desativacao = limiar_desativacao
+
+    def decidir(self, umidade, pump_active):
+        """Retorna 'activate', 'deactivate' ou None se o estado da bomba não muda"""
+        if umidade < self.limiar_ativacao and not pump_active:
+            return ATIVAR
+        if umidade > self.limiar_desativacao and pump_active:
+            return DESATIVAR
+        return None
+
+    def decidir_vetor(self, umidade, pump_active):
+        """decidir() para vários devices de uma vez (arrays NumPy); retorna as máscaras (ativar, desativar)"""
+        return (umidade < self.limiar_ativacao) & ~pump_active, (umidade > self.limiar_desativacao) & pump_active
+
+    def motivo(self, acao):
+        """Motivo enviado à API junto com o comando"""
+        if acao == ATIVAR:
+            return f"Umidade do solo baixa (< {self.limiar_ativacao}%)"
+        return f"Umidade do solo adequada (> {self.limiar_desativacao}%)"
@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Emulador fiel ao firmware (main.ino)
+Reproduz o loop() do ESP32 em tempo virtual: delay(1000) por iteração,
+medição quando millis() - ultimaMedicao >= 30000, leitura bruta do ADC
+convertida com o map() inteiro do Arduino, timestamp = millis() (uint32, com
+estouro em ~49,7 dias) e conectarWiFi() bloqueando até 20 x 500 ms. Quedas de
+WiFi (por device e do roteador inteiro) deixam os devices sem enviar e, na
+volta, reconectando juntos: as rajadas e tempestades de reconexão de uma
+frota real, em vez do laço idealizado de 5 s do ESP32Simulator.
+"""
+
+import bisect
+import math
+import random
+import time
+
+import requests
+
+from eventos_discretos import AgendadorEventos, RelogioVirtual
+from gerador_umidade import GeradorUmidade, map_arduino
+from payloads import corpo_leitura
+from simulador_esp32 import API_URL_PADRAO
+from transporte_http import transporte_padrao
+
+# Constantes do main.ino
+INTERVALO_MEDICAO_MS = 30000
+DELAY_LOOP = 1.0
+TENTATIVAS_WIFI = 20
+ESPERA_TENTATIVA_WIFI = 0.5
+# HTTPClient do ESP32: HTTPCLIENT_DEFAULT_TCP_TIMEOUT
+TIMEOUT_HTTP = 5.0
+MASCARA_MILLIS = 0xFFFFFFFF
+
+class EnlaceWiFi:
+    """Janelas [inicio, fim) em que o device não alcança o roteador"""
+
+    def __init__(self, janelas):
+        self.janelas = _mesclar(janelas)
+        self._inicios = [inicio for inicio, _ in self.janelas]
+
+    def _janela(self, instante):
+        i = bisect.bisect_right(self._inicios, instante) - 1
+        if i >= 0 and instante < self.janelas[i][1]:
+            return i
+        return None
+
+    def disponivel(self, instante):
+        return self._janela(instante) is None
+
+    def disponivel_a_partir(self, instante):
+        """Primeiro instante >= `instante` com o roteador alcançável"""
+        i = self._janela(instante)
+        return instante if i is None else self.janelas[i][1]
+
+    def proxima_queda(self, instante):
+        """Início da próxima janela de queda após `instante` (ou None)"""
+        i = bisect.bisect_right(self._inicios, instante)
+        return self._inicios[i] if i < len(self._inicios) else None
+
+def _mesclar(janelas):
+    mescladas = []
+    for inicio, fim in sorted(janelas):
+        if mescladas and inicio <= mescladas[-1][1]:
+            mescladas[-1][1] = max(mescladas[-1][1], fim)
+        else:
+            mescladas.append([inicio, fim])
+    return [tuple(janela) for janela in mescladas]
+
+def gerar_quedas(rng, inicio, fim, quedas_por_hora, duracao_media):
+    """Quedas como processo de Poisson, com duração exponencial"""
+    janelas = []
+    if quedas_por_hora <= 0:
+        return janelas
+    instante = inicio
+    while True:
+        instante += rng.expovariate(quedas_por_hora / 3600.0)
+        if instante >= fim:
+            return janelas
+        janelas.append((instante, instante + rng.expovariate(1.0 / duracao_media)))
+
+class FirmwareESP32:
+    """Estado de um device rodando o main.ino"""
+
+    __slots__ = ("device_id", "boot", "enlace", "fonte", "wifi_conectado",
+                 "ultima_medicao", "ultimo_envio", "geracao")
+
+    def __init__(self, device_id, boot, enlace, fonte):
+        self.device_id = device_id
+        self.boot = boot
+        self.enlace = enlace
+        self.fonte = fonte
+        self.wifi_conectado = False
+        self.ultima_medicao = 0
+        self.ultimo_envio = None
+        self.geracao = 0
+
+    def millis(self, instante):
+        """millis() no instante virtual, com o estouro do unsigned long de 32 bits"""
+        return int((instante - self.boot) * 1000) & MASCARA_MILLIS
+
+    def medicao_devida(self, instante):
+        # Aritmética sem sinal, como no firmware: funciona através do estouro
+        return (self.millis(instante) - self.ultima_medicao) & MASCARA_MILLIS >= INTERVALO_MEDICAO_MS
+
+    def instante_medicao(self, instante):
+        """Instante virtual em que millis() - ultimaMedicao chega a intervaloMedicao"""
+        decorrido = (self.millis(instante) - self.ultima_medicao) & MASCARA_MILLIS
+        return instante + (INTERVALO_MEDICAO_MS - decorrido) / 1000.0
+
+class EmuladorFirmware:
+    """Frota de devices com o timing e a conectividade do firmware, em tempo virtual
+
+    Iterações do loop() sem nada a fazer (WiFi conectado e medição não devida)
+    são puladas: o device só acorda na iteração em que mede ou em que o
+    WiFi.status() passa a indicar a queda, então 24 h de uma frota custam
+    uma iteração a cada ~31 s por device, não uma por segundo.
+    """
+
+    def __init__(self, api_base_url=API_URL_PADRAO, num_dispositivos=10, prefixo="ESP32_",
+                 janela_boot=30.0, quedas_por_hora=0.5, duracao_media_queda=60.0,
+                 quedas_roteador=(), latencia_associacao=(0.5, 3.0), timeout_http=TIMEOUT_HTTP,
+                 modelo_umidade=None, seed=None, inicio=None, session=None, metricas=None,
+                 verbose=False):
+        self.api_base_url = api_base_url
+        self.num_dispositivos = num_dispositivos
+        self.prefixo = prefixo
+        self.janela_boot = janela_boot
+        self.quedas_por_hora = quedas_por_hora
+        self.duracao_media_queda = duracao_media_queda
+        # (início relativo, duração) em segundos: roteador fora para todos os devices
+        self.quedas_roteador = list(quedas_roteador)
+        self.latencia_associacao = latencia_associacao
+        self.timeout_http = timeout_http
+        self.modelo_umidade = modelo_umidade or GeradorUmidade(
+            dt=INTERVALO_MEDICAO_MS / 1000 + DELAY_LOOP, seed=seed)
+        self.verbose = verbose
+        self.rng = random.Random(seed)
+        self.relogio = RelogioVirtual(inicio)
+        self.agendador = AgendadorEventos(self.relogio)
+
+        self.session = session if session is not None else transporte_padrao().sessao()
+        if metricas is not None:
+            metricas.instrumentar_sessao(self.session)
+        # O firmware faz http.begin()/http.end() a cada envio: uma conexão TCP nova por POST
+        self.cabecalhos = {"Content-Type": "application/json", "Connection": "close"}
+
+        self.dispositivos = []
+        self.estatisticas = {
+            "medicoes": 0, "envios_ok": 0, "envios_rejeitados": 0, "erros_http": 0,
+            "perdidas_sem_wifi": 0, "conexoes_wifi": 0, "falhas_wifi": 0, "quedas_detectadas": 0,
+            "segundos_reconectando": 0.0, "estouros_millis": 0,
+        }
+        # Envios por segundo virtual, para medir as rajadas
+        self.envios_por_segundo = {}
+        self._soma_periodos = 0.0
+        self._periodos = 0
+
+    def _log(self, mensagem):
+        if self.verbose:
+            print(mensagem)
+
+    def _criar_dispositivos(self, inicio, fim):
+        quedas_globais = [(inicio + relativo, inicio + relativo + duracao)
+                          for relativo, duracao in self.quedas_roteador]
+        for i in range(1, self.num_dispositivos + 1):
+            janelas = quedas_globais + gerar_quedas(self.rng, inicio, fim, self.quedas_por_hora,
+                                                    self.duracao_media_queda)
+            dispositivo = FirmwareESP32(
+                f"{self.prefixo}{i:03d}", inicio + self.rng.uniform(0, self.janela_boot),
+                EnlaceWiFi(janelas), self.modelo_umidade.fluxo(bloco=256)
+            )
+            self.dispositivos.append(dispositivo)
+            self.agendador.agendar(dispositivo.boot, self._setup, dispositivo)
+
+    def conectar_wifi(self, dispositivo, instante):
+        """conectarWiFi(): retorna o tempo bloqueado, em segundos
+
+        WiFi.status() é consultado a cada 500 ms; a associação só termina
+        `latencia_associacao` depois de o roteador estar alcançável.
+        """
+        pronto = dispositivo.enlace.disponivel_a_partir(instante) + self.rng.uniform(*self.latencia_associacao)
+        tentativas = max(1, math.ceil((pronto - instante) / ESPERA_TENTATIVA_WIFI))
+        if tentativas <= TENTATIVAS_WIFI and dispositivo.enlace.disponivel(instante + tentativas * ESPERA_TENTATIVA_WIFI):
+            dispositivo.wifi_conectado = True
+            self.estatisticas["conexoes_wifi"] += 1
+            bloqueado = tentativas * ESPERA_TENTATIVA_WIFI
+        else:
+            dispositivo.wifi_conectado = False
+            self.estatisticas["falhas_wifi"] += 1
+            bloqueado = TENTATIVAS_WIFI * ESPERA_TENTATIVA_WIFI
+        self.estatisticas["segundos_reconectando"] += bloqueado
+        return bloqueado
+
+    def enviar_dados_api(self, dispositivo, umidade, instante):
+        """enviarDadosAPI(): retorna o tempo bloqueado no POST, em segundos"""
+        if not dispositivo.wifi_conectado or not dispositivo.enlace.disponivel(instante):
+            self.estatisticas["perdidas_sem_wifi"] += 1
+            return 0.0
+
+        millis = dispositivo.millis(instante)
+        corpo = corpo_leitura({"umidade_solo": umidade, "timestamp": millis,
+                               "device_id": dispositivo.device_id})
+        inicio = time.perf_counter()
+        try:
+            response = self.session.post(f"{self.api_base_url}/sensors", data=corpo,
+                                         headers=self.cabecalhos, timeout=self.timeout_http)
+        except requests.exceptions.RequestException as e:
+            # httpResponseCode < 0: o firmware só registra na serial e segue
+            self.estatisticas["erros_http"] += 1
+            self._log(f"❌ {dispositivo.device_id}: erro ao enviar dados ({type(e).__name__})")
+        else:
+            if response.ok:
+                self.estatisticas["envios_ok"] += 1
+            else:
+                self.estatisticas["envios_rejeitados"] += 1
+            segundo = int(instante)
+            self.envios_por_segundo[segundo] = self.envios_por_segundo.get(segundo, 0) + 1
+            if dispositivo.ultimo_envio is not None:
+                self._soma_periodos += instante - dispositivo.ultimo_envio
+                self._periodos += 1
+            dispositivo.ultimo_envio = instante
+            self._log(f"📤 {dispositivo.device_id}: {umidade}% millis={millis} -> {response.status_code}")
+        # O tempo real da requisição passa no relógio do device (o loop fica bloqueado)
+        return time.perf_counter() - inicio
+
+    def _setup(self, dispositivo):
+        instante = self.relogio() + self.conectar_wifi(dispositivo, self.relogio())
+        self.agendador.agendar(instante, self._loop, dispositivo, dispositivo.geracao)
+
+    def _loop(self, dispositivo, geracao):
+        if geracao != dispositivo.geracao:
+            return  # iteração substituída por outra agendada depois
+        instante = self.relogio()
+
+        if dispositivo.wifi_conectado and not dispositivo.enlace.disponivel(instante):
+            dispositivo.wifi_conectado = False
+            self.estatisticas["quedas_detectadas"] += 1
+        if not dispositivo.wifi_conectado:
+            self._log(f"📶 {dispositivo.device_id}: conexão WiFi perdida. Reconectando...")
+            instante += self.conectar_wifi(dispositivo, instante)
+
+        if dispositivo.medicao_devida(instante):
+            anterior = dispositivo.ultima_medicao
+            umidade = map_arduino(dispositivo.fonte.proximo_adc())
+            self.estatisticas["medicoes"] += 1
+            instante += self.enviar_dados_api(dispositivo, umidade, instante)
+            dispositivo.ultima_medicao = dispositivo.millis(instante)
+            if dispositivo.ultima_medicao < anterior:
+                self.estatisticas["estouros_millis"] += 1
+
+        instante += DELAY_LOOP
+        self.agendador.agendar(self._proxima_iteracao(dispositivo, instante), self._loop,
+                               dispositivo, dispositivo.geracao)
+
+    def _proxima_iteracao(self, dispositivo, instante):
+        """Pula as iterações ociosas: próxima medição ou a primeira após uma queda"""
+        if not dispositivo.wifi_conectado:
+            return instante
+        alvo = dispositivo.instante_medicao(instante)
+        queda = dispositivo.enlace.proxima_queda(instante)
+        if queda is not None and queda < alvo:
+            alvo = queda
+        if alvo <= instante:
+            return instante
+        return instante + math.ceil(alvo - instante - 1e-9) * DELAY_LOOP
+
+    def executar(self, duracao_simulada):
+        """Emula `duracao_simulada` segundos e retorna o resumo"""
+        inicio_virtual = self.relogio()
+        fim_virtual = inicio_virtual + duracao_simulada
+        self._criar_dispositivos(inicio_virtual, fim_virtual)
+
+        inicio_real = time.perf_counter()
+        self.agendador.executar(ate=fim_virtual)
+        tempo_real = time.perf_counter() - inicio_real
+        return self.resumo(duracao_simulada, tempo_real)
+
+    def resumo(self, duracao_simulada, tempo_real):
+        rajadas = sorted(self.envios_por_segundo.values())
+        return {
+            "dispositivos": len(self.dispositivos),
+            **self.estatisticas,
+            "periodo_medio_envio_segundos": self._soma_periodos / self._periodos if self._periodos else 0,
+            "rajada_maxima_por_segundo": rajadas[-1] if rajadas else 0,
+            "rajada_p99_por_segundo": rajadas[min(len(rajadas) - 1, int(len(rajadas) * 0.99))] if rajadas else 0,
+            "eventos": self.agendador.executados,
+            "tempo_simulado_segundos": duracao_simulada,
+            "tempo_real_segundos": tempo_real,
+            "aceleracao": duracao_simulada / tempo_real if tempo_real else float("inf"),
+        }
+
+def main():
+    print("📟 EMULADOR DO FIRMWARE ESP32 (main.ino)")
+    print("=" * 60)
+
+    api_url = input(f"URL da API (padrão: {API_URL_PADRAO}): ").strip() or API_URL_PADRAO
+    try:
+        num_dispositivos = int(input("Número de devices (padrão: 10): ") or "10")
+        horas = float(input("Tempo simulado em horas (padrão: 1): ") or "1")
+        janela_boot = float(input("Janela de boot em segundos (0 = todos ligam juntos, padrão: 30): ") or "30")
+        quedas = float(input("Quedas de WiFi por device por hora (padrão: 0.5): ") or "0.5")
+        queda_roteador = float(input("Queda do roteador aos X minutos (0 = nenhuma, padrão: 0): ") or "0")
+    except ValueError:
+        num_dispositivos, horas, janela_boot, quedas, queda_roteador = 10, 1.0, 30.0, 0.5, 0.0
+
+    emulador = EmuladorFirmware(
+        api_url, num_dispositivos=num_dispositivos, janela_boot=janela_boot, quedas_por_hora=quedas,
+        quedas_roteador=[(queda_roteador * 60, 120.0)] if queda_roteador > 0 else ()
+    )
+    print(f"\n🚀 Emulando {horas} horas de {num_dispositivos} devices...")
+    try:
+        resumo = emulador.executar(horas * 3600)
+    except KeyboardInterrupt:
+        print("\n⏹️  Emulação interrompida pelo usuário")
+        return
+
+    print("\n" + "=" * 60)
+    print("🏁 EMULAÇÃO FINALIZADA")
+    print("=" * 60)
+    print(f"📏 Medições: {resumo['medicoes']} | enviadas: {resumo['envios_ok']} | "
+          f"perdidas sem WiFi: {resumo['perdidas_sem_wifi']} | erros HTTP: {resumo['erros_http']}")
+    print(f"⏱️  Período médio entre envios: {resumo['periodo_medio_envio_segundos']:.2f}s")
+    print(f"📶 Quedas detectadas: {resumo['quedas_detectadas']} | conexões: {resumo['conexoes_wifi']} | "
+          f"tentativas falhas: {resumo['falhas_wifi']} ({resumo['segundos_reconectando']:.0f}s bloqueado)")
+    print(f"💥 Rajada máxima: {resumo['rajada_maxima_por_segundo']} envios/s "
+          f"(p99 {resumo['rajada_p99_por_segundo']})")
+    print(f"⏩ Aceleração: {resumo['aceleracao']:.0f}x")
+
+if __name__ == "__main__":
+    main()
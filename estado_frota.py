@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Estado da frota em colunas (struct-of-arrays)
+Em vez de um ESP32Simulator por device (atributos em dict e uma sessão HTTP
+cada), a frota guarda umidade, bomba, início do acionamento, próximo ciclo,
+base e variação em arrays NumPy indexados por um inteiro por device. O
+controle por histerese de controlar_bomba_automatico roda numa única passada
+vetorizada sobre os devices com ciclo vencido. FrotaVetorizada roda a frota
+contra a API sobre esse estado (modo `vetorizada` do regador_cli).
+
+    python estado_frota.py   # memória e CPU por tick: objetos x arrays (100 mil devices)
+"""
+
+import asyncio
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from controle_bomba import ControleHisterese
+from frota_esp32 import FrotaESP32
+from lote_sensores import serializar_lote
+from payloads import corpo_controle
+from simulador_esp32 import API_URL_PADRAO
+
+def _coluna(nome, doc):
+    """Propriedade que expõe só a parte ocupada de uma coluna (view, aceita atribuição)"""
+    return property(lambda self: self._colunas[nome][:self.tamanho], doc=doc)
+
+class EstadoFrota:
+    """Colunas de estado de N devices; device_id -> índice por um dict de strings internadas
+
+    Os arrays crescem dobrando de capacidade, como um vetor dinâmico; as
+    operações recebem e retornam arrays de índices.
+    """
+
+    umidade = _coluna("umidade", "Última leitura de cada device (%)")
+    bomba = _coluna("bomba", "Bomba ligada")
+    inicio_bomba = _coluna("inicio_bomba", "Instante em que a bomba ligou (NaN se desligada)")
+    proximo = _coluna("proximo", "Instante do próximo ciclo")
+    base = _coluna("base", "Umidade base (base_humidity)")
+    variacao = _coluna("variacao", "Variação da leitura em torno da base (humidity_variation)")
+
+    def __init__(self, intervalo=5.0, jitter=0.0, controle=None, prob_evento=0.1, capacidade=1024, seed=None):
+        self.intervalo = intervalo
+        self.jitter = jitter
+        self.controle = controle or ControleHisterese()
+        # Eventos aleatórios do simulador: chance por ciclo de inverter a bomba
+        self.prob_evento = prob_evento
+        self.rng = np.random.default_rng(seed)
+
+        self.ids = []
+        self.indices = {}
+        self.tamanho = 0
+        self._alocar(capacidade)
+
+    def _alocar(self, capacidade):
+        antigos = getattr(self, "_colunas", None)
+        self._colunas = {
+            "umidade": np.zeros(capacidade, dtype=np.int8),
+            "bomba": np.zeros(capacidade, dtype=bool),
+            "inicio_bomba": np.full(capacidade, np.nan),
+            "proximo": np.zeros(capacidade),
+            "base": np.zeros(capacidade, dtype=np.float32),
+            "variacao": np.zeros(capacidade, dtype=np.float32),
+        }
+        if antigos is not None:
+            for nome, coluna in antigos.items():
+                self._colunas[nome][:self.tamanho] = coluna[:self.tamanho]
+        self.capacidade = capacidade
+
+    def __len__(self):
+        return self.tamanho
+
+    def adicionar(self, device_id, base_humidity=60, humidity_variation=20, proximo=0.0):
+        """Registra um device (ou devolve o índice se já existe)"""
+        device_id = sys.intern(device_id)
+        indice = self.indices.get(device_id)
+        if indice is not None:
+            return indice
+        if self.tamanho == self.capacidade:
+            self._alocar(self.capacidade * 2)
+        indice = self.tamanho
+        self.tamanho += 1
+        self.ids.append(device_id)
+        self.indices[device_id] = indice
+        colunas = self._colunas
+        colunas["base"][indice] = base_humidity
+        colunas["variacao"][indice] = humidity_variation
+        colunas["proximo"][indice] = proximo
+        return indice
+
+    def adicionar_varios(self, device_ids, base_humidity=60, humidity_variation=20, fase_aleatoria=True, agora=0.0):
+        """Registra vários devices; com fase aleatória os primeiros ciclos se espalham no intervalo"""
+        device_ids = [sys.intern(device_id) for device_id in device_ids if device_id not in self.indices]
+        necessario = self.tamanho + len(device_ids)
+        if necessario > self.capacidade:
+            self._alocar(max(necessario, self.capacidade * 2))
+        inicio, fim = self.tamanho, necessario
+        self.ids.extend(device_ids)
+        self.indices.update(zip(device_ids, range(inicio, fim)))
+        self.tamanho = fim
+        colunas = self._colunas
+        colunas["base"][inicio:fim] = base_humidity
+        colunas["variacao"][inicio:fim] = humidity_variation
+        fase = self.rng.uniform(0, self.intervalo, fim - inicio) if fase_aleatoria else 0.0
+        colunas["proximo"][inicio:fim] = agora + fase
+        return np.arange(inicio, fim)
+
+    def indice(self, device_id):
+        return self.indices[device_id]
+
+    def devidos(self, agora):
+        """Índices dos devices com ciclo vencido até `agora`"""
+        return np.flatnonzero(self.proximo <= agora)
+
+    def gerar_umidade(self, indices):
+        """Leituras como gerar_leitura: base ± variação uniforme, truncada para inteiro e limitada a 0-100"""
+        base = self.base[indices]
+        variacao = self.variacao[indices]
+        valores = base + self.rng.uniform(-1.0, 1.0, indices.size) * variacao
+        return np.clip(np.trunc(valores), 0, 100).astype(np.int8)
+
+    def passo(self, agora, umidade=None):
+        """Um tick: gera as leituras dos devices vencidos e decide a bomba de todos de uma vez
+
+        `umidade` (do mesmo tamanho que os devidos) substitui as leituras
+        geradas, ex.: vindas do modelo físico. Retorna um dict com os índices
+        processados, as leituras, os índices a ativar/desativar e os que tiveram
+        evento aleatório. O estado da bomba só muda em registrar_bomba(),
+        depois que a API confirmar.
+        """
+        indices = self.devidos(agora)
+        leituras = self.gerar_umidade(indices) if umidade is None else np.asarray(umidade, dtype=np.int8)
+        self.umidade[indices] = leituras
+
+        bomba = self.bomba[indices]
+        ativar, desativar = self.controle.decidir_vetor(leituras, bomba)
+        evento = np.zeros(indices.size, dtype=bool)
+        if self.prob_evento:
+            # Como no ciclo do simulador, o evento aleatório inverte a bomba depois
+            # da histerese; ligar e desligar no mesmo ciclo se anulam
+            evento = self.rng.random(indices.size) < self.prob_evento
+            final = ((bomba | ativar) & ~desativar) ^ evento
+            ativar = final & ~bomba
+            desativar = ~final & bomba
+
+        proximo = self.proximo
+        passo = self.intervalo
+        if self.jitter:
+            passo = passo + self.rng.uniform(-self.jitter, self.jitter, indices.size)
+        proximo[indices] += passo
+        return {
+            "indices": indices,
+            "umidade": leituras,
+            "ativar": indices[ativar],
+            "desativar": indices[desativar],
+            "eventos": indices[evento],
+        }
+
+    def registrar_bomba(self, indices, ligada, agora):
+        """Aplica o novo estado da bomba (depois da resposta da API); retorna as durações ao desligar"""
+        bomba = self.bomba
+        inicio_bomba = self.inicio_bomba
+        if ligada:
+            indices = indices[~bomba[indices]]
+            bomba[indices] = True
+            inicio_bomba[indices] = agora
+            return None
+        indices = indices[bomba[indices]]
+        duracoes = agora - inicio_bomba[indices]
+        bomba[indices] = False
+        inicio_bomba[indices] = np.nan
+        return duracoes
+
+    def leituras(self, indices, agora):
+        """Leituras no formato de POST /sensors, para envio em lote (serializar_lote)"""
+        timestamp = int(agora * 1000)
+        ids = self.ids
+        return [{"umidade_solo": umidade, "timestamp": timestamp, "device_id": ids[i]}
+                for i, umidade in zip(indices.tolist(), self.umidade[indices].tolist())]
+
+    def resumo(self, agora):
+        bomba = self.bomba
+        ligadas = np.flatnonzero(bomba)
+        return {
+            "dispositivos": self.tamanho,
+            "bombas_ligadas": int(ligadas.size),
+            "umidade_media": float(self.umidade.mean()) if self.tamanho else 0.0,
+            "maior_acionamento_segundos": float(np.max(agora - self.inicio_bomba[ligadas])) if ligadas.size else 0.0,
+            "bytes_colunas": sum(coluna.nbytes for coluna in self._colunas.values()),
+        }
+
+class FrotaVetorizada(FrotaESP32):
+    """FrotaESP32 sobre um EstadoFrota: um único loop de ticks em vez de uma corrotina por device
+
+    A cada tick os devices com ciclo vencido geram a leitura e passam pela
+    histerese de uma vez; as leituras vão em lotes (POST /sensors com array)
+    e os comandos da bomba, um por device que mudou, só alteram o estado
+    depois do 200 da API. `resolucao` é o intervalo mínimo entre ticks, que
+    agrupa os devices com vencimentos próximos. Só controle local.
+    """
+
+    def __init__(self, api_base_url=API_URL_PADRAO, num_dispositivos=100, intervalo=5.0, jitter=0.5,
+                 prefixo="ESP32_SIM_", max_leituras_lote=500, resolucao=0.5, controle=None,
+                 prob_evento=0.1, seed=None, **kwargs):
+        super().__init__(api_base_url, num_dispositivos=0, intervalo=intervalo, jitter=jitter, seed=seed, **kwargs)
+        self.controle = controle or self.controle
+        self.max_leituras_lote = max_leituras_lote
+        self.resolucao = resolucao
+        self.ticks = 0
+        self.estado = EstadoFrota(intervalo, jitter, self.controle, prob_evento,
+                                  capacidade=max(1, num_dispositivos), seed=seed)
+        # Fases relativas; passam a valer a partir do início da execução
+        self.estado.adicionar_varios(f"{prefixo}{i:05d}" for i in range(1, num_dispositivos + 1))
+
+    async def _comandar(self, sessao, indices, acao, eventos, agora):
+        """Envia o comando aos devices e registra no estado só os confirmados"""
+        if not indices.size:
+            return
+        ids = self.estado.ids
+        evento = np.isin(indices, eventos)
+        resultados = await asyncio.gather(*(
+            self._requisicao(sessao, "POST", f"/pump/{ids[i]}/control", "/pump/{id}/control",
+                             data=corpo_controle(acao, "Simulação - evento aleatório" if e
+                                                 else self.controle.motivo(acao), "automatic"))
+            for i, e in zip(indices.tolist(), evento.tolist())
+        ))
+        confirmados = np.fromiter((bool(r and r[0] == 200) for r in resultados), dtype=bool, count=indices.size)
+        self.estado.registrar_bomba(indices[confirmados], acao == "activate", agora)
+
+    async def _tick(self, sessao, agora):
+        passo = self.estado.passo(agora)
+        indices = passo["indices"]
+        if not indices.size:
+            return
+        leituras = self.estado.leituras(indices, agora)
+        await asyncio.gather(*(
+            self._requisicao(sessao, "POST", "/sensors", "/sensors (lote)",
+                             data=serializar_lote(leituras[i:i + self.max_leituras_lote]))
+            for i in range(0, len(leituras), self.max_leituras_lote)
+        ))
+        await asyncio.gather(self._comandar(sessao, passo["ativar"], "activate", passo["eventos"], agora),
+                             self._comandar(sessao, passo["desativar"], "deactivate", passo["eventos"], agora))
+        self.ticks += 1
+
+    async def _loop_ticks(self, sessao, fim):
+        loop = asyncio.get_running_loop()
+        self.estado.proximo[:] += time.time()
+        while self.is_running and loop.time() < fim:
+            inicio_tick = loop.time()
+            await self._tick(sessao, time.time())
+            espera = float(self.estado.proximo.min()) - time.time() if len(self.estado) else self.intervalo
+            await asyncio.sleep(max(0.0, espera, self.resolucao - (loop.time() - inicio_tick)))
+
+    def _loops(self, sessao, fim):
+        return [self._loop_ticks(sessao, fim)]
+
+    def resumo(self):
+        resumo = super().resumo()
+        resumo["dispositivos"] = len(self.estado)
+        resumo["ticks"] = self.ticks
+        resumo["estado"] = self.estado.resumo(time.time())
+        return resumo
+
+def _memoria(construir):
+    """(objeto, bytes alocados) medidos com tracemalloc (NumPy registra as suas alocações)"""
+    tracemalloc.start()
+    antes = tracemalloc.get_traced_memory()[0]
+    objeto = construir()
+    depois = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return objeto, depois - antes
+
+def _tempo_tick(funcao, repeticoes):
+    """Segundos por tick (melhor de `repeticoes`)"""
+    melhor = float("inf")
+    for i in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao(i)
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor
+
+def benchmark(num_dispositivos=100_000, repeticoes=5, amostra_sessoes=500, prefixo="ESP32_SIM_"):
+    """Memória e CPU por tick de N ESP32Simulator x EstadoFrota, sem rede
+
+    O tick dos objetos é o trabalho local de cada ciclo do simulador: gerar a
+    leitura, decidir pela histerese e atualizar o estado da bomba. Os
+    simuladores compartilham uma sessão (o caso mais barato); o custo com uma
+    sessão e um pool de conexões (TransporteHTTP) por device é estimado por uma
+    amostra. Sem transporte próprio o ESP32Simulator usaria o pool do
+    transporte_padrao(), e a estimativa sairia baixa.
+    """
+    import random
+
+    from simulador_esp32 import ESP32Simulator, gerar_leitura
+    from transporte_http import TransporteHTTP
+    from transporte_resiliente import SessaoResiliente
+
+    ids = [f"{prefixo}{i:05d}" for i in range(1, num_dispositivos + 1)]
+    rng = random.Random(1)
+
+    def criar_simuladores():
+        sessao = SessaoResiliente()
+        simuladores = []
+        for device_id in ids:
+            simulador = ESP32Simulator("http://127.0.0.1:3000/api", session=sessao, verbosidade=0)
+            simulador.device_id = device_id
+            simuladores.append(simulador)
+        return simuladores
+
+    simuladores, bytes_objetos = _memoria(criar_simuladores)
+    _, bytes_amostra = _memoria(lambda: [ESP32Simulator(verbosidade=0, transporte=TransporteHTTP())
+                                         for _ in range(amostra_sessoes)])
+
+    def tick_objetos(i):
+        agora = float(i)
+        for simulador in simuladores:
+            dados = gerar_leitura(simulador.device_id, simulador.base_humidity, simulador.humidity_variation,
+                                  rng, None, simulador.pump_active, agora)
+            acao = simulador.controle.decidir(dados['umidade_solo'], simulador.pump_active)
+            if acao == "activate":
+                simulador.pump_active, simulador.pump_start_time = True, agora
+            elif acao:
+                simulador.pump_active, simulador.pump_start_time = False, None
+
+    def criar_estado():
+        estado = EstadoFrota(intervalo=1.0, prob_evento=0.0, seed=1)
+        estado.adicionar_varios(ids, fase_aleatoria=False)
+        return estado
+
+    estado, bytes_arrays = _memoria(criar_estado)
+
+    def tick_arrays(i, com_leituras=False):
+        agora = float(i + 1)
+        resultado = estado.passo(agora)
+        estado.registrar_bomba(resultado["ativar"], True, agora)
+        estado.registrar_bomba(resultado["desativar"], False, agora)
+        if com_leituras:
+            estado.leituras(resultado["indices"], agora)
+
+    tempo_objetos = _tempo_tick(tick_objetos, repeticoes)
+    tempo_arrays = _tempo_tick(tick_arrays, repeticoes)
+    tempo_arrays_leituras = _tempo_tick(lambda i: tick_arrays(i + repeticoes, True), repeticoes)
+    del simuladores
+
+    return {
+        "dispositivos": num_dispositivos,
+        "memoria_bytes": {
+            "objetos_sessao_compartilhada": bytes_objetos,
+            "objetos_sessao_propria_estimada": bytes_amostra / amostra_sessoes * num_dispositivos,
+            "arrays": bytes_arrays,
+            "arrays_so_colunas": estado.resumo(0.0)["bytes_colunas"],
+        },
+        "tick_segundos": {
+            "objetos": tempo_objetos,
+            "arrays": tempo_arrays,
+            "arrays_com_leituras": tempo_arrays_leituras,
+        },
+    }
+
+def main():
+    print("🧮 ESTADO DA FROTA - OBJETOS x ARRAYS")
+    print("=" * 60)
+    try:
+        num_dispositivos = int(input("Número de devices (padrão: 100000): ") or "100000")
+    except ValueError:
+        num_dispositivos = 100_000
+
+    print(f"\n⏱️  Medindo {num_dispositivos:,} devices (sem rede)...")
+    r = benchmark(num_dispositivos)
+    memoria, tick = r["memoria_bytes"], r["tick_segundos"]
+    n = r["dispositivos"]
+    print(f"\n💾 Memória:")
+    print(f"   ESP32Simulator (sessão compartilhada): {memoria['objetos_sessao_compartilhada'] / 1e6:9.1f} MB "
+          f"({memoria['objetos_sessao_compartilhada'] / n:,.0f} B/device)")
+    print(f"   ESP32Simulator (sessão própria, est.): {memoria['objetos_sessao_propria_estimada'] / 1e6:9.1f} MB "
+          f"({memoria['objetos_sessao_propria_estimada'] / n:,.0f} B/device)")
+    print(f"   EstadoFrota (colunas + ids):           {memoria['arrays'] / 1e6:9.1f} MB "
+          f"({memoria['arrays'] / n:,.0f} B/device)")
+    print(f"\n⚡ CPU por tick (todos os devices vencidos):")
+    print(f"   ESP32Simulator:               {tick['objetos'] * 1000:8.1f} ms")
+    print(f"   EstadoFrota:                  {tick['arrays'] * 1000:8.1f} ms "
+          f"({tick['objetos'] / tick['arrays']:.0f}x)")
+    print(f"   EstadoFrota + dicts p/ envio: {tick['arrays_com_leituras'] * 1000:8.1f} ms")
+
+if __name__ == "__main__":
+    main()
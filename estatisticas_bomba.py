@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Estatísticas locais das bombas, incrementais
+Cada acionamento/desligamento atualiza em O(1) a média e a variância das
+durações (algoritmo de Welford), o ciclo de trabalho de cada device e o
+consumo de água em janelas deslizantes (1 h e 24 h), por device e da frota.
+Os totais seguem as mesmas regras de /pump/{id}/stats, então servem para
+conferir o servidor em escala sem consultar a API a cada análise.
+"""
+
+import math
+import time
+from collections import deque
+
+import requests
+
+# Bomba pequena de 12 V usada em irrigação por gotejamento
+VAZAO_PADRAO_LITROS_POR_MINUTO = 1.5
+JANELAS_PADRAO = (3600, 24 * 3600)
+
+class EstatisticaCorrente:
+    """Contagem, média, variância, mínimo e máximo em uma passada (Welford)"""
+
+    __slots__ = ("n", "media", "m2", "minimo", "maximo")
+
+    def __init__(self):
+        self.n = 0
+        self.media = 0.0
+        self.m2 = 0.0
+        self.minimo = None
+        self.maximo = None
+
+    def adicionar(self, valor):
+        self.n += 1
+        delta = valor - self.media
+        self.media += delta / self.n
+        self.m2 += delta * (valor - self.media)
+        if self.minimo is None or valor < self.minimo:
+            self.minimo = valor
+        if self.maximo is None or valor > self.maximo:
+            self.maximo = valor
+
+    def mesclar(self, outra):
+        """Combina com outra estatística (Chan et al.), ex.: vinda de outro processo"""
+        if not outra.n:
+            return
+        if not self.n:
+            self.n, self.media, self.m2 = outra.n, outra.media, outra.m2
+            self.minimo, self.maximo = outra.minimo, outra.maximo
+            return
+        n = self.n + outra.n
+        delta = outra.media - self.media
+        self.media += delta * outra.n / n
+        self.m2 += outra.m2 + delta * delta * self.n * outra.n / n
+        self.n = n
+        self.minimo = min(self.minimo, outra.minimo)
+        self.maximo = max(self.maximo, outra.maximo)
+
+    @property
+    def total(self):
+        return self.media * self.n
+
+    @property
+    def variancia(self):
+        """Variância amostral (0 com menos de duas amostras)"""
+        return self.m2 / (self.n - 1) if self.n > 1 else 0.0
+
+    @property
+    def desvio_padrao(self):
+        return math.sqrt(self.variancia)
+
+class SomaJanela:
+    """Soma dos valores registrados nos últimos `largura` segundos
+
+    Os eventos ficam numa fila em ordem de tempo; os que saem da janela são
+    descontados ao consultar ou inserir, então o custo amortizado é O(1).
+    """
+
+    __slots__ = ("largura", "eventos", "soma")
+
+    def __init__(self, largura):
+        self.largura = largura
+        self.eventos = deque()
+        self.soma = 0.0
+
+    def _expirar(self, agora):
+        limite = agora - self.largura
+        eventos = self.eventos
+        while eventos and eventos[0][0] <= limite:
+            self.soma -= eventos.popleft()[1]
+        if not eventos:
+            self.soma = 0.0  # descarta o erro de arredondamento acumulado
+
+    def adicionar(self, instante, valor):
+        self._expirar(instante)
+        self.eventos.append((instante, valor))
+        self.soma += valor
+
+    def total(self, agora):
+        self._expirar(agora)
+        return self.soma
+
+class EstadoBombaLocal:
+    """Acumuladores de um device"""
+
+    __slots__ = ("ativacoes", "duracoes", "ligada_desde", "janelas")
+
+    def __init__(self, janelas):
+        self.ativacoes = 0
+        self.duracoes = EstatisticaCorrente()
+        self.ligada_desde = None
+        self.janelas = {largura: SomaJanela(largura) for largura in janelas}
+
+class EstatisticasBomba:
+    """Estatísticas de bomba de uma frota, atualizadas a cada evento
+
+    A água de um acionamento entra nas janelas inteira, no instante em que a
+    bomba desliga; o acionamento em andamento entra só com a parte dentro da
+    janela. `relogio` segue o do simulador (relógio virtual no modo acelerado).
+    """
+
+    def __init__(self, vazao_litros_por_minuto=VAZAO_PADRAO_LITROS_POR_MINUTO, janelas=JANELAS_PADRAO,
+                 relogio=time.time, inicio=None):
+        self.vazao = vazao_litros_por_minuto / 60.0
+        self.larguras = tuple(janelas)
+        self.relogio = relogio
+        self.inicio = relogio() if inicio is None else inicio
+        self.dispositivos = {}
+        # Agregados da frota, mantidos junto com os de cada device
+        self.ativacoes = 0
+        self.duracoes = EstatisticaCorrente()
+        self.janelas = {largura: SomaJanela(largura) for largura in self.larguras}
+        self.ligadas = set()
+
+    def _estado(self, device_id):
+        estado = self.dispositivos.get(device_id)
+        if estado is None:
+            estado = self.dispositivos[device_id] = EstadoBombaLocal(self.larguras)
+        return estado
+
+    def ativou(self, device_id, instante=None):
+        """Bomba ligada; repetir a ativação de uma bomba já ligada não conta (como no servidor)"""
+        estado = self._estado(device_id)
+        if estado.ligada_desde is not None:
+            return
+        estado.ligada_desde = self.relogio() if instante is None else instante
+        estado.ativacoes += 1
+        self.ativacoes += 1
+        self.ligadas.add(device_id)
+
+    def desativou(self, device_id, instante=None):
+        """Bomba desligada; retorna a duração do acionamento (None se já estava desligada)"""
+        estado = self._estado(device_id)
+        if estado.ligada_desde is None:
+            return None
+        instante = self.relogio() if instante is None else instante
+        duracao = max(0.0, instante - estado.ligada_desde)
+        estado.ligada_desde = None
+        estado.duracoes.adicionar(duracao)
+        self.duracoes.adicionar(duracao)
+        self.ligadas.discard(device_id)
+        litros = duracao * self.vazao
+        for largura in self.larguras:
+            estado.janelas[largura].adicionar(instante, litros)
+            self.janelas[largura].adicionar(instante, litros)
+        return duracao
+
+    def _em_andamento(self, estado, agora, largura=None):
+        if estado.ligada_desde is None:
+            return 0.0
+        inicio = estado.ligada_desde if largura is None else max(estado.ligada_desde, agora - largura)
+        return max(0.0, agora - inicio)
+
+    def _agua(self, janelas, em_andamento, agora):
+        return {f"agua_litros_{_rotulo(largura)}": janelas[largura].total(agora) + em_andamento(largura) * self.vazao
+                for largura in self.larguras}
+
+    def resumo_dispositivo(self, device_id, agora=None):
+        """Totais no formato de /pump/{id}/stats mais variância, ciclo de trabalho e água"""
+        agora = self.relogio() if agora is None else agora
+        estado = self._estado(device_id)
+        total = estado.duracoes.total + self._em_andamento(estado, agora)
+        observado = agora - self.inicio
+        return {
+            "total_activations": estado.ativacoes,
+            "total_duration_seconds": total,
+            "avg_duration_seconds": total / estado.ativacoes if estado.ativacoes else 0,
+            "desvio_padrao_segundos": estado.duracoes.desvio_padrao,
+            "min_duracao_segundos": estado.duracoes.minimo or 0.0,
+            "max_duracao_segundos": estado.duracoes.maximo or 0.0,
+            "ativa": estado.ligada_desde is not None,
+            "ciclo_trabalho": total / observado if observado > 0 else 0.0,
+            **self._agua(estado.janelas, lambda largura: self._em_andamento(estado, agora, largura), agora),
+        }
+
+    def resumo_frota(self, agora=None):
+        """Agregado da frota; o em andamento percorre só os devices com bomba ligada"""
+        agora = self.relogio() if agora is None else agora
+        ligados = [self.dispositivos[device_id] for device_id in self.ligadas]
+        total = self.duracoes.total + sum(self._em_andamento(e, agora) for e in ligados)
+        observado = (agora - self.inicio) * len(self.dispositivos)
+        return {
+            "dispositivos": len(self.dispositivos),
+            "bombas_ligadas": len(self.ligadas),
+            "total_activations": self.ativacoes,
+            "total_duration_seconds": total,
+            "media_duracao_segundos": self.duracoes.media,
+            "desvio_padrao_segundos": self.duracoes.desvio_padrao,
+            "ciclo_trabalho_medio": total / observado if observado > 0 else 0.0,
+            **self._agua(self.janelas,
+                         lambda largura: sum(self._em_andamento(e, agora, largura) for e in ligados), agora),
+        }
+
+    def conferir_servidor(self, device_id, stats_servidor, tolerancia_segundos=2.0, agora=None):
+        """Compara com o 'stats' de /pump/{id}/stats; retorna a lista de divergências
+
+        O servidor mede as durações no próprio relógio e arredonda para 0,1 s,
+        por isso a tolerância nas durações.
+        """
+        local = self.resumo_dispositivo(device_id, agora)
+        divergencias = []
+        if stats_servidor.get("total_activations") != local["total_activations"]:
+            divergencias.append(f"total_activations: servidor {stats_servidor.get('total_activations')}, "
+                                f"local {local['total_activations']}")
+        for campo in ("total_duration_seconds", "avg_duration_seconds"):
+            servidor = stats_servidor.get(campo)
+            if servidor is None or abs(servidor - local[campo]) > tolerancia_segundos:
+                divergencias.append(f"{campo}: servidor {servidor}, local {local[campo]:.1f}")
+        return divergencias
+
+def conferir_frota(api_base_url, estatisticas, dispositivos=None, sessao=None, tolerancia_segundos=2.0):
+    """Busca /pump/{id}/stats de cada device e retorna {device_id: divergências} dos que não conferem"""
+    from transporte_http import transporte_padrao
+
+    sessao = sessao or transporte_padrao().sessao()
+    divergentes = {}
+    for device_id in dispositivos or list(estatisticas.dispositivos):
+        try:
+            response = sessao.get(f"{api_base_url}/pump/{device_id}/stats", timeout=10)
+            response.raise_for_status()
+            stats = response.json()['data']['stats']
+        except (requests.exceptions.RequestException, ValueError, KeyError) as e:
+            divergentes[device_id] = [f"erro ao buscar estatísticas: {e}"]
+            continue
+        divergencias = estatisticas.conferir_servidor(device_id, stats, tolerancia_segundos)
+        if divergencias:
+            divergentes[device_id] = divergencias
+    return divergentes
+
+def _rotulo(largura):
+    if largura % 3600 == 0:
+        return f"{largura // 3600}h"
+    return f"{largura}s"
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Simulação acelerada por eventos discretos
+Um relógio virtual e uma fila de eventos substituem o time.sleep(5): os ciclos
+dos devices, acionamentos da bomba e chamadas à API rodam tão rápido quanto o
+backend responde, usando a mesma lógica do ESP32Simulator
+"""
+
+import heapq
+import random
+import time
+
+from cache_status import CacheStatus
+from estatisticas_bomba import EstatisticasBomba
+from lote_sensores import AgrupadorLeituras
+from simulador_esp32 import API_URL_PADRAO, ESP32Simulator
+from transporte_http import resumo_conexoes, transporte_padrao
+
+class RelogioVirtual:
+    """Relógio em segundos (epoch) que só avança quando o agendador manda"""
+
+    def __init__(self, inicio=None):
+        self.agora = time.time() if inicio is None else inicio
+
+    def __call__(self):
+        return self.agora
+
+    def avancar_para(self, instante):
+        if instante > self.agora:
+            self.agora = instante
+
+class AgendadorEventos:
+    """Fila de prioridade de eventos (instante, ação) sobre um relógio virtual"""
+
+    def __init__(self, relogio):
+        self.relogio = relogio
+        self._fila = []
+        self._sequencia = 0
+        self.executados = 0
+
+    def __len__(self):
+        return len(self._fila)
+
+    def agendar(self, instante, acao, *args):
+        # A sequência desempata eventos no mesmo instante pela ordem de agendamento
+        heapq.heappush(self._fila, (instante, self._sequencia, acao, args))
+        self._sequencia += 1
+
+    def agendar_em(self, atraso, acao, *args):
+        self.agendar(self.relogio() + atraso, acao, *args)
+
+    def executar(self, ate=None):
+        """Executa os eventos em ordem até o instante `ate` (ou até esvaziar a fila)"""
+        while self._fila and (ate is None or self._fila[0][0] <= ate):
+            instante, _, acao, args = heapq.heappop(self._fila)
+            self.relogio.avancar_para(instante)
+            acao(*args)
+            self.executados += 1
+        if ate is not None:
+            self.relogio.avancar_para(ate)
+
+class SimulacaoAcelerada:
+    """Frota de ESP32Simulator em tempo virtual"""
+
+    def __init__(self, api_base_url=API_URL_PADRAO, num_dispositivos=10, intervalo=5.0,
+                 jitter=0.0, prefixo="ESP32_SIM_", controle_local=True, modelo_umidade=None,
+                 max_leituras_lote=None, seed=None, inicio=None, verbose=False, metricas=None,
+                 cache_status=False, estatisticas_bomba=False, politica_transmissao=None, transporte=None,
+                 agendador_controle=None):
+        self.api_base_url = api_base_url
+        self.intervalo = intervalo
+        self.jitter = jitter
+        self.verbose = verbose
+        self.metricas = metricas
+        self.rng = random.Random(seed)
+        self.relogio = RelogioVirtual(inicio)
+        self.agendador = AgendadorEventos(self.relogio)
+
+        # Uma única sessão (pool de conexões do transporte) para todos os devices
+        self.transporte = transporte or transporte_padrao()
+        self.sessao = self.transporte.sessao()
+        self.sessao.hooks["response"].append(self._contar_resposta)
+        self.requisicoes = 0
+        self.ciclos = 0
+        # Um cache para a frota (as chaves incluem o device), no relógio virtual
+        self.cache = CacheStatus(relogio=self.relogio, metricas=metricas) if cache_status else None
+        self.estatisticas_bomba = EstatisticasBomba(relogio=self.relogio) if estatisticas_bomba else None
+        # Uma política (politica_transmissao.py) guarda o estado de todos os devices
+        self.politica_transmissao = politica_transmissao
+        # Um agendador preditivo (agendador_preditivo.py) com a fila da frota inteira
+        self.agendador_controle = agendador_controle
+
+        self.simuladores = []
+        for i in range(1, num_dispositivos + 1):
+            agrupador = None
+            if max_leituras_lote:
+                agrupador = AgrupadorLeituras(max_leituras=max_leituras_lote,
+                                              max_idade=intervalo * max_leituras_lote,
+                                              relogio=self.relogio)
+            simulador = ESP32Simulator(
+                api_base_url, agrupador=agrupador, controle_local=controle_local,
+                fonte_umidade=modelo_umidade.fluxo(bloco=256) if modelo_umidade else None,
+                session=self.sessao, relogio=self.relogio, rng=self.rng,
+                # A saída por ciclo de milhares de devices vira o gargalo; só no modo verbose
+                metricas=metricas, verbosidade=2 if verbose else 0, cache=self.cache,
+                estatisticas_bomba=self.estatisticas_bomba, politica_transmissao=politica_transmissao,
+                agendador_controle=agendador_controle
+            )
+            simulador.device_id = f"{prefixo}{i:05d}"
+            simulador.intervalo = intervalo
+            self.simuladores.append(simulador)
+
+    def _contar_resposta(self, response, *args, **kwargs):
+        # Respostas servidas pelo cache não foram à rede
+        if response.headers.get("X-Cache") != "HIT":
+            self.requisicoes += 1
+
+    def _ciclo(self, simulador, ciclo):
+        simulador.executar_ciclo(ciclo)
+        self.ciclos += 1
+        if simulador.is_running:
+            atraso = simulador.intervalo + self.rng.uniform(-self.jitter, self.jitter)
+            self.agendador.agendar_em(max(0.0, atraso), self._ciclo, simulador, ciclo + 1)
+
+    def executar(self, duracao_simulada, finalizar=True):
+        """Simula `duracao_simulada` segundos e retorna o resumo com a aceleração obtida"""
+        inicio_virtual = self.relogio()
+        fim_virtual = inicio_virtual + duracao_simulada
+        for simulador in self.simuladores:
+            simulador.is_running = True
+            self.agendador.agendar(inicio_virtual + self.rng.uniform(0, self.intervalo),
+                                   self._ciclo, simulador, 1)
+
+        inicio_real = time.perf_counter()
+        self.agendador.executar(ate=fim_virtual)
+        for simulador in self.simuladores:
+            simulador.is_running = False
+            if finalizar:
+                simulador.finalizar_simulacao()
+        tempo_real = time.perf_counter() - inicio_real
+
+        resumo = {
+            "dispositivos": len(self.simuladores),
+            "ciclos": self.ciclos,
+            "eventos": self.agendador.executados,
+            "requisicoes": self.requisicoes,
+            "tempo_simulado_segundos": duracao_simulada,
+            "tempo_real_segundos": tempo_real,
+            "aceleracao": duracao_simulada / tempo_real if tempo_real else float("inf"),
+            "requisicoes_por_segundo": self.requisicoes / tempo_real if tempo_real else 0,
+            "conexoes": self.transporte.estatisticas(),
+        }
+        if self.cache is not None:
+            resumo["cache"] = self.cache.estatisticas()
+        if self.estatisticas_bomba is not None:
+            resumo["bombas"] = self.estatisticas_bomba.resumo_frota()
+        if self.politica_transmissao is not None:
+            resumo["transmissao"] = self.politica_transmissao.estatisticas()
+        if self.agendador_controle is not None:
+            resumo["agendamento"] = self.agendador_controle.estatisticas()
+        return resumo
+
+def main():
+    print("⏩ SIMULADOR ESP32 - TEMPO ACELERADO")
+    print("=" * 60)
+
+    api_url = input("URL da API (padrão: http://localhost:3000/api): ").strip() or "http://localhost:3000/api"
+    try:
+        num_dispositivos = int(input("Número de devices (padrão: 10): ") or "10")
+        horas = float(input("Tempo simulado em horas (padrão: 24): ") or "24")
+        intervalo = float(input("Intervalo entre ciclos em segundos (padrão: 30): ") or "30")
+    except ValueError:
+        num_dispositivos, horas, intervalo = 10, 24.0, 30.0
+
+    simulacao = SimulacaoAcelerada(api_url, num_dispositivos=num_dispositivos, intervalo=intervalo)
+    print(f"\n🚀 Simulando {horas} horas de {num_dispositivos} devices...")
+    try:
+        resumo = simulacao.executar(horas * 3600)
+    except KeyboardInterrupt:
+        print("\n⏹️  Simulação interrompida pelo usuário")
+        return
+
+    print("\n" + "=" * 60)
+    print("🏁 SIMULAÇÃO FINALIZADA")
+    print("=" * 60)
+    print(f"🔄 Ciclos: {resumo['ciclos']}")
+    print(f"📡 Requisições: {resumo['requisicoes']} ({resumo['requisicoes_por_segundo']:.1f} req/s)")
+    print(f"⏱️  Tempo simulado: {resumo['tempo_simulado_segundos']:.0f}s | "
+          f"tempo real: {resumo['tempo_real_segundos']:.1f}s")
+    print(f"⏩ Aceleração: {resumo['aceleracao']:.0f}x")
+    print(resumo_conexoes(resumo['conexoes']))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Formato binário compacto para as leituras dos sensores
+Alternativa ao JSON de POST /sensors: um quadro com tabela de devices,
+timestamp base e registros de tamanho fixo (índice do device, delta do
+timestamp em ms, umidade). O cliente só o usa se a API anunciar o Content-Type
+no cabeçalho Accept-Post (lido de GET /health) e volta para JSON se receber 415.
+
+    python formato_binario.py   # benchmark: bytes por leitura e throughput x JSON
+"""
+
+import json
+import struct
+import time
+
+CONTENT_TYPE_BINARIO = "application/vnd.regador.leituras"
+CONTENT_TYPE_JSON = "application/json"
+
+MAGICO = b"RG"
+VERSAO = 1
+# Quadro: mágico, versão, nº de devices, nº de registros, timestamp base (ms)
+CABECALHO = struct.Struct("<2sBHHq")
+# Registro: índice do device, delta do timestamp (ms) e umidade (%)
+REGISTRO = struct.Struct("<HIB")
+
+MAX_DELTA_MS = 0xFFFFFFFF  # ~49 dias num único quadro
+
+def codificar_leituras(leituras):
+    """Codifica uma lista de leituras ({umidade_solo, timestamp, device_id}) num quadro"""
+    if not leituras:
+        raise ValueError("Quadro sem leituras")
+    if len(leituras) > 0xFFFF:
+        raise ValueError("Máximo de 65535 leituras por quadro")
+
+    base = min(leitura['timestamp'] for leitura in leituras)
+    indices = {}
+    tabela = []
+    registros = bytearray()
+    for leitura in leituras:
+        device_id = leitura['device_id']
+        indice = indices.get(device_id)
+        if indice is None:
+            indice = indices[device_id] = len(indices)
+            nome = device_id.encode('utf-8')
+            if len(nome) > 0xFF:
+                raise ValueError(f"device_id longo demais: {device_id!r}")
+            tabela.append(bytes((len(nome),)) + nome)
+        umidade = leitura['umidade_solo']
+        delta = leitura['timestamp'] - base
+        if not 0 <= umidade <= 100 or delta > MAX_DELTA_MS:
+            raise ValueError(f"Leitura fora do formato binário: {leitura!r}")
+        registros += REGISTRO.pack(indice, delta, int(umidade))
+
+    if len(tabela) > 0xFFFF:
+        raise ValueError("Máximo de 65535 devices por quadro")
+    return CABECALHO.pack(MAGICO, VERSAO, len(tabela), len(leituras), base) + b"".join(tabela) + registros
+
+def decodificar_leituras(dados):
+    """Lê um quadro e retorna as leituras no mesmo formato do JSON"""
+    dados = memoryview(dados)
+    if len(dados) < CABECALHO.size:
+        raise ValueError("Quadro truncado")
+    magico, versao, n_devices, n_registros, base = CABECALHO.unpack_from(dados, 0)
+    if magico != MAGICO or versao != VERSAO:
+        raise ValueError("Quadro com mágico/versão inválidos")
+
+    posicao = CABECALHO.size
+    devices = []
+    for _ in range(n_devices):
+        if posicao >= len(dados):
+            raise ValueError("Tabela de devices truncada")
+        tamanho = dados[posicao]
+        devices.append(bytes(dados[posicao + 1:posicao + 1 + tamanho]).decode('utf-8'))
+        posicao += 1 + tamanho
+
+    if len(dados) - posicao != n_registros * REGISTRO.size:
+        raise ValueError("Tamanho dos registros não confere com o cabeçalho")
+    try:
+        return [
+            {"umidade_solo": umidade, "timestamp": base + delta, "device_id": devices[indice]}
+            for indice, delta, umidade in REGISTRO.iter_unpack(dados[posicao:])
+        ]
+    except IndexError:
+        raise ValueError("Registro aponta para um device inexistente")
+
+def aceita_binario(response):
+    """True se o servidor anuncia o formato binário (cabeçalho Accept-Post)"""
+    return CONTENT_TYPE_BINARIO in (response.headers.get("Accept-Post") or "")
+
+def negociar_binario(session, api_base_url, timeout=5):
+    """Consulta GET /health e retorna se a API aceita o formato binário
+
+    Retorna None se a API não respondeu (a negociação fica para depois).
+    """
+    try:
+        return aceita_binario(session.get(f"{api_base_url}/health", timeout=timeout))
+    except OSError:
+        return None
+
+def _throughput(funcao, leituras, repeticoes):
+    """Leituras por segundo (melhor de 3 rodadas)"""
+    melhor = float("inf")
+    for _ in range(3):
+        inicio = time.perf_counter()
+        for _ in range(repeticoes):
+            funcao()
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return leituras * repeticoes / melhor
+
+def benchmark(tamanhos=(1, 10, 100, 1000), dispositivos=10):
+    """Bytes por leitura e throughput de codificação/decodificação: binário x JSON"""
+    import payloads
+
+    resultados = []
+    agora = int(time.time() * 1000)
+    for tamanho in tamanhos:
+        leituras = [
+            {"umidade_solo": 30 + i % 60, "timestamp": agora + i * 5000,
+             "device_id": f"ESP32_SIM_{i % dispositivos:05d}"}
+            for i in range(tamanho)
+        ]
+        # Uma leitura vai como objeto (como o firmware); várias, como array
+        objeto = leituras[0] if tamanho == 1 else leituras
+        corpo_json = json.dumps(objeto).encode('utf-8')
+        corpo_binario = codificar_leituras(leituras)
+        repeticoes = max(1, 20000 // tamanho)
+        # payloads.codificar_json usa orjson quando instalado
+        nome_compacto = "orjson" if payloads.orjson else "json compacto"
+        decodificar_compacto = payloads.orjson.loads if payloads.orjson else json.loads
+        formatos = {
+            "json": (lambda: json.dumps(objeto).encode('utf-8'), lambda: json.loads(corpo_json)),
+            nome_compacto: (lambda: payloads.codificar_json(objeto), lambda: decodificar_compacto(corpo_json)),
+            "binário": (lambda: codificar_leituras(leituras), lambda: decodificar_leituras(corpo_binario)),
+        }
+        for nome, (codificar, decodificar) in formatos.items():
+            tamanho_bytes = len(codificar())
+            resultados.append({
+                "leituras": tamanho,
+                "formato": nome,
+                "bytes": tamanho_bytes,
+                "bytes_por_leitura": tamanho_bytes / tamanho,
+                "codificacao_leituras_por_segundo": _throughput(codificar, tamanho, repeticoes),
+                "decodificacao_leituras_por_segundo": _throughput(decodificar, tamanho, repeticoes),
+            })
+    return resultados
+
+def main():
+    print("📦 BENCHMARK - FORMATO BINÁRIO x JSON")
+    print("=" * 78)
+    print(f"{'leituras':>8} {'formato':<14} {'bytes':>8} {'B/leitura':>10} "
+          f"{'codif. leit/s':>15} {'decod. leit/s':>15}")
+    for r in benchmark():
+        print(f"{r['leituras']:>8} {r['formato']:<14} {r['bytes']:>8} {r['bytes_por_leitura']:>10.1f} "
+              f"{r['codificacao_leituras_por_segundo']:>15,.0f} {r['decodificacao_leituras_por_segundo']:>15,.0f}")
+    print("\nBytes medidos só no corpo; cabeçalhos HTTP (~150-250 B) são iguais nos dois formatos.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Modo frota do simulador ESP32
+Executa milhares de dispositivos simulados em um único event loop asyncio,
+compartilhando um pool de conexões HTTP assíncrono
+"""
+
+import asyncio
+import random
+import time
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from controle_bomba import ControleHisterese
+from gravacao_trafego import extrair_device
+from lote_sensores import serializar_lote
+from payloads import corpo_controle, corpo_leitura
+from simulador_esp32 import API_URL_PADRAO, gerar_leitura
+from transporte_http import resumo_conexoes, transporte_padrao
+
+class DispositivoSimulado:
+    """Estado de um ESP32 simulado dentro da frota"""
+
+    __slots__ = ("device_id", "pump_active", "pump_start_time",
+                 "base_humidity", "humidity_variation", "ciclo", "fonte_umidade")
+
+    def __init__(self, device_id, base_humidity=60, humidity_variation=20, fonte_umidade=None):
+        self.device_id = device_id
+        self.pump_active = False
+        self.pump_start_time = None
+        self.base_humidity = base_humidity
+        self.humidity_variation = humidity_variation
+        self.ciclo = 0
+        self.fonte_umidade = fonte_umidade
+
+def _ultima_umidade(corpo):
+    """Umidade da leitura mais recente em GET /sensors (None se o device ainda não tem leituras)"""
+    leituras = corpo['data']
+    return float(leituras[0]['umidade_solo']) if leituras else None
+
+class FrotaESP32:
+    """Roda N máquinas de estado ESP32 independentes em um único loop asyncio"""
+
+    def __init__(self, api_base_url=API_URL_PADRAO, num_dispositivos=100,
+                 intervalo=5.0, jitter=0.5, prefixo="ESP32_SIM_",
+                 limite_conexoes=100, timeout=10, seed=None, agrupador=None,
+                 controle_local=True, modelo_umidade=None, metricas=None, primeiro_indice=1,
+                 estatisticas_bomba=None, transporte=None, agendador_controle=None):
+        self.api_base_url = api_base_url
+        self.intervalo = intervalo
+        self.jitter = jitter
+        self.limite_conexoes = limite_conexoes
+        self.transporte = transporte or transporte_padrao()
+        self.timeout = timeout
+        self.rng = random.Random(seed)
+        self.is_running = False
+
+        # Envio em lote compartilhado pela frota (por_dispositivo=True agrupa por device)
+        self.agrupador = agrupador
+
+        # Controle local por histerese: só fala com a API quando a bomba muda
+        self.controle_local = controle_local
+        self.controle = ControleHisterese()
+        # No polling, um agendador preditivo (agendador_preditivo.py) decide
+        # quando buscar a leitura de cada device em vez da cadência fixa
+        self.agendador_controle = agendador_controle
+
+        # Com um GeradorUmidade cada device lê de um fluxo próprio do modelo
+        # físico; blocos pequenos de ruído mantêm a memória baixa em frotas grandes.
+        # `primeiro_indice` permite dividir a numeração entre processos
+        self.dispositivos = [
+            DispositivoSimulado(
+                f"{prefixo}{i:05d}",
+                fonte_umidade=modelo_umidade.fluxo(bloco=256) if modelo_umidade else None
+            )
+            for i in range(primeiro_indice, primeiro_indice + num_dispositivos)
+        ]
+        self._por_id = {disp.device_id: disp for disp in self.dispositivos}
+
+        # Métricas detalhadas opcionais (metricas.RegistroMetricas)
+        self.metricas = metricas
+        # Estatísticas locais das bombas (estatisticas_bomba.EstatisticasBomba)
+        self.estatisticas_bomba = estatisticas_bomba
+
+        # Contadores por endpoint: {endpoint: [sucessos, falhas, latencia_total]}
+        self.estatisticas = {}
+        self.inicio = None
+        self.fim = None
+
+    def _registrar(self, endpoint, sucesso, latencia):
+        """Acumula o resultado de uma requisição por endpoint"""
+        stats = self.estatisticas.get(endpoint)
+        if stats is None:
+            stats = self.estatisticas[endpoint] = [0, 0, 0.0]
+        stats[0 if sucesso else 1] += 1
+        stats[2] += latencia
+
+    async def _requisicao(self, sessao, metodo, caminho, endpoint, extrair=None, **kwargs):
+        """Executa uma requisição e retorna (status, json) ou None em caso de erro
+
+        Com `extrair`, um 200 retorna (200, extrair(json)); um corpo sem os
+        campos esperados conta como falha e retorna None.
+        """
+        endpoint = f"{metodo} {endpoint}"
+        inicio = time.perf_counter()
+        try:
+            async with sessao.request(metodo, f"{self.api_base_url}{caminho}", **kwargs) as response:
+                try:
+                    corpo = await response.json(content_type=None)
+                except ValueError:
+                    corpo = None
+                sucesso = response.status < 400
+                if extrair is not None and response.status == 200:
+                    try:
+                        corpo = extrair(corpo)
+                    except (KeyError, IndexError, TypeError, ValueError):
+                        sucesso = False
+                latencia = time.perf_counter() - inicio
+                self._registrar(endpoint, sucesso, latencia)
+                if self.metricas:
+                    self.metricas.registrar_requisicao(endpoint, response.status, latencia,
+                                                       extrair_device(caminho, None))
+                return (response.status, corpo) if sucesso or extrair is None else None
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            latencia = time.perf_counter() - inicio
+            self._registrar(endpoint, False, latencia)
+            if self.metricas:
+                self.metricas.registrar_requisicao(endpoint, None, latencia, extrair_device(caminho, None))
+            return None
+
+    async def _enviar_lote(self, sessao, lote):
+        """Envia um lote de leituras no payload em massa de /sensors"""
+        corpo = serializar_lote(lote)
+        inicio = time.perf_counter()
+        resultado = await self._requisicao(sessao, "POST", "/sensors", "/sensors (lote)", data=corpo)
+        sucesso = resultado is not None and resultado[0] in (200, 201)
+        self.agrupador.registrar_envio(lote, time.perf_counter() - inicio, sucesso, len(corpo))
+
+    async def _loop_agrupador(self, sessao, encerrar):
+        """Envia periodicamente os lotes que atingiram a idade máxima até `encerrar`"""
+        while self.is_running and not encerrar.is_set():
+            try:
+                await asyncio.wait_for(encerrar.wait(), self.agrupador.max_idade / 2)
+                break
+            except asyncio.TimeoutError:
+                pass
+            # vencidos() já tira os lotes do agrupador: não pode ser cancelado no meio do envio
+            for lote in self.agrupador.vencidos():
+                await self._enviar_lote(sessao, lote)
+
+    async def _controlar_bomba(self, sessao, disp, action, reason):
+        """Envia um comando de controle da bomba para um device"""
+        resultado = await self._requisicao(
+            sessao, "POST", f"/pump/{disp.device_id}/control", "/pump/{id}/control",
+            data=corpo_controle(action, reason, "automatic")
+        )
+        if resultado and resultado[0] == 200:
+            if action == "activate":
+                disp.pump_active = True
+                disp.pump_start_time = time.time()
+                if self.estatisticas_bomba is not None:
+                    self.estatisticas_bomba.ativou(disp.device_id, disp.pump_start_time)
+            else:
+                disp.pump_active = False
+                if self.estatisticas_bomba is not None:
+                    self.estatisticas_bomba.desativou(disp.device_id)
+            return True
+        return False
+
+    async def _ciclo(self, sessao, disp):
+        """Um ciclo de monitoramento, equivalente a simular_ciclo_completo"""
+        disp.ciclo += 1
+
+        # 1. Enviar dados dos sensores
+        dados = gerar_leitura(disp.device_id, disp.base_humidity, disp.humidity_variation, self.rng,
+                              disp.fonte_umidade, disp.pump_active)
+        if self.agrupador:
+            for lote in self.agrupador.adicionar(dados):
+                await self._enviar_lote(sessao, lote)
+        else:
+            await self._requisicao(sessao, "POST", "/sensors", "/sensors", data=corpo_leitura(dados))
+
+        if self.controle_local:
+            # 2. Controle automático sobre a leitura recém-gerada
+            acao = self.controle.decidir(dados['umidade_solo'], disp.pump_active)
+            if acao:
+                await self._controlar_bomba(sessao, disp, acao, self.controle.motivo(acao))
+        elif self.agendador_controle is not None:
+            # A avaliação fica com _loop_controle; aqui só alimentamos a previsão
+            self.agendador_controle.observar(disp.device_id, asyncio.get_running_loop().time(),
+                                             dados['umidade_solo'], disp.pump_active)
+            await self._controle_por_polling(sessao, disp, avaliar=False)
+        else:
+            await self._controle_por_polling(sessao, disp)
+
+        # 3. Eventos aleatórios (10% de chance)
+        if self.rng.random() < 0.1:
+            if not disp.pump_active:
+                await self._controlar_bomba(sessao, disp, "activate", "Simulação - evento aleatório")
+            else:
+                await self._controlar_bomba(sessao, disp, "deactivate", "Simulação - evento aleatório")
+
+    async def _controle_por_polling(self, sessao, disp, avaliar=None):
+        """Controle antigo: busca a última leitura a cada 3 ciclos e o status a cada ciclo"""
+        if avaliar is None:
+            avaliar = disp.ciclo % 3 == 0
+        if avaliar:
+            resultado = await self._requisicao(
+                sessao, "GET", "/sensors", "/sensors", extrair=_ultima_umidade,
+                params={'device_id': disp.device_id, 'limit': 1, 'order': 'desc'}
+            )
+            if resultado and resultado[0] == 200 and resultado[1] is not None:
+                acao = self.controle.decidir(resultado[1], disp.pump_active)
+                if acao:
+                    await self._controlar_bomba(sessao, disp, acao, self.controle.motivo(acao))
+
+        resultado = await self._requisicao(
+            sessao, "GET", f"/pump/{disp.device_id}/status", "/pump/{id}/status",
+            extrair=lambda corpo: bool(corpo['data']['is_active'])
+        )
+        if resultado and resultado[0] == 200:
+            disp.pump_active = resultado[1]
+
+    async def _avaliar_agendado(self, sessao, disp):
+        """Avaliação disparada pelo agendador preditivo"""
+        try:
+            await self._controle_por_polling(sessao, disp, avaliar=True)
+        finally:
+            self.agendador_controle.avaliado(disp.device_id, asyncio.get_running_loop().time())
+
+    async def _loop_controle(self, sessao, fim):
+        """Despacha as avaliações vencidas da fila única do agendador preditivo"""
+        loop = asyncio.get_running_loop()
+        agendador = self.agendador_controle
+        pendentes = set()
+        try:
+            while self.is_running and loop.time() < fim:
+                agora = loop.time()
+                for device_id in agendador.vencidos(agora):
+                    tarefa = asyncio.create_task(self._avaliar_agendado(sessao, self._por_id[device_id]))
+                    pendentes.add(tarefa)
+                    tarefa.add_done_callback(pendentes.discard)
+                # Dorme até o próximo vencimento, mas acorda a cada intervalo
+                # porque novas leituras podem antecipar a fila
+                espera = self.intervalo
+                proximo = agendador.proximo_vencimento()
+                if proximo is not None:
+                    espera = min(espera, max(0.0, proximo - agora))
+                await asyncio.sleep(max(espera, 0.01))
+        finally:
+            if pendentes:
+                await asyncio.gather(*pendentes, return_exceptions=True)
+
+    async def _loop_dispositivo(self, sessao, disp, fim):
+        """Agenda os ciclos de um device com cadência fixa e jitter"""
+        loop = asyncio.get_running_loop()
+
+        # Fase inicial aleatória para não sincronizar a frota inteira
+        await asyncio.sleep(self.rng.uniform(0, self.intervalo))
+        proximo = loop.time()
+
+        while self.is_running and loop.time() < fim:
+            if self.metricas:
+                with self.metricas.span("ciclo", device_id=disp.device_id, ciclo=disp.ciclo + 1):
+                    await self._ciclo(sessao, disp)
+                self.metricas.definir("bomba_ativa", int(disp.pump_active), device_id=disp.device_id)
+            else:
+                await self._ciclo(sessao, disp)
+            proximo += self.intervalo + self.rng.uniform(-self.jitter, self.jitter)
+            await asyncio.sleep(max(0.0, proximo - loop.time()))
+
+    def _loops(self, sessao, fim):
+        """Corrotinas principais da execução: um loop por device"""
+        return [self._loop_dispositivo(sessao, disp, fim) for disp in self.dispositivos]
+
+    async def executar(self, duracao_segundos):
+        """Executa a frota inteira durante a duração informada"""
+        # Mesmo keep-alive/DNS do transporte_http; o trace alimenta as estatísticas de reuso
+        conector = self.transporte.conector_aiohttp(self.limite_conexoes, urlsplit(self.api_base_url).hostname)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        # Os corpos já vão serializados (payloads.py), então o Content-Type é fixo
+        headers = {'User-Agent': 'ESP32-Simulator-Fleet/1.0', 'Content-Type': 'application/json'}
+
+        self.is_running = True
+        self.inicio = time.time()
+        async with aiohttp.ClientSession(connector=conector, timeout=timeout, headers=headers,
+                                         trace_configs=[self.transporte.trace_aiohttp()]) as sessao:
+            fim = asyncio.get_running_loop().time() + duracao_segundos
+            encerrar_lotes = asyncio.Event()
+            tarefa_lotes = (asyncio.create_task(self._loop_agrupador(sessao, encerrar_lotes))
+                            if self.agrupador else None)
+            tarefa_controle = None
+            if self.agendador_controle is not None and not self.controle_local:
+                tarefa_controle = asyncio.create_task(self._loop_controle(sessao, fim))
+            await asyncio.gather(*self._loops(sessao, fim))
+            if tarefa_controle:
+                tarefa_controle.cancel()
+                await asyncio.gather(tarefa_controle, return_exceptions=True)
+            if tarefa_lotes:
+                encerrar_lotes.set()
+                await tarefa_lotes
+                for lote in self.agrupador.esvaziar():
+                    await self._enviar_lote(sessao, lote)
+        self.fim = time.time()
+        self.is_running = False
+        return self.resumo()
+
+    def parar(self):
+        """Sinaliza para todos os devices encerrarem após o ciclo atual"""
+        self.is_running = False
+
+    def resumo(self):
+        """Consolida as estatísticas da execução"""
+        duracao = ((self.fim or time.time()) - self.inicio) if self.inicio else 0
+        total = sum(s[0] + s[1] for s in self.estatisticas.values())
+        endpoints = {}
+        for endpoint, (sucessos, falhas, latencia_total) in self.estatisticas.items():
+            n = sucessos + falhas
+            endpoints[endpoint] = {
+                "sucessos": sucessos,
+                "falhas": falhas,
+                "latencia_media_ms": (latencia_total / n) * 1000 if n else 0,
+            }
+        resumo = {
+            "dispositivos": len(self.dispositivos),
+            "duracao_segundos": duracao,
+            "total_requisicoes": total,
+            "requisicoes_por_segundo": total / duracao if duracao else 0,
+            "endpoints": endpoints,
+            "conexoes": self.transporte.estatisticas(),
+        }
+        if self.agrupador:
+            resumo["lotes"] = self.agrupador.resumo()
+        if self.estatisticas_bomba is not None:
+            resumo["bombas"] = self.estatisticas_bomba.resumo_frota()
+        if self.agendador_controle is not None:
+            resumo["agendamento"] = self.agendador_controle.estatisticas()
+        return resumo
+
+def main():
+    print("🛰️  SIMULADOR ESP32 - MODO FROTA")
+    print("=" * 60)
+
+    api_url = input(f"URL da API (padrão: {API_URL_PADRAO}): ").strip() or API_URL_PADRAO
+    try:
+        num_dispositivos = int(input("Número de devices (padrão: 100): ") or "100")
+        intervalo = float(input("Intervalo entre ciclos em segundos (padrão: 5): ") or "5")
+        duracao = float(input("Duração em minutos (padrão: 1): ") or "1")
+    except ValueError:
+        num_dispositivos, intervalo, duracao = 100, 5.0, 1.0
+
+    frota = FrotaESP32(api_url, num_dispositivos=num_dispositivos, intervalo=intervalo)
+
+    print(f"\n🚀 Iniciando {num_dispositivos} devices a cada {intervalo}s por {duracao} minutos")
+    try:
+        resumo = asyncio.run(frota.executar(duracao * 60))
+    except KeyboardInterrupt:
+        print("\n⏹️  Simulação interrompida pelo usuário")
+        return
+
+    print("\n" + "=" * 60)
+    print("🏁 FROTA FINALIZADA")
+    print("=" * 60)
+    print(f"📊 Total de requisições: {resumo['total_requisicoes']}")
+    print(f"⚡ Taxa: {resumo['requisicoes_por_segundo']:.1f} req/s")
+    print(resumo_conexoes(resumo['conexoes']))
+    for endpoint, stats in resumo['endpoints'].items():
+        print(f"   {endpoint}: {stats['sucessos']} ok, {stats['falhas']} falhas, "
+              f"{stats['latencia_media_ms']:.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Frota ESP32 distribuída em vários processos
+Os devices são divididos em fatias contíguas, uma por processo; cada processo
+roda a sua própria FrotaESP32 (event loop asyncio + pool de conexões) e envia
+as estatísticas ao processo pai por um Pipe. O pai agrega tudo ao vivo, então
+a taxa de requisições cresce com o número de núcleos em vez de parar no GIL.
+"""
+
+import asyncio
+import multiprocessing
+import os
+import time
+from multiprocessing.connection import wait
+
+from controle_bomba import LIMIAR_ATIVACAO, LIMIAR_DESATIVACAO, ControleHisterese
+from histograma import HistogramaLatencia
+from metricas import RegistroMetricas
+from simulador_esp32 import API_URL_PADRAO
+
+def dividir_dispositivos(num_dispositivos, processos):
+    """Fatias contíguas [(primeiro_indice, quantidade)], com diferença de no máximo 1"""
+    base, resto = divmod(num_dispositivos, processos)
+    fatias = []
+    inicio = 1
+    for i in range(processos):
+        quantidade = base + (1 if i < resto else 0)
+        if quantidade:
+            fatias.append((inicio, quantidade))
+        inicio += quantidade
+    return fatias
+
+async def _executar_fatia(config, conexao, parar):
+    from frota_esp32 import FrotaESP32
+
+    modelo = None
+    if config["modelo_fisico"]:
+        from gerador_umidade import GeradorUmidade
+        modelo = GeradorUmidade(dt=config["intervalo"], limiar_ativacao=config["limiares"][0],
+                                limiar_desativacao=config["limiares"][1], seed=config["seed"])
+    agrupador = None
+    if config["max_leituras_lote"]:
+        from lote_sensores import AgrupadorLeituras
+        agrupador = AgrupadorLeituras(max_leituras=config["max_leituras_lote"],
+                                      max_idade=config["intervalo"] * 2)
+
+    metricas = RegistroMetricas()
+    frota = FrotaESP32(
+        config["api_base_url"], num_dispositivos=config["quantidade"], intervalo=config["intervalo"],
+        jitter=config["jitter"], prefixo=config["prefixo"], limite_conexoes=config["limite_conexoes"],
+        timeout=config["timeout"], seed=config["seed"], agrupador=agrupador,
+        controle_local=config["controle_local"], modelo_umidade=modelo, metricas=metricas,
+        primeiro_indice=config["primeiro_indice"]
+    )
+    frota.controle = ControleHisterese(*config["limiares"])
+
+    async def relatar():
+        # Envia os contadores acumulados; o pai fica com o último de cada processo
+        while True:
+            await asyncio.sleep(config["intervalo_relatorio"])
+            if parar.is_set():
+                frota.parar()
+            conexao.send(("parcial", config["fatia"], frota.estatisticas))
+
+    relator = asyncio.create_task(relatar())
+    try:
+        resumo = await frota.executar(config["duracao"])
+    finally:
+        relator.cancel()
+    histogramas = {dict(rotulos)["endpoint"]: histograma
+                   for (nome, rotulos), histograma in metricas.histogramas.items()
+                   if nome == "latencia_requisicao_segundos"}
+    conexao.send(("final", config["fatia"], frota.estatisticas, resumo, histogramas))
+
+def _processo_fatia(config, conexao, parar):
+    """Ponto de entrada de cada processo filho"""
+    try:
+        asyncio.run(_executar_fatia(config, conexao, parar))
+    except KeyboardInterrupt:
+        pass  # o pai trata a interrupção e agrega o que chegou
+    except Exception as e:
+        # Avisa o pai antes de sair (sem isso ele só veria o EOF do Pipe); o
+        # traceback sai no stderr do filho
+        try:
+            conexao.send(("erro", config["fatia"], f"{type(e).__name__}: {e}"))
+        except OSError:
+            pass
+        raise
+    finally:
+        conexao.close()
+
+class FrotaMultiprocesso:
+    """Divide N devices entre processos, cada um com o seu próprio event loop"""
+
+    def __init__(self, api_base_url=API_URL_PADRAO, num_dispositivos=1000, processos=None,
+                 intervalo=5.0, jitter=0.5, prefixo="ESP32_SIM_", limite_conexoes=100, timeout=10,
+                 seed=None, controle_local=True, modelo_fisico=False, max_leituras_lote=None,
+                 intervalo_relatorio=1.0, limiares=(LIMIAR_ATIVACAO, LIMIAR_DESATIVACAO)):
+        self.api_base_url = api_base_url
+        self.num_dispositivos = num_dispositivos
+        self.processos = min(processos or os.cpu_count() or 1, max(1, num_dispositivos))
+        self.intervalo = intervalo
+        self.jitter = jitter
+        self.prefixo = prefixo
+        self.limite_conexoes = limite_conexoes
+        self.timeout = timeout
+        self.seed = seed
+        self.controle_local = controle_local
+        self.modelo_fisico = modelo_fisico
+        self.max_leituras_lote = max_leituras_lote
+        self.intervalo_relatorio = intervalo_relatorio
+        self.limiares = tuple(limiares)
+
+        # Último relatório de cada processo: {fatia: {endpoint: [ok, falhas, latencia_total]}}
+        self.parciais = {}
+        self.resumos = {}
+        self.histogramas = {}
+        # Processos que falharam: {fatia: motivo}; as fatias deles faltam no agregado
+        self.erros = {}
+        self.inicio = None
+        self.fim = None
+        self._parar = None
+
+    def _config_fatia(self, fatia, primeiro_indice, quantidade, duracao):
+        return {
+            "fatia": fatia, "primeiro_indice": primeiro_indice, "quantidade": quantidade,
+            "api_base_url": self.api_base_url, "intervalo": self.intervalo, "jitter": self.jitter,
+            "prefixo": self.prefixo, "limite_conexoes": self.limite_conexoes, "timeout": self.timeout,
+            # Semente distinta por processo, reprodutível a partir da semente da frota
+            "seed": None if self.seed is None else self.seed * 1000 + fatia,
+            "controle_local": self.controle_local, "modelo_fisico": self.modelo_fisico,
+            "max_leituras_lote": self.max_leituras_lote, "duracao": duracao,
+            "intervalo_relatorio": self.intervalo_relatorio, "limiares": self.limiares,
+        }
+
+    def agregado(self):
+        """Totais ao vivo somando o último relatório de cada processo"""
+        endpoints = {}
+        for estatisticas in self.parciais.values():
+            for endpoint, (sucessos, falhas, latencia_total) in estatisticas.items():
+                total = endpoints.setdefault(endpoint, [0, 0, 0.0])
+                total[0] += sucessos
+                total[1] += falhas
+                total[2] += latencia_total
+        duracao = ((self.fim or time.time()) - self.inicio) if self.inicio else 0
+        requisicoes = sum(s[0] + s[1] for s in endpoints.values())
+        return {
+            "processos": self.processos,
+            "processos_ativos": self.processos - len(self.resumos) - len(self.erros),
+            "dispositivos": self.num_dispositivos,
+            "duracao_segundos": duracao,
+            "total_requisicoes": requisicoes,
+            "falhas": sum(s[1] for s in endpoints.values()),
+            "requisicoes_por_segundo": requisicoes / duracao if duracao else 0,
+            "endpoints": endpoints,
+            "processos_com_erro": dict(self.erros),
+        }
+
+    def executar(self, duracao_segundos, ao_atualizar=None):
+        """Roda a frota em todos os processos; `ao_atualizar(agregado)` é chamado a cada relatório"""
+        contexto = multiprocessing.get_context()
+        self._parar = contexto.Event()
+        filhos = {}
+        conexoes = {}
+        self.inicio = time.time()
+        for fatia, (primeiro, quantidade) in enumerate(dividir_dispositivos(self.num_dispositivos, self.processos)):
+            leitura, escrita = contexto.Pipe(duplex=False)
+            processo = contexto.Process(
+                target=_processo_fatia,
+                args=(self._config_fatia(fatia, primeiro, quantidade, duracao_segundos), escrita, self._parar),
+                name=f"frota-{fatia}", daemon=True
+            )
+            processo.start()
+            escrita.close()  # o pai só lê; assim recebe EOF se o filho morrer
+            filhos[fatia] = processo
+            conexoes[leitura] = fatia
+        self.processos = len(filhos)
+
+        try:
+            while conexoes:
+                for conexao in wait(list(conexoes)):
+                    try:
+                        mensagem = conexao.recv()
+                    except EOFError:
+                        del conexoes[conexao]
+                        continue
+                    if mensagem[0] == "erro":
+                        self.erros[mensagem[1]] = mensagem[2]
+                        # Os parciais de antes da falha saem do agregado junto com a fatia
+                        self.parciais.pop(mensagem[1], None)
+                        print(f"❌ Processo {mensagem[1]} falhou: {mensagem[2]}")
+                        continue
+                    self.parciais[mensagem[1]] = mensagem[2]
+                    if mensagem[0] == "final":
+                        self.resumos[mensagem[1]] = mensagem[3]
+                        for endpoint, histograma in mensagem[4].items():
+                            self.histogramas.setdefault(endpoint, HistogramaLatencia()).mesclar(histograma)
+                    if ao_atualizar:
+                        ao_atualizar(self.agregado())
+        except KeyboardInterrupt:
+            self._parar.set()
+            raise
+        finally:
+            for fatia, processo in filhos.items():
+                processo.join(timeout=self.timeout + self.intervalo)
+                if processo.is_alive():
+                    processo.terminate()
+                    processo.join()
+                # Morte sem aviso (sinal, falta de memória) ou sem o relatório final
+                if fatia not in self.resumos and fatia not in self.erros and not self._parar.is_set():
+                    self.erros[fatia] = f"processo terminou sem relatório final (código {processo.exitcode})"
+                    self.parciais.pop(fatia, None)
+            self.fim = time.time()
+        if self.erros:
+            print(f"⚠️  {len(self.erros)} processo(s) com erro; as fatias deles não estão no agregado")
+        return self.resumo()
+
+    def parar(self):
+        """Pede a todos os processos que encerrem após o ciclo atual"""
+        if self._parar is not None:
+            self._parar.set()
+
+    def resumo(self):
+        """Agregado final com percentis de latência por endpoint e a taxa de cada processo"""
+        agregado = self.agregado()
+        endpoints = {}
+        for endpoint, (sucessos, falhas, latencia_total) in agregado["endpoints"].items():
+            n = sucessos + falhas
+            endpoints[endpoint] = {
+                "sucessos": sucessos,
+                "falhas": falhas,
+                "latencia_media_ms": (latencia_total / n) * 1000 if n else 0,
+            }
+            if endpoint in self.histogramas:
+                endpoints[endpoint]["latencia"] = self.histogramas[endpoint].resumo()
+        agregado["endpoints"] = endpoints
+        agregado["por_processo"] = [
+            {"fatia": fatia, "dispositivos": resumo["dispositivos"],
+             "requisicoes_por_segundo": resumo["requisicoes_por_segundo"]}
+            for fatia, resumo in sorted(self.resumos.items())
+        ]
+        return agregado
+
+def main():
+    print("🛰️  SIMULADOR ESP32 - FROTA MULTIPROCESSO")
+    print("=" * 60)
+
+    api_url = input(f"URL da API (padrão: {API_URL_PADRAO}): ").strip() or API_URL_PADRAO
+    try:
+        num_dispositivos = int(input("Número de devices (padrão: 1000): ") or "1000")
+        processos = int(input(f"Processos (padrão: {os.cpu_count()}): ") or str(os.cpu_count()))
+        intervalo = float(input("Intervalo entre ciclos em segundos (padrão: 5): ") or "5")
+        duracao = float(input("Duração em minutos (padrão: 1): ") or "1")
+    except ValueError:
+        num_dispositivos, processos, intervalo, duracao = 1000, os.cpu_count(), 5.0, 1.0
+
+    frota = FrotaMultiprocesso(api_url, num_dispositivos=num_dispositivos, processos=processos,
+                               intervalo=intervalo)
+
+    def mostrar(agregado):
+        print(f"\r⚡ {agregado['requisicoes_por_segundo']:.0f} req/s | "
+              f"{agregado['total_requisicoes']} requisições | {agregado['falhas']} falhas | "
+              f"{agregado['processos_ativos']}/{agregado['processos']} processos", end="", flush=True)
+
+    print(f"\n🚀 Iniciando {num_dispositivos} devices em {frota.processos} processos "
+          f"a cada {intervalo}s por {duracao} minutos")
+    try:
+        resumo = frota.executar(duracao * 60, ao_atualizar=mostrar)
+    except KeyboardInterrupt:
+        print("\n⏹️  Simulação interrompida pelo usuário")
+        return
+
+    print("\n\n" + "=" * 60)
+    print("🏁 FROTA FINALIZADA")
+    print("=" * 60)
+    print(f"📊 Total de requisições: {resumo['total_requisicoes']}")
+    print(f"⚡ Taxa: {resumo['requisicoes_por_segundo']:.1f} req/s")
+    for processo in resumo['por_processo']:
+        print(f"   Processo {processo['fatia']}: {processo['dispositivos']} devices, "
+              f"{processo['requisicoes_por_segundo']:.1f} req/s")
+    for fatia, erro in resumo['processos_com_erro'].items():
+        print(f"   ❌ Processo {fatia}: {erro}")
+    for endpoint, stats in resumo['endpoints'].items():
+        linha = f"   {endpoint}: {stats['sucessos']} ok, {stats['falhas']} falhas"
+        if "latencia" in stats:
+            linha += f", p50 {stats['latencia']['p50_ms']:.1f} ms, p99 {stats['latencia']['p99_ms']:.1f} ms"
+        print(linha)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Gerador vetorizado de séries de umidade do solo
+Modelo físico simples: evaporação exponencial em direção ao solo seco,
+irrigação enquanto a bomba está ativa, ruído do sensor e o mapeamento
+ADC -> % do firmware (VALOR_SECO/VALOR_MOLHADO do main.ino)
+"""
+
+import numpy as np
+
+from controle_bomba import LIMIAR_ATIVACAO, LIMIAR_DESATIVACAO
+
+# Calibração do sensor capacitivo v2.0 (main.ino)
+VALOR_SECO = 4095
+VALOR_MOLHADO = 1800
+ADC_MAXIMO = 4095
+
+def umidade_para_adc(umidade, ruido=0.0):
+    """Valor bruto do ADC (inteiro, 0-4095) para uma umidade em %"""
+    bruto = VALOR_SECO + np.asarray(umidade) * ((VALOR_MOLHADO - VALOR_SECO) / 100.0) + ruido
+    return np.clip(np.rint(bruto), 0, ADC_MAXIMO).astype(np.int16)
+
+def _map_arduino(valor_raw):
+    """constrain(map(raw, VALOR_SECO, VALOR_MOLHADO, 0, 100), 0, 100) em aritmética inteira
+
+    O map() do Arduino usa divisão inteira truncada em direção a zero.
+    """
+    numerador = (np.asarray(valor_raw, dtype=np.int64) - VALOR_SECO) * 100
+    denominador = VALOR_MOLHADO - VALOR_SECO
+    quociente = np.abs(numerador) // abs(denominador)
+    umidade = np.where((numerador < 0) != (denominador < 0), -quociente, quociente)
+    return np.clip(umidade, 0, 100).astype(np.int8)
+
+def map_arduino(valor_raw):
+    """Versão escalar de _map_arduino, para uma leitura por vez"""
+    numerador = (valor_raw - VALOR_SECO) * 100
+    denominador = VALOR_MOLHADO - VALOR_SECO
+    umidade = abs(numerador) // abs(denominador)
+    if (numerador < 0) != (denominador < 0):
+        umidade = -umidade
+    return min(100, max(0, umidade))
+
+# O ADC tem só 4096 valores possíveis: tabela evita a divisão inteira por amostra
+_TABELA_ADC = _map_arduino(np.arange(ADC_MAXIMO + 1))
+
+def adc_para_umidade(valor_raw):
+    """Leitura em % calculada como no firmware, para valores brutos do ADC (0-4095)"""
+    return _TABELA_ADC[np.asarray(valor_raw)]
+
+class TracoUmidade:
+    """Séries geradas: umidade real, leitura do ADC, leitura em % e estado da bomba"""
+
+    def __init__(self, umidade, adc, leitura, bomba, dt):
+        self.umidade = umidade
+        self.adc = adc
+        self.leitura = leitura
+        self.bomba = bomba
+        self.dt = dt
+
+    @property
+    def shape(self):
+        return self.leitura.shape
+
+class GeradorUmidade:
+    """Modelo de secagem/irrigação do solo, vetorizado com NumPy"""
+
+    def __init__(self, dt=5.0, umidade_seco=10.0, tau_evaporacao=24 * 3600.0,
+                 umidade_saturacao=95.0, tau_irrigacao=20 * 60.0, ruido_adc=15.0,
+                 variacao_evaporacao=0.2, limiar_ativacao=LIMIAR_ATIVACAO,
+                 limiar_desativacao=LIMIAR_DESATIVACAO, seed=None):
+        self.dt = dt
+        self.umidade_seco = umidade_seco
+        self.tau_evaporacao = tau_evaporacao
+        self.umidade_saturacao = umidade_saturacao
+        self.tau_irrigacao = tau_irrigacao
+        self.ruido_adc = ruido_adc
+        self.variacao_evaporacao = variacao_evaporacao
+        self.limiar_ativacao = limiar_ativacao
+        self.limiar_desativacao = limiar_desativacao
+        self.rng = np.random.default_rng(seed)
+
+    def coeficientes(self, tau_evaporacao=None):
+        """(a, b) da recorrência exata H[t+1] = a*H[t] + b, para bomba desligada e ligada
+
+        Com taxa r = 1/tau_evap (+ 1/tau_irr com a bomba ligada) e equilíbrio
+        H_eq, a = exp(-r*dt) e b = H_eq*(1 - a).
+        """
+        tau = self.tau_evaporacao if tau_evaporacao is None else tau_evaporacao
+        r_seca = 1.0 / tau
+        r_irrigando = r_seca + 1.0 / self.tau_irrigacao
+        eq_seca = self.umidade_seco
+        eq_irrigando = (self.umidade_seco / tau + self.umidade_saturacao / self.tau_irrigacao) / r_irrigando
+        a_seca = np.exp(-r_seca * self.dt)
+        a_irrigando = np.exp(-r_irrigando * self.dt)
+        return ((a_seca, eq_seca * (1 - a_seca)), (a_irrigando, eq_irrigando * (1 - a_irrigando)))
+
+    def _taus(self, n_dispositivos):
+        """Taxa de evaporação de cada device, variando ±variacao_evaporacao"""
+        fator = 1 + self.rng.uniform(-self.variacao_evaporacao, self.variacao_evaporacao, n_dispositivos)
+        return self.tau_evaporacao * fator
+
+    def gerar(self, n_dispositivos, n_amostras, umidade_inicial=None, controle=True):
+        """Gera as séries de n_dispositivos x n_amostras
+
+        Com `controle=True` a bomba segue a histerese sobre a leitura do sensor;
+        caso contrário a bomba fica desligada (apenas secagem). Enquanto a bomba
+        não muda de estado a trajetória tem forma fechada (H_eq + (H0 - H_eq)*a^k),
+        então cada bloco de tempo é calculado para todos os devices de uma vez e
+        só é refeito, a partir do ponto de troca, para os devices que acionaram
+        ou desligaram a bomba dentro dele.
+        """
+        n, total = n_dispositivos, n_amostras
+        if umidade_inicial is None:
+            umidade_inicial = self.rng.uniform(40, 70, n)
+        h = np.array(np.broadcast_to(np.asarray(umidade_inicial, dtype=np.float64), (n,)))
+
+        (a_seca, b_seca), (a_irrigando, b_irrigando) = self.coeficientes(self._taus(n))
+        log_a = np.stack([np.log(a_seca), np.broadcast_to(np.log(a_irrigando), (n,))])
+        a = np.exp(log_a)
+        equilibrio = np.stack([b_seca / (1 - a_seca), np.broadcast_to(b_irrigando / (1 - a_irrigando), (n,))])
+        # float32 basta para 0-100% e reduz pela metade o custo de exp() nos blocos
+        log_a32 = log_a.astype(np.float32)
+        equilibrio32 = equilibrio.astype(np.float32)
+
+        umidade = np.empty((n, total), dtype=np.float32)
+        adc = np.empty((n, total), dtype=np.int16)
+        leitura = np.empty((n, total), dtype=np.int8)
+        bomba = np.zeros((n, total), dtype=bool)
+        ruido = self.rng.standard_normal((n, total), dtype=np.float32) * np.float32(self.ruido_adc)
+        ligada = np.zeros(n, dtype=np.intp)
+
+        bloco = int(np.clip((1 << 18) // max(n, 1), 64, 16384))
+        for i in range(0, total, bloco):
+            m = min(bloco, total - i)
+            colunas = np.arange(m)
+            inicio = np.zeros(n, dtype=np.intp)
+            pendentes = np.arange(n)
+            primeira_passada = True
+            blocos = (umidade[:, i:i + m], adc[:, i:i + m], leitura[:, i:i + m], bomba[:, i:i + m])
+
+            while pendentes.size:
+                regime = ligada[pendentes]
+                k = colunas[None, :] - inicio[pendentes][:, None]
+                valido = k >= 0
+                eq = equilibrio32[regime, pendentes][:, None]
+                expoente = np.maximum(k, 0).astype(np.float32) * log_a32[regime, pendentes][:, None]
+                trecho = eq + (h[pendentes].astype(np.float32)[:, None] - eq) * np.exp(expoente)
+                bruto = umidade_para_adc(trecho, ruido[pendentes, i:i + m])
+                medida = adc_para_umidade(bruto)
+
+                if controle:
+                    cruza = np.where(regime[:, None] == 1,
+                                     medida > self.limiar_desativacao,
+                                     medida < self.limiar_ativacao) & valido
+                    trocou = cruza.any(axis=1)
+                    ultimo = np.where(trocou, cruza.argmax(axis=1), m - 1)
+                else:
+                    trocou = np.zeros(pendentes.size, dtype=bool)
+                    ultimo = np.full(pendentes.size, m - 1)
+
+                # Grava o trecho inteiro; o que vem depois de uma troca é
+                # sobrescrito na próxima passada, já com o novo regime
+                valores = (trecho, bruto, medida, np.broadcast_to(regime[:, None] == 1, trecho.shape))
+                if primeira_passada:
+                    for destino, valor in zip(blocos, valores):
+                        destino[:] = valor
+                    primeira_passada = False
+                else:
+                    for destino, valor in zip(blocos, valores):
+                        destino[pendentes] = np.where(valido, valor, destino[pendentes])
+
+                # A amostra seguinte evolui a partir da última, já no novo regime
+                ligada[pendentes[trocou]] ^= 1
+                regime = ligada[pendentes]
+                anterior = trecho[np.arange(pendentes.size), ultimo]
+                eq = equilibrio[regime, pendentes]
+                h[pendentes] = eq + (anterior - eq) * a[regime, pendentes]
+                inicio[pendentes] = ultimo + 1
+                pendentes = pendentes[trocou & (ultimo + 1 < m)]
+
+        return TracoUmidade(umidade, adc, leitura, bomba, self.dt)
+
+    def fluxo(self, umidade_inicial=None, bloco=1024, seed=None):
+        """Fluxo de leituras para um device do simulador (ver FluxoUmidade)"""
+        rng = np.random.default_rng(seed) if seed is not None else self.rng
+        if umidade_inicial is None:
+            umidade_inicial = float(rng.uniform(40, 70))
+        tau = float(self._taus(1)[0])
+        return FluxoUmidade(self.coeficientes(tau), umidade_inicial, self.ruido_adc, rng, bloco)
+
+    def fluxo_frota(self, n_dispositivos, umidade_inicial=None):
+        """Leituras de n_dispositivos, um passo de tempo por vez (ver FluxoFrota)"""
+        if umidade_inicial is None:
+            umidade_inicial = self.rng.uniform(40, 70, n_dispositivos)
+        return FluxoFrota(self.coeficientes(self._taus(n_dispositivos)), umidade_inicial, self.ruido_adc,
+                          self.limiar_ativacao, self.limiar_desativacao, self.rng)
+
+class FluxoFrota:
+    """Passo a passo de uma frota inteira, com a bomba de cada device na histerese
+
+    Mesma dinâmica do gerar(), mas com memória O(n_dispositivos) independente do
+    número de passos: serve para séries longas demais para caber em uma matriz.
+    """
+
+    def __init__(self, regimes, umidade_inicial, ruido_adc, limiar_ativacao, limiar_desativacao, rng):
+        (a_seca, b_seca), (a_irrigando, b_irrigando) = regimes
+        self.umidade = np.array(umidade_inicial, dtype=np.float64)
+        n = self.umidade.shape[0]
+        self.a = np.stack([np.broadcast_to(a_seca, (n,)), np.broadcast_to(a_irrigando, (n,))])
+        self.b = np.stack([np.broadcast_to(b_seca, (n,)), np.broadcast_to(b_irrigando, (n,))])
+        self.ligada = np.zeros(n, dtype=bool)
+        self.ruido_adc = ruido_adc
+        self.limiar_ativacao = limiar_ativacao
+        self.limiar_desativacao = limiar_desativacao
+        self.rng = rng
+        self._colunas = np.arange(n)
+
+    def proximo(self):
+        """Avança um passo; retorna as leituras em % (int8) de todos os devices"""
+        regime = self.ligada.astype(np.intp)
+        self.umidade = self.a[regime, self._colunas] * self.umidade + self.b[regime, self._colunas]
+        ruido = self.rng.standard_normal(self.umidade.shape[0]) * self.ruido_adc
+        leitura = adc_para_umidade(umidade_para_adc(self.umidade, ruido))
+        # A próxima amostra já evolui no regime decidido por esta leitura
+        self.ligada = np.where(self.ligada, leitura <= self.limiar_desativacao, leitura < self.limiar_ativacao)
+        return leitura
+
+class FluxoUmidade:
+    """Leituras sequenciais de um device, com ruído pré-gerado em blocos
+
+    O estado da bomba é informado a cada leitura, então a irrigação responde
+    aos acionamentos feitos em tempo de execução (API, eventos aleatórios).
+    """
+
+    def __init__(self, regimes, umidade_inicial, ruido_adc, rng, bloco=1024):
+        self.regimes = [(float(a), float(b)) for a, b in regimes]
+        self.umidade = float(umidade_inicial)
+        self.ruido_adc = ruido_adc
+        self.rng = rng
+        self.bloco = bloco
+        self._ruido = []
+        self._posicao = 0
+        self._escala = (VALOR_MOLHADO - VALOR_SECO) / 100.0
+
+    def _proximo_ruido(self):
+        if self._posicao >= len(self._ruido):
+            self._ruido = self.rng.normal(0.0, self.ruido_adc, self.bloco).tolist()
+            self._posicao = 0
+        valor = self._ruido[self._posicao]
+        self._posicao += 1
+        return valor
+
+    def proximo_adc(self, pump_active=False):
+        """Avança um passo e retorna o valor bruto do ADC (analogRead, 0-4095)"""
+        a, b = self.regimes[bool(pump_active)]
+        self.umidade = a * self.umidade + b
+        return min(ADC_MAXIMO, max(0, round(VALOR_SECO + self.umidade * self._escala + self._proximo_ruido())))
+
+    def proximo(self, pump_active=False):
+        """Avança um passo e retorna a leitura em % (inteiro, como o firmware)"""
+        return map_arduino(self.proximo_adc(pump_active))
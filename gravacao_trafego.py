@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Gravação e reprodução do tráfego do simulador
+Cada requisição enviada por uma requests.Session é gravada num log binário
+append-only (registros de tamanho fixo + payload) que pode ser lido via mmap
+e reenviado depois a 1x, Nx ou velocidade máxima
+"""
+
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import Counter, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+from requests.adapters import BaseAdapter
+
+from histograma import HistogramaLatencia
+from transporte_http import TransporteHTTP
+
+MAGICO = b"RGTR"
+VERSAO = 3
+CABECALHO = struct.Struct("<4sHH")          # mágico, versão, reservado
+
+TIPO_DEVICE = 1
+TIPO_ENDPOINT = 2
+TIPO_REQUISICAO = 3
+TIPO_CONTEUDO = 4
+
+# Entradas das tabelas internadas: tipo, índice, tamanho do nome (+ nome em UTF-8)
+# Índices de 32 bits: as frotas simuladas passam de 65 mil devices
+ENTRADA_TABELA = struct.Struct("<BIH")
+# Requisição: tipo, método, device, endpoint, Content-Type, status (-1 = erro de
+# conexão), timestamp (s), latência (ms), tamanho do payload (+ payload)
+REQUISICAO = struct.Struct("<BBIIHhdfI")
+
+SEM_DEVICE = 0xFFFFFFFF
+SEM_CONTEUDO = 0xFFFF
+METODOS = ("GET", "POST", "PUT", "PATCH", "DELETE", "HEAD", "OPTIONS")
+
+Registro = namedtuple("Registro", "timestamp metodo device_id endpoint status latencia_ms payload tipo_conteudo")
+
+def extrair_device(url, corpo):
+    """Device da requisição: /pump/{id}/..., ?device_id=... ou campo device_id do JSON"""
+    partes = urlsplit(url)
+    segmentos = [s for s in partes.path.split("/") if s]
+    if "pump" in segmentos and segmentos.index("pump") + 1 < len(segmentos):
+        return segmentos[segmentos.index("pump") + 1]
+    consulta = parse_qs(partes.query)
+    if "device_id" in consulta:
+        return consulta["device_id"][0]
+    if corpo:
+        try:
+            dados = json.loads(corpo)
+        except ValueError:
+            return None
+        if isinstance(dados, dict):
+            return dados.get("device_id")
+    return None
+
+class GravadorTrafego:
+    """Grava as requisições de uma ou mais sessões num log binário"""
+
+    def __init__(self, caminho, api_base_url, relogio=time.time):
+        self.caminho = caminho
+        self.api_base_url = api_base_url.rstrip("/")
+        self.relogio = relogio
+        self.devices = {}
+        self.endpoints = {}
+        self.tipos_conteudo = {}
+        self._lock = threading.Lock()
+
+        # Ao continuar um log existente, recarrega as tabelas internadas
+        if os.path.exists(caminho) and os.path.getsize(caminho) > 0:
+            leitor = LeitorTrafego(caminho)
+            self.devices = {nome: i for i, nome in enumerate(leitor.devices)}
+            self.endpoints = {nome: i for i, nome in enumerate(leitor.endpoints)}
+            self.tipos_conteudo = {nome: i for i, nome in enumerate(leitor.tipos_conteudo)}
+            leitor.fechar()
+            self._arquivo = open(caminho, "ab")
+        else:
+            self._arquivo = open(caminho, "wb")
+            self._arquivo.write(CABECALHO.pack(MAGICO, VERSAO, 0))
+
+    def _internar(self, tabela, tipo, nome):
+        indice = tabela.get(nome)
+        if indice is None:
+            indice = tabela[nome] = len(tabela)
+            dados = nome.encode("utf-8")
+            self._arquivo.write(ENTRADA_TABELA.pack(tipo, indice, len(dados)) + dados)
+        return indice
+
+    def registrar(self, metodo, url, corpo, status, latencia, timestamp=None, tipo_conteudo=None):
+        """Grava uma requisição; `status` None indica falha sem resposta
+
+        `tipo_conteudo` (Content-Type) é reenviado na reprodução: os lotes do
+        formato_binario só são aceitos com o tipo próprio.
+        """
+        if isinstance(corpo, str):
+            corpo = corpo.encode("utf-8")
+        corpo = corpo or b""
+        device_id = extrair_device(url, corpo)
+
+        # O endpoint é gravado relativo à API e com o device trocado por {id}
+        endpoint = url[len(self.api_base_url):] if url.startswith(self.api_base_url) else url
+        if device_id:
+            endpoint = endpoint.replace(device_id, "{id}")
+
+        with self._lock:
+            indice_device = self._internar(self.devices, TIPO_DEVICE, device_id) if device_id else SEM_DEVICE
+            indice_endpoint = self._internar(self.endpoints, TIPO_ENDPOINT, endpoint)
+            indice_conteudo = (self._internar(self.tipos_conteudo, TIPO_CONTEUDO, tipo_conteudo)
+                               if tipo_conteudo else SEM_CONTEUDO)
+            self._arquivo.write(REQUISICAO.pack(
+                TIPO_REQUISICAO, METODOS.index(metodo.upper()), indice_device, indice_endpoint, indice_conteudo,
+                -1 if status is None else status,
+                self.relogio() if timestamp is None else timestamp,
+                latencia * 1000, len(corpo)
+            ) + corpo)
+
+    def anexar(self, sessao):
+        """Passa a gravar todas as requisições enviadas pela sessão"""
+        return AdaptadorObservado.instalar(sessao, self)
+
+    def fechar(self):
+        with self._lock:
+            self._arquivo.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+class AdaptadorObservado(BaseAdapter):
+    """Envolve o adaptador HTTP de uma sessão e informa cada envio, inclusive falhas,
+    a um observador com o método registrar(metodo, url, corpo, status, latencia, tipo_conteudo=None)
+
+    Pode ser aplicado mais de uma vez (gravação + métricas), um envolvendo o outro.
+    """
+
+    def __init__(self, interno, observador):
+        super().__init__()
+        self.interno = interno
+        self.observador = observador
+
+    @classmethod
+    def instalar(cls, sessao, observador):
+        """Envolve todos os adaptadores da sessão (uma vez por observador)"""
+        for prefixo, adaptador in list(sessao.adapters.items()):
+            atual = adaptador
+            # Percorre a cadeia de envoltórios (outros observadores, cache) atrás deste
+            while not (isinstance(atual, cls) and atual.observador is observador) and hasattr(atual, "interno"):
+                atual = atual.interno
+            if not (isinstance(atual, cls) and atual.observador is observador):
+                sessao.mount(prefixo, cls(adaptador, observador))
+        return sessao
+
+    def send(self, request, **kwargs):
+        inicio = time.perf_counter()
+        status = None
+        try:
+            response = self.interno.send(request, **kwargs)
+            status = response.status_code
+            return response
+        finally:
+            self.observador.registrar(request.method, request.url, request.body,
+                                      status, time.perf_counter() - inicio,
+                                      tipo_conteudo=request.headers.get("Content-Type"))
+
+    def close(self):
+        self.interno.close()
+
+class LeitorTrafego:
+    """Leitura sequencial do log via mmap"""
+
+    def __init__(self, caminho):
+        self._arquivo = open(caminho, "rb")
+        self._mapa = mmap.mmap(self._arquivo.fileno(), 0, access=mmap.ACCESS_READ)
+        magico, versao, _ = CABECALHO.unpack_from(self._mapa, 0)
+        if magico != MAGICO:
+            raise ValueError(f"{caminho} não é um log de tráfego válido")
+        if versao != VERSAO:
+            raise ValueError(f"{caminho}: log de tráfego na versão {versao}, esperada {VERSAO} (grave de novo)")
+        self.devices = []
+        self.endpoints = []
+        self.tipos_conteudo = []
+        # Primeira varredura só para carregar as tabelas internadas
+        for _ in self._varrer(decodificar=False):
+            pass
+
+    def _varrer(self, decodificar=True):
+        """Percorre os registros; só as requisições são retornadas"""
+        mapa = self._mapa
+        posicao = CABECALHO.size
+        fim = len(mapa)
+        tamanho_requisicao = REQUISICAO.size
+        while posicao < fim:
+            tipo = mapa[posicao]
+            if tipo == TIPO_REQUISICAO:
+                if posicao + tamanho_requisicao > fim:
+                    break  # registro incompleto no fim do arquivo
+                campos = REQUISICAO.unpack_from(mapa, posicao)
+                inicio_payload = posicao + tamanho_requisicao
+                posicao = inicio_payload + campos[8]
+                if decodificar:
+                    yield campos, inicio_payload
+            else:
+                _, indice, tamanho = ENTRADA_TABELA.unpack_from(mapa, posicao)
+                inicio = posicao + ENTRADA_TABELA.size
+                nome = bytes(mapa[inicio:inicio + tamanho]).decode("utf-8")
+                tabela = {TIPO_DEVICE: self.devices, TIPO_ENDPOINT: self.endpoints}.get(tipo, self.tipos_conteudo)
+                if indice == len(tabela):
+                    tabela.append(nome)
+                posicao = inicio + tamanho
+
+    def __iter__(self):
+        for campos, inicio_payload in self._varrer():
+            _, metodo, device, endpoint, conteudo, status, timestamp, latencia, tamanho = campos
+            yield Registro(
+                timestamp, METODOS[metodo],
+                None if device == SEM_DEVICE else self.devices[device],
+                self.endpoints[endpoint],
+                None if status < 0 else status,
+                latencia,
+                bytes(self._mapa[inicio_payload:inicio_payload + tamanho]),
+                None if conteudo == SEM_CONTEUDO else self.tipos_conteudo[conteudo]
+            )
+
+    def resumo(self):
+        """Contagem por endpoint e status sem decodificar os payloads"""
+        por_endpoint = Counter()
+        por_status = Counter()
+        total = 0
+        primeiro = ultimo = None
+        for campos, _ in self._varrer():
+            total += 1
+            por_endpoint[f"{METODOS[campos[1]]} {self.endpoints[campos[3]]}"] += 1
+            por_status[campos[5]] += 1
+            primeiro = campos[6] if primeiro is None else primeiro
+            ultimo = campos[6]
+        return {
+            "requisicoes": total,
+            "devices": len(self.devices),
+            "duracao_segundos": (ultimo - primeiro) if total else 0,
+            "endpoints": dict(por_endpoint),
+            "status": {("erro" if s < 0 else str(s)): n for s, n in por_status.items()},
+        }
+
+    def fechar(self):
+        self._mapa.close()
+        self._arquivo.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+class ReprodutorTrafego:
+    """Reenvia um log gravado para uma API, a 1x, Nx (velocidade) ou no máximo (velocidade=0)"""
+
+    def __init__(self, caminho, api_base_url, velocidade=1.0, workers=8, timeout=10):
+        self.caminho = caminho
+        self.api_base_url = api_base_url.rstrip("/")
+        self.velocidade = velocidade
+        self.workers = workers
+        self.timeout = timeout
+        self.histograma = HistogramaLatencia()
+        self.enviados = 0
+        self.status_iguais = 0
+        self.falhas = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # Sessões por thread (requests.Session não é thread-safe) sobre um pool só
+        self.transporte = TransporteHTTP(tamanho_pool=workers)
+
+    def _sessao(self):
+        sessao = getattr(self._local, "sessao", None)
+        if sessao is None:
+            sessao = self._local.sessao = self.transporte.sessao()
+            sessao.headers.update({'User-Agent': 'ESP32-Replay/1.0'})
+        return sessao
+
+    def _enviar(self, registro):
+        url = self.api_base_url + registro.endpoint
+        if registro.device_id:
+            url = url.replace("{id}", registro.device_id)
+        # O Content-Type gravado; logs sem ele eram só JSON
+        headers = None
+        if registro.payload:
+            headers = {'Content-Type': registro.tipo_conteudo or 'application/json'}
+        inicio = time.perf_counter()
+        try:
+            response = self._sessao().request(registro.metodo, url, data=registro.payload or None,
+                                              headers=headers, timeout=self.timeout)
+            status = response.status_code
+        except requests.exceptions.RequestException:
+            status = None
+        latencia = time.perf_counter() - inicio
+        with self._lock:
+            self.enviados += 1
+            self.histograma.registrar(latencia)
+            if status is None:
+                self.falhas += 1
+            if status == registro.status:
+                self.status_iguais += 1
+
+    def executar(self):
+        """Reenvia a sessão gravada respeitando os intervalos originais (÷ velocidade)"""
+        inicio_real = time.perf_counter()
+        with LeitorTrafego(self.caminho) as leitor, ThreadPoolExecutor(self.workers) as executor:
+            primeiro = None
+            for registro in leitor:
+                if primeiro is None:
+                    primeiro = registro.timestamp
+                if self.velocidade:
+                    espera = inicio_real + (registro.timestamp - primeiro) / self.velocidade - time.perf_counter()
+                    if espera > 0:
+                        time.sleep(espera)
+                executor.submit(self._enviar, registro)
+        duracao = time.perf_counter() - inicio_real
+        return {
+            "enviados": self.enviados,
+            "falhas": self.falhas,
+            "status_iguais_ao_gravado": self.status_iguais,
+            "duracao_segundos": duracao,
+            "requisicoes_por_segundo": self.enviados / duracao if duracao else 0,
+            "latencia": self.histograma.resumo(),
+            "conexoes": self.transporte.estatisticas(),
+        }
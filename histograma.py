@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Histograma de latência no estilo HDR
+Buckets log-lineares em microssegundos: erro relativo limitado por
+2^-(bits_precisao-1) em toda a faixa, com memória fixa e registro em O(1)
+"""
+
+import math
+
+def posicao_percentil(p, total):
+    """Posição (1..total) do percentil p pelo critério do vizinho mais próximo"""
+    return max(1, math.ceil(p / 100.0 * total))
+
+def percentil(ordenados, p):
+    """Percentil exato de uma lista já ordenada, com o mesmo critério do histograma"""
+    if not ordenados:
+        return 0.0
+    return ordenados[min(len(ordenados), posicao_percentil(p, len(ordenados))) - 1]
+
+class HistogramaLatencia:
+    """Histograma de latências (registradas em segundos, armazenadas em µs)"""
+
+    def __init__(self, bits_precisao=8):
+        # 8 bits: 128 sub-buckets por potência de 2, erro relativo < 0.8%
+        self.bits_precisao = bits_precisao
+        self._sub = 1 << bits_precisao
+        self._metade = self._sub >> 1
+        self.contagens = []
+        self.total = 0
+        self.soma_us = 0
+        self.minimo_us = None
+        self.maximo_us = 0
+
+    def _indice(self, valor):
+        if valor < self._sub:
+            return valor
+        expoente = valor.bit_length() - self.bits_precisao
+        return (expoente << (self.bits_precisao - 1)) + (valor >> expoente)
+
+    def _limites(self, indice):
+        """Faixa de valores [inferior, superior] coberta por um bucket"""
+        if indice < self._sub:
+            return indice, indice
+        expoente = indice // self._metade - 1
+        mantissa = indice - expoente * self._metade
+        return mantissa << expoente, ((mantissa + 1) << expoente) - 1
+
+    def registrar_us(self, valor_us, quantidade=1):
+        valor_us = max(0, int(valor_us))
+        indice = self._indice(valor_us)
+        if indice >= len(self.contagens):
+            self.contagens.extend([0] * (indice + 1 - len(self.contagens)))
+        self.contagens[indice] += quantidade
+        self.total += quantidade
+        self.soma_us += valor_us * quantidade
+        if self.minimo_us is None or valor_us < self.minimo_us:
+            self.minimo_us = valor_us
+        if valor_us > self.maximo_us:
+            self.maximo_us = valor_us
+
+    def registrar(self, segundos):
+        """Registra uma latência em segundos"""
+        self.registrar_us(segundos * 1e6)
+
+    def registrar_corrigido(self, segundos, intervalo_esperado):
+        """Registra compensando omissão coordenada
+
+        Como no HdrHistogram: se a resposta demorou mais que o intervalo
+        esperado entre requisições, registra também as amostras que teriam
+        sido enviadas (e esperado) durante a espera.
+        """
+        self.registrar(segundos)
+        if not intervalo_esperado or intervalo_esperado <= 0:
+            return
+        faltante = segundos - intervalo_esperado
+        while faltante >= intervalo_esperado:
+            self.registrar(faltante)
+            faltante -= intervalo_esperado
+
+    def mesclar(self, outro):
+        """Soma as contagens de outro histograma com a mesma precisão"""
+        if outro.bits_precisao != self.bits_precisao:
+            raise ValueError("Histogramas com precisões diferentes")
+        if len(outro.contagens) > len(self.contagens):
+            self.contagens.extend([0] * (len(outro.contagens) - len(self.contagens)))
+        for indice, contagem in enumerate(outro.contagens):
+            self.contagens[indice] += contagem
+        self.total += outro.total
+        self.soma_us += outro.soma_us
+        if outro.minimo_us is not None and (self.minimo_us is None or outro.minimo_us < self.minimo_us):
+            self.minimo_us = outro.minimo_us
+        self.maximo_us = max(self.maximo_us, outro.maximo_us)
+
+    def percentil(self, p):
+        """Valor (em segundos) abaixo do qual estão p% das amostras"""
+        if not self.total:
+            return 0.0
+        alvo = posicao_percentil(p, self.total)
+        acumulado = 0
+        for indice, contagem in enumerate(self.contagens):
+            acumulado += contagem
+            if acumulado >= alvo:
+                return min(self._limites(indice)[1], self.maximo_us) / 1e6
+        return self.maximo_us / 1e6
+
+    def media(self):
+        return (self.soma_us / self.total) / 1e6 if self.total else 0.0
+
+    def resumo(self, percentis=(50, 90, 99, 99.9)):
+        """Dicionário com contagem, média, mínimo, máximo e percentis em ms"""
+        resumo = {
+            "contagem": self.total,
+            "media_ms": self.media() * 1000,
+            "min_ms": (self.minimo_us or 0) / 1000,
+            "max_ms": self.maximo_us / 1000,
+        }
+        for p in percentis:
+            resumo[f"p{p:g}_ms"] = self.percentil(p) * 1000
+        return resumo
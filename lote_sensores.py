@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Agrupamento de leituras dos sensores
+Acumula leituras por device (ou da frota inteira) e as envia em lote para
+/sensors quando o lote atinge o tamanho, a idade ou o limite de bytes configurado
+"""
+
+import time
+from collections import Counter
+
+from histograma import HistogramaLatencia, percentil
+from payloads import codificar_json, corpo_leitura
+
+def serializar_lote(lote):
+    """Serializa um lote de leituras no payload em massa de /sensors (array JSON)"""
+    return codificar_json(lote)
+
+class _Lote:
+    __slots__ = ("leituras", "bytes", "criado_em")
+
+    def __init__(self, criado_em):
+        self.leituras = []
+        self.bytes = 2  # colchetes do array
+        self.criado_em = criado_em
+
+class AgrupadorLeituras:
+    """Buffer de leituras com critérios de envio por tamanho, idade e bytes"""
+
+    def __init__(self, max_leituras=50, max_idade=10.0, max_bytes=16384,
+                 por_dispositivo=False, relogio=time.monotonic):
+        self.max_leituras = max_leituras
+        self.max_idade = max_idade
+        self.max_bytes = max_bytes
+        self.por_dispositivo = por_dispositivo
+        self.relogio = relogio
+
+        self._lotes = {}
+
+        # Estatísticas
+        self.total_leituras = 0
+        self.total_lotes = 0
+        self.bytes_individuais = 0
+        self.bytes_lotes = 0
+        self.falhas = 0
+        self.tamanhos = Counter()
+        self.motivos = Counter()
+        self.latencias = HistogramaLatencia()
+        self.atrasos = HistogramaLatencia()
+
+    def _chave(self, leitura):
+        return leitura["device_id"] if self.por_dispositivo else None
+
+    def adicionar(self, leitura):
+        """Adiciona uma leitura e retorna a lista de lotes prontos para envio"""
+        agora = self.relogio()
+        tamanho = len(corpo_leitura(leitura))
+        self.total_leituras += 1
+        self.bytes_individuais += tamanho
+
+        prontos = []
+        chave = self._chave(leitura)
+        lote = self._lotes.get(chave)
+
+        # Se a leitura estourar o limite de bytes, envia o lote atual antes
+        if lote is not None and lote.leituras and lote.bytes + tamanho + 1 > self.max_bytes:
+            prontos.append(self._fechar(chave, "bytes"))
+            lote = None
+
+        if lote is None:
+            lote = self._lotes[chave] = _Lote(agora)
+
+        lote.bytes += tamanho + (1 if lote.leituras else 0)
+        lote.leituras.append(leitura)
+
+        if len(lote.leituras) >= self.max_leituras:
+            prontos.append(self._fechar(chave, "tamanho"))
+        elif lote.bytes >= self.max_bytes:
+            prontos.append(self._fechar(chave, "bytes"))
+
+        return prontos
+
+    def vencidos(self):
+        """Retorna os lotes cuja leitura mais antiga já passou de max_idade"""
+        agora = self.relogio()
+        chaves = [
+            chave for chave, lote in self._lotes.items()
+            if lote.leituras and agora - lote.criado_em >= self.max_idade
+        ]
+        return [self._fechar(chave, "idade") for chave in chaves]
+
+    def esvaziar(self):
+        """Retorna todos os lotes pendentes (ex.: ao finalizar a simulação)"""
+        return [self._fechar(chave, "final") for chave in list(self._lotes) if self._lotes[chave].leituras]
+
+    def pendentes(self):
+        """Número de leituras ainda no buffer"""
+        return sum(len(lote.leituras) for lote in self._lotes.values())
+
+    def _fechar(self, chave, motivo):
+        lote = self._lotes.pop(chave)
+        self.atrasos.registrar(self.relogio() - lote.criado_em)
+        self.motivos[motivo] += 1
+        return lote.leituras
+
+    def registrar_envio(self, lote, latencia, sucesso, tamanho_bytes):
+        """Registra o resultado do envio de um lote"""
+        self.total_lotes += 1
+        self.bytes_lotes += tamanho_bytes
+        self.tamanhos[len(lote)] += 1
+        self.latencias.registrar(latencia)
+        if not sucesso:
+            self.falhas += 1
+
+    def resumo(self):
+        """Distribuição de latência de envio e de tamanho dos lotes"""
+        latencias = self.latencias
+        atrasos = self.atrasos
+        tamanhos = sorted(self.tamanhos.elements())
+        return {
+            "leituras": self.total_leituras,
+            "lotes": self.total_lotes,
+            "falhas": self.falhas,
+            "requisicoes_economizadas": max(0, self.total_leituras - self.total_lotes - self.pendentes()),
+            "bytes_individuais": self.bytes_individuais,
+            "bytes_lotes": self.bytes_lotes,
+            "motivos": dict(self.motivos),
+            "tamanho_lote": {
+                "medio": sum(tamanhos) / len(tamanhos) if tamanhos else 0,
+                "p50": percentil(tamanhos, 50),
+                "p90": percentil(tamanhos, 90),
+                "max": tamanhos[-1] if tamanhos else 0,
+                "distribuicao": dict(sorted(self.tamanhos.items())),
+            },
+            "latencia_envio_ms": {
+                "p50": latencias.percentil(50) * 1000,
+                "p90": latencias.percentil(90) * 1000,
+                "p99": latencias.percentil(99) * 1000,
+                "max": latencias.maximo_us / 1000,
+            },
+            "atraso_leitura_ms": {
+                "p50": atrasos.percentil(50) * 1000,
+                "p99": atrasos.percentil(99) * 1000,
+                "max": atrasos.maximo_us / 1000,
+            },
+        }
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Métricas e rastreamento do simulador
+Contadores, medidores (gauges) e histogramas de latência por endpoint e
+device, além de spans por ciclo. Exporta no formato texto do Prometheus e
+em snapshots JSON periódicos, sem depender de print() no caminho quente.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from gravacao_trafego import AdaptadorObservado, extrair_device
+from histograma import HistogramaLatencia
+from transporte_resiliente import chave_endpoint
+
+# Quantis exportados para cada histograma (como summary do Prometheus)
+QUANTIS = (0.5, 0.9, 0.99, 0.999)
+
+def _chave(nome, rotulos):
+    return nome, tuple(sorted((k, str(v)) for k, v in rotulos.items() if v is not None))
+
+def _formatar_rotulos(rotulos, extra=()):
+    pares = list(rotulos) + list(extra)
+    if not pares:
+        return ""
+    escapados = ('{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+                 for k, v in pares)
+    return "{" + ",".join(escapados) + "}"
+
+class RegistroMetricas:
+    """Registro de métricas thread-safe
+
+    Com `por_dispositivo=False` o rótulo device_id é descartado, mantendo o
+    número de séries constante mesmo em frotas com milhares de devices.
+    """
+
+    def __init__(self, prefixo="regador", por_dispositivo=False, max_spans=1000, relogio=time.time):
+        self.prefixo = prefixo
+        self.por_dispositivo = por_dispositivo
+        self.relogio = relogio
+        self.contadores = {}
+        self.medidores = {}
+        self.histogramas = {}
+        # Spans recentes (os mais antigos são descartados)
+        self.spans = deque(maxlen=max_spans)
+        self._lock = threading.Lock()
+
+    def _rotulos(self, rotulos):
+        if not self.por_dispositivo:
+            rotulos.pop("device_id", None)
+        return rotulos
+
+    def incrementar(self, nome, valor=1, **rotulos):
+        """Soma `valor` a um contador"""
+        chave = _chave(nome, self._rotulos(rotulos))
+        with self._lock:
+            self.contadores[chave] = self.contadores.get(chave, 0) + valor
+
+    def definir(self, nome, valor, **rotulos):
+        """Atualiza um medidor com o valor atual
+
+        Medidores de um device (umidade, bomba) só fazem sentido por device:
+        sem `por_dispositivo` eles são ignorados em vez de se sobrescreverem.
+        """
+        if rotulos.get("device_id") is not None and not self.por_dispositivo:
+            return
+        chave = _chave(nome, self._rotulos(rotulos))
+        with self._lock:
+            self.medidores[chave] = valor
+
+    def observar(self, nome, segundos, **rotulos):
+        """Registra uma duração (em segundos) no histograma"""
+        chave = _chave(nome, self._rotulos(rotulos))
+        with self._lock:
+            histograma = self.histogramas.get(chave)
+            if histograma is None:
+                histograma = self.histogramas[chave] = HistogramaLatencia()
+            histograma.registrar(segundos)
+
+    @contextmanager
+    def span(self, nome, **rotulos):
+        """Mede um trecho de código; a duração vai para `{nome}_duracao_segundos`
+
+        Os rótulos (ex.: device_id, ciclo) ficam só no registro do span, não
+        no histograma, para não multiplicar séries.
+        """
+        registro = {"nome": nome, "inicio": self.relogio(), **rotulos}
+        inicio = time.perf_counter()
+        try:
+            yield registro
+        except Exception as e:
+            registro["erro"] = type(e).__name__
+            raise
+        finally:
+            duracao = time.perf_counter() - inicio
+            registro["duracao_ms"] = duracao * 1000
+            self.observar(f"{nome}_duracao_segundos", duracao)
+            with self._lock:
+                self.spans.append(registro)
+
+    def registrar_requisicao(self, endpoint, status, latencia, device_id=None):
+        """Contagem por status e latência de uma requisição; `status` None é erro de conexão"""
+        self.incrementar("requisicoes_total", endpoint=endpoint,
+                         status="erro" if status is None else status, device_id=device_id)
+        self.observar("latencia_requisicao_segundos", latencia, endpoint=endpoint, device_id=device_id)
+
+    def registrar(self, metodo, url, corpo, status, latencia, tipo_conteudo=None):
+        """Observador de AdaptadorObservado (mesma assinatura do GravadorTrafego)"""
+        device_id = extrair_device(url, corpo) if self.por_dispositivo else None
+        self.registrar_requisicao(chave_endpoint(metodo, url), status, latencia, device_id)
+
+    def instrumentar_sessao(self, sessao):
+        """Passa a medir todas as requisições de uma requests.Session"""
+        return AdaptadorObservado.instalar(sessao, self)
+
+    def exportar_prometheus(self):
+        """Texto no formato de exposição do Prometheus (histogramas como summary)"""
+        linhas = []
+        with self._lock:
+            for tipo, series in (("counter", self.contadores), ("gauge", self.medidores)):
+                ultimo = None
+                for (nome, rotulos), valor in sorted(series.items()):
+                    nome = f"{self.prefixo}_{nome}"
+                    if nome != ultimo:
+                        linhas.append(f"# TYPE {nome} {tipo}")
+                        ultimo = nome
+                    linhas.append(f"{nome}{_formatar_rotulos(rotulos)} {valor}")
+            ultimo = None
+            for (nome, rotulos), histograma in sorted(self.histogramas.items(), key=lambda item: item[0]):
+                nome = f"{self.prefixo}_{nome}"
+                if nome != ultimo:
+                    linhas.append(f"# TYPE {nome} summary")
+                    ultimo = nome
+                for q in QUANTIS:
+                    linhas.append(f"{nome}{_formatar_rotulos(rotulos, [('quantile', q)])} "
+                                  f"{histograma.percentil(q * 100):.6f}")
+                linhas.append(f"{nome}_sum{_formatar_rotulos(rotulos)} {histograma.soma_us / 1e6:.6f}")
+                linhas.append(f"{nome}_count{_formatar_rotulos(rotulos)} {histograma.total}")
+        return "\n".join(linhas) + "\n"
+
+    def instantaneo(self):
+        """Snapshot em dicionário serializável em JSON"""
+        def serie(chave, **valores):
+            nome, rotulos = chave
+            return {"nome": nome, "rotulos": dict(rotulos), **valores}
+
+        with self._lock:
+            return {
+                "timestamp": self.relogio(),
+                "contadores": [serie(c, valor=v) for c, v in self.contadores.items()],
+                "medidores": [serie(c, valor=v) for c, v in self.medidores.items()],
+                "histogramas": [serie(c, **h.resumo()) for c, h in self.histogramas.items()],
+                "spans_recentes": len(self.spans),
+            }
+
+class ExportadorPeriodico:
+    """Thread que grava snapshots JSON (uma linha por snapshot) e, opcionalmente,
+    o arquivo .prom para o textfile collector do node_exporter"""
+
+    def __init__(self, registro, caminho_json, intervalo=10.0, caminho_prometheus=None):
+        self.registro = registro
+        self.caminho_json = caminho_json
+        self.intervalo = intervalo
+        self.caminho_prometheus = caminho_prometheus
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._executar, daemon=True)
+
+    def exportar(self):
+        with open(self.caminho_json, "a", encoding="utf-8") as arquivo:
+            arquivo.write(json.dumps(self.registro.instantaneo(), ensure_ascii=False) + "\n")
+        if self.caminho_prometheus:
+            # Escreve num temporário e renomeia para o coletor nunca ler um arquivo pela metade
+            temporario = self.caminho_prometheus + ".tmp"
+            with open(temporario, "w", encoding="utf-8") as arquivo:
+                arquivo.write(self.registro.exportar_prometheus())
+            os.replace(temporario, self.caminho_prometheus)
+
+    def _executar(self):
+        while not self._parar.wait(self.intervalo):
+            self.exportar()
+
+    def iniciar(self):
+        self._thread.start()
+        return self
+
+    def parar(self):
+        """Encerra a thread e grava um último snapshot"""
+        self._parar.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        self.exportar()
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *exc):
+        self.parar()
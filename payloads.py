@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Payloads pré-serializados do simulador
+Os corpos de /pump/{id}/control são constantes por (action, reason,
+triggered_by) e os de /sensors só mudam em umidade_solo e timestamp: em vez de
+montar um dict e deixar o requests serializar com o json da stdlib a cada
+ciclo, as partes fixas ficam em templates de bytes. Com orjson instalado ele
+serializa as leituras e os lotes (é mais rápido até que o template).
+
+    python payloads.py      # microbenchmark: custo por requisição antes/depois
+"""
+
+import json
+import time
+import timeit
+from functools import lru_cache
+
+try:
+    import orjson
+except ImportError:  # opcional: cai para o json da stdlib
+    orjson = None
+
+def codificar_json(obj):
+    """JSON compacto em bytes (orjson quando disponível)"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+@lru_cache(maxsize=65536)
+def _modelo_leitura(device_id):
+    # O device_id é serializado uma única vez; '%' é escapado para o template
+    sufixo = json.dumps(device_id, ensure_ascii=False).encode('utf-8').replace(b'%', b'%%')
+    return b'{"umidade_solo":%d,"timestamp":%d,"device_id":' + sufixo + b'}'
+
+def corpo_leitura(dados):
+    """Corpo de POST /sensors para uma leitura, no mesmo formato de gerar_leitura
+
+    Com orjson o dict inteiro é serializado por ele (mais rápido que o template);
+    sem orjson usa o template. Leituras fora do formato padrão (campos extras,
+    umidade não inteira) são serializadas normalmente.
+    """
+    if orjson is not None:
+        return orjson.dumps(dados)
+    umidade = dados.get('umidade_solo')
+    timestamp = dados.get('timestamp')
+    if (len(dados) == 3 and type(umidade) is int and type(timestamp) is int
+            and isinstance(dados.get('device_id'), str)):
+        return _modelo_leitura(dados['device_id']) % (umidade, timestamp)
+    return codificar_json(dados)
+
+@lru_cache(maxsize=4096)
+def corpo_controle(action, reason, triggered_by):
+    """Corpo de POST /pump/{id}/control; constante, então fica inteiro em cache"""
+    return codificar_json({"action": action, "reason": reason, "triggered_by": triggered_by})
+
+def _custo_us(funcao, repeticoes):
+    """Tempo de CPU por chamada, em µs (melhor de 5 rodadas)"""
+    timer = timeit.Timer(funcao, timer=time.process_time)
+    return min(timer.repeat(5, repeticoes)) / repeticoes * 1e6
+
+def microbenchmark(repeticoes=20000):
+    """Custo de CPU por requisição: json da stdlib (caminho do requests) x orjson x template
+
+    Mede só a serialização e também a preparação completa da requisição
+    (requests.Request(...).prepare()), que é o que o simulador paga por ciclo.
+    """
+    import requests
+
+    url = "http://localhost:3000/api/sensors"
+    leitura = {"umidade_solo": 57, "timestamp": int(time.time() * 1000), "device_id": "ESP32_SIM_00042"}
+    controle = {"action": "activate", "reason": "Umidade baixa (< 30%)", "triggered_by": "automatic"}
+
+    casos = {
+        "leitura: json stdlib (como o requests)": lambda: json.dumps(leitura).encode('utf-8'),
+        "leitura: template": lambda: _modelo_leitura(leitura["device_id"]) % (
+            leitura["umidade_solo"], leitura["timestamp"]),
+        "leitura: corpo_leitura": lambda: corpo_leitura(leitura),
+        "controle: json stdlib (como o requests)": lambda: json.dumps(controle).encode('utf-8'),
+        "controle: template em cache": lambda: corpo_controle(
+            controle["action"], controle["reason"], controle["triggered_by"]),
+        "requisição: prepare(json=dict)": lambda: requests.Request("POST", url, json=leitura).prepare(),
+        "requisição: prepare(data=corpo_leitura)": lambda: requests.Request(
+            "POST", url, data=corpo_leitura(leitura), headers={'Content-Type': 'application/json'}).prepare(),
+    }
+    if orjson is not None:
+        casos["leitura: orjson"] = lambda: orjson.dumps(leitura)
+        casos["controle: orjson"] = lambda: orjson.dumps(controle)
+    return {nome: _custo_us(funcao, repeticoes) for nome, funcao in sorted(casos.items())}
+
+def main():
+    print("⏱️  MICROBENCHMARK - SERIALIZAÇÃO DE PAYLOADS")
+    print("=" * 60)
+    print(f"orjson: {'disponível' if orjson is not None else 'não instalado (usando json da stdlib)'}")
+    resultados = microbenchmark()
+    for nome, custo in resultados.items():
+        print(f"   {nome:<42} {custo:8.2f} µs")
+
+    antes = resultados["requisição: prepare(json=dict)"]
+    depois = resultados["requisição: prepare(data=corpo_leitura)"]
+    print(f"\n📉 Custo por requisição: {antes:.1f} µs -> {depois:.1f} µs "
+          f"({(1 - depois / antes) * 100:.0f}% menos CPU)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Políticas de transmissão das leituras (report-on-change)
+O main.ino (a cada 30s) e o simulador (a cada 5s) enviam toda leitura, mesmo
+sem mudança de umidade. Aqui cada política decide, leitura a leitura, se ela
+vai para a API: banda morta em torno do último valor enviado, heartbeat
+após um silêncio máximo e cadência mais curta perto dos limiares 30%/70%. A
+análise mede sobre um traço gerado ou reproduzido quanto cada política
+economiza em requisições e bytes e quão desatualizado o servidor fica.
+
+    python politica_transmissao.py   # compara as políticas num traço gerado
+"""
+
+from controle_bomba import LIMIAR_ATIVACAO, LIMIAR_DESATIVACAO, ControleHisterese
+from histograma import percentil
+from payloads import corpo_leitura
+
+# Linha de requisição + cabeçalhos de um POST /sensors (estimativa; ver formato_binario.py)
+BYTES_CABECALHO = 200
+
+class PoliticaTransmissao:
+    """Transmite toda leitura (comportamento atual do firmware e do simulador)
+
+    Guarda por device a última leitura enviada, então uma instância pode ser
+    compartilhada pela frota inteira.
+    """
+
+    nome = "sempre"
+
+    def __init__(self):
+        self.ultimos = {}
+        self.transmitidas = 0
+        self.suprimidas = 0
+
+    def deve_transmitir(self, device_id, agora, umidade, bomba=False):
+        """True se a leitura deve ser enviada; registra o envio como feito"""
+        ultimo = self.ultimos.get(device_id)
+        if ultimo is not None and not self._transmitir(ultimo, agora, umidade, bomba):
+            self.suprimidas += 1
+            return False
+        self.ultimos[device_id] = (agora, umidade, bomba)
+        self.transmitidas += 1
+        return True
+
+    def _transmitir(self, ultimo, agora, umidade, bomba):
+        return True
+
+    def reiniciar(self):
+        self.ultimos.clear()
+        self.transmitidas = self.suprimidas = 0
+
+    def estatisticas(self):
+        total = self.transmitidas + self.suprimidas
+        return {
+            "politica": self.nome,
+            "transmitidas": self.transmitidas,
+            "suprimidas": self.suprimidas,
+            "reducao": self.suprimidas / total if total else 0.0,
+        }
+
+class PoliticaBandaMorta(PoliticaTransmissao):
+    """Envia quando a umidade sai de ±`banda` pontos do último valor enviado
+
+    Também envia quando a bomba muda de estado e, como heartbeat, depois de
+    `max_silencio` segundos sem enviar nada.
+    """
+
+    def __init__(self, banda=2, max_silencio=300.0):
+        super().__init__()
+        self.banda = banda
+        self.max_silencio = max_silencio
+        self.nome = f"banda ±{banda:g}%, heartbeat {max_silencio:g}s"
+
+    def _limites(self, umidade):
+        return self.banda, self.max_silencio
+
+    def _transmitir(self, ultimo, agora, umidade, bomba):
+        instante, valor, bomba_enviada = ultimo
+        banda, max_silencio = self._limites(umidade)
+        return (bomba != bomba_enviada or abs(umidade - valor) >= banda
+                or agora - instante >= max_silencio)
+
+class PoliticaAdaptativa(PoliticaBandaMorta):
+    """Banda morta larga longe dos limiares e estreita (com heartbeat curto) perto deles
+
+    Dentro de `margem` pontos de um limiar a bomba está perto de mudar, então o
+    servidor passa a receber variações de `banda_perto` e no mínimo uma
+    leitura a cada `max_silencio_perto` segundos.
+    """
+
+    def __init__(self, banda=4, max_silencio=900.0, banda_perto=1, max_silencio_perto=60.0, margem=5,
+                 limiares=(LIMIAR_ATIVACAO, LIMIAR_DESATIVACAO)):
+        super().__init__(banda, max_silencio)
+        self.banda_perto = banda_perto
+        self.max_silencio_perto = max_silencio_perto
+        self.margem = margem
+        self.limiares = limiares
+        self.nome = (f"adaptativa ±{banda:g}%/{max_silencio:g}s, "
+                     f"±{banda_perto:g}%/{max_silencio_perto:g}s a {margem:g} pts dos limiares")
+
+    def perto_do_limiar(self, umidade):
+        return any(abs(umidade - limiar) <= self.margem for limiar in self.limiares)
+
+    def _limites(self, umidade):
+        if self.perto_do_limiar(umidade):
+            return self.banda_perto, self.max_silencio_perto
+        return self.banda, self.max_silencio
+
+def politicas_padrao():
+    """Candidatas comparadas por padrão, da atual à mais econômica"""
+    return [
+        PoliticaTransmissao(),
+        PoliticaBandaMorta(banda=1, max_silencio=300.0),
+        PoliticaBandaMorta(banda=2, max_silencio=300.0),
+        PoliticaBandaMorta(banda=5, max_silencio=900.0),
+        PoliticaAdaptativa(),
+    ]
+
+class TracoLeituras:
+    """Séries por device: {device_id: (instantes em s, leituras em %, bomba ligada)}"""
+
+    def __init__(self, series, origem):
+        self.series = series
+        self.origem = origem
+
+    @property
+    def leituras(self):
+        return sum(len(tempos) for tempos, _, _ in self.series.values())
+
+def traco_gerado(num_dispositivos=50, horas=24.0, dt=30.0, seed=None, prefixo="ESP32_SIM_", inicio=0.0):
+    """Traço do modelo físico (gerador_umidade), com a bomba na histerese"""
+    from gerador_umidade import GeradorUmidade
+
+    amostras = int(horas * 3600 / dt)
+    traco = GeradorUmidade(dt=dt, seed=seed).gerar(num_dispositivos, amostras)
+    tempos = [inicio + k * dt for k in range(amostras)]
+    series = {
+        f"{prefixo}{i + 1:05d}": (tempos, traco.leitura[i].tolist(), traco.bomba[i].tolist())
+        for i in range(num_dispositivos)
+    }
+    return TracoLeituras(series, f"gerado: {num_dispositivos} devices, {horas:g} h a cada {dt:g}s")
+
+def traco_de_leituras(leituras, origem="leituras", controle=None):
+    """Traço a partir de leituras ({umidade_solo, timestamp em ms, device_id}), ex.: um CSV
+
+    O estado da bomba é recalculado pela histerese sobre as próprias leituras,
+    como o device faria.
+    """
+    controle = controle or ControleHisterese()
+    por_device = {}
+    for leitura in leituras:
+        por_device.setdefault(leitura["device_id"], []).append(
+            (leitura["timestamp"] / 1000.0, leitura["umidade_solo"]))
+    series = {}
+    for device_id, pontos in por_device.items():
+        pontos.sort()
+        bombas = []
+        ligada = False
+        for _, umidade in pontos:
+            bombas.append(ligada)
+            acao = controle.decidir(umidade, ligada)
+            if acao:
+                ligada = not ligada
+        series[device_id] = ([t for t, _ in pontos], [u for _, u in pontos], bombas)
+    return TracoLeituras(series, origem)
+
+def traco_de_trafego(caminho):
+    """Traço com as leituras de POST /sensors de um log do gravacao_trafego"""
+    import json
+
+    from formato_binario import decodificar_leituras
+    from gravacao_trafego import LeitorTrafego
+
+    def leituras():
+        with LeitorTrafego(caminho) as leitor:
+            for registro in leitor:
+                if registro.metodo != "POST" or not registro.endpoint.endswith("/sensors"):
+                    continue
+                try:
+                    dados = json.loads(registro.payload)
+                except ValueError:
+                    try:
+                        dados = decodificar_leituras(registro.payload)
+                    except ValueError:
+                        continue
+                for leitura in dados if isinstance(dados, list) else [dados]:
+                    if isinstance(leitura, dict) and "timestamp" in leitura and "umidade_solo" in leitura:
+                        yield leitura
+
+    return traco_de_leituras(leituras(), f"tráfego: {caminho}")
+
+def avaliar_politica(politica, traco, margem_limiar=5):
+    """Requisições, bytes e defasagem do servidor com a política sobre o traço
+
+    idade: segundos desde o último envio no instante de cada nova leitura
+    (quanto o dado no servidor está velho). erro: diferença entre a leitura
+    real e a última enviada; `erro_max_perto_limiar` só conta leituras a até
+    `margem_limiar` pontos de 30%/70%, onde o erro muda decisões.
+    """
+    politica.reiniciar()
+    requisicoes = 0
+    bytes_corpo = 0
+    idades = []
+    erros = []
+    erro_max_perto = 0
+    for device_id, (tempos, leituras, bombas) in traco.series.items():
+        ultimo_envio = ultimo_valor = None
+        for agora, umidade, bomba in zip(tempos, leituras, bombas):
+            if ultimo_envio is not None:
+                idades.append(agora - ultimo_envio)
+            if politica.deve_transmitir(device_id, agora, umidade, bomba):
+                requisicoes += 1
+                bytes_corpo += len(corpo_leitura({"umidade_solo": umidade, "timestamp": int(agora * 1000),
+                                                  "device_id": device_id}))
+                ultimo_envio, ultimo_valor = agora, umidade
+            erro = abs(umidade - ultimo_valor)
+            erros.append(erro)
+            if erro > erro_max_perto and min(abs(umidade - LIMIAR_ATIVACAO),
+                                             abs(umidade - LIMIAR_DESATIVACAO)) <= margem_limiar:
+                erro_max_perto = erro
+    idades.sort()
+    erros.sort()
+    return {
+        "politica": politica.nome,
+        "leituras": traco.leituras,
+        "requisicoes": requisicoes,
+        "bytes": bytes_corpo + requisicoes * BYTES_CABECALHO,
+        "idade_media_segundos": sum(idades) / len(idades) if idades else 0.0,
+        "idade_p99_segundos": percentil(idades, 99),
+        "idade_max_segundos": idades[-1] if idades else 0.0,
+        "erro_medio_pontos": sum(erros) / len(erros) if erros else 0.0,
+        "erro_p99_pontos": percentil(erros, 99),
+        "erro_max_pontos": erros[-1] if erros else 0,
+        "erro_max_perto_limiar_pontos": erro_max_perto,
+    }
+
+def comparar_politicas(traco, politicas=None):
+    """Avalia cada política; reduções relativas à primeira (a linha de base)"""
+    politicas = politicas if politicas is not None else politicas_padrao()
+    resultados = [avaliar_politica(politica, traco) for politica in politicas]
+    base = resultados[0]
+    for resultado in resultados:
+        resultado["reducao_requisicoes"] = 1 - resultado["requisicoes"] / base["requisicoes"] if base["requisicoes"] else 0.0
+        resultado["reducao_bytes"] = 1 - resultado["bytes"] / base["bytes"] if base["bytes"] else 0.0
+    return {"traco": traco.origem, "leituras": traco.leituras, "politicas": resultados}
+
+def imprimir_comparacao(comparacao):
+    print(f"📈 Traço {comparacao['traco']} ({comparacao['leituras']:,} leituras)")
+    print(f"{'política':<58} {'req':>8} {'-req':>6} {'-bytes':>7} {'idade máx':>10} {'erro máx':>9} {'perto lim.':>10}")
+    for r in comparacao["politicas"]:
+        print(f"{r['politica']:<58} {r['requisicoes']:>8,} {r['reducao_requisicoes'] * 100:>5.1f}% "
+              f"{r['reducao_bytes'] * 100:>6.1f}% {r['idade_max_segundos']:>9.0f}s {r['erro_max_pontos']:>8} pts "
+              f"{r['erro_max_perto_limiar_pontos']:>6} pts")
+
+def main():
+    print("📡 POLÍTICAS DE TRANSMISSÃO - ECONOMIA x DEFASAGEM")
+    print("=" * 60)
+    caminho = input("Log de tráfego ou CSV para reproduzir (vazio = traço gerado): ").strip()
+    if caminho.endswith(".csv"):
+        from carga_historica import FonteCSV
+        traco = traco_de_leituras(FonteCSV(caminho).linhas(), f"CSV: {caminho}")
+    elif caminho:
+        traco = traco_de_trafego(caminho)
+    else:
+        try:
+            num_dispositivos = int(input("Número de devices (padrão: 50): ") or "50")
+            horas = float(input("Horas de traço (padrão: 24): ") or "24")
+            dt = float(input("Intervalo entre leituras em segundos (30 = main.ino, 5 = simulador): ") or "30")
+        except ValueError:
+            num_dispositivos, horas, dt = 50, 24.0, 30.0
+        traco = traco_gerado(num_dispositivos, horas, dt, seed=42)
+
+    print()
+    imprimir_comparacao(comparar_politicas(traco))
+    print(f"\nBytes = corpo JSON + ~{BYTES_CABECALHO} B de cabeçalhos por requisição. Idade = tempo desde o")
+    print("último envio quando chega uma nova leitura; erro = |leitura real - última enviada|.")
+
+if __name__ == "__main__":
+    main()
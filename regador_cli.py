@@ -0,0 +1,485 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Linha de comando não interativa do simulador e dos testes
+Subcomandos simular, teste-rapido, sondar, tempestade, carga e historico, configurados por flags ou
+por um arquivo de cenário TOML/YAML. O resultado sai em JSON (stdout ou
+--saida) e o código de saída indica sucesso (0), falha (1) ou erro de uso (2).
+
+    python regador_cli.py simular --modo acelerado --dispositivos 10,100 --intervalo 5,30 --duracao 3600
+    python regador_cli.py --cenario cenario.toml simular
+"""
+
+import argparse
+import asyncio
+import contextlib
+import itertools
+import json
+import sys
+
+from carga_api import EndpointCarga, TesteCarga
+from controle_bomba import LIMIAR_ATIVACAO, LIMIAR_DESATIVACAO, ControleHisterese
+from metricas import RegistroMetricas
+from simulador_esp32 import API_URL_PADRAO, gerar_leitura
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    tomllib = None
+
+# Valores padrão de cada subcomando; também são as chaves aceitas no cenário
+PADROES = {
+    "simular": {
+        "api_url": API_URL_PADRAO, "modo": "frota", "dispositivos": 10, "intervalo": 5.0,
+        "duracao": 60.0, "jitter": 0.5, "limiar_ativacao": LIMIAR_ATIVACAO,
+        "limiar_desativacao": LIMIAR_DESATIVACAO, "lote": 0, "modelo_fisico": False,
+        "controle_local": True, "seed": None, "max_falhas": 0.0, "verbosidade": 0,
+        "processos": 0, "janela_boot": 30.0, "quedas_por_hora": 0.5,
+        "agendamento_preditivo": False,
+    },
+    "teste_rapido": {
+        "api_url": "http://localhost:3000/api", "device_id": "ESP32_002", "verbosidade": 0,
+    },
+    "sondar": {
+        "api_url": API_URL_PADRAO, "device_id": "ESP32_001", "timeout": 10.0, "repeticoes": 3,
+    },
+    "tempestade": {
+        "api_url": API_URL_PADRAO, "tipo": "reinicio", "dispositivos": 100, "intervalo": 5.0,
+        "jitter": 0.5, "duracao": 90.0, "inicio": 20.0, "duracao_queda": 10.0, "fracao": 0.3,
+        "dispersao_retorno": 1.0, "ondas": 4, "seed": None, "tolerancia": 2.0,
+        "max_recuperacao": None,
+    },
+    "carga": {
+        "api_url": API_URL_PADRAO, "device_id": "ESP32_001", "modo": "aberto", "taxa": 10.0,
+        "workers": 4, "duracao": 30.0, "intervalo_esperado": None, "timeout": 10.0, "max_falhas": 0.0,
+    },
+    "historico": {
+        "api_url": API_URL_PADRAO, "csv": None, "dispositivos": 100, "dias": 30.0, "intervalo": 300.0,
+        "seed": 0, "lote": 1000, "concorrencia": 4, "binario": False, "checkpoint": None,
+        "max_linhas": None,
+    },
+}
+
+MODOS_SIMULACAO = ("frota", "vetorizada", "multiprocesso", "acelerado", "firmware", "unico")
+TIPOS_TEMPESTADE = ("reinicio", "ondas", "particao", "backlog")
+
+def carregar_cenario(caminho):
+    """Lê um cenário TOML ou YAML (PyYAML opcional) em um dicionário"""
+    if caminho.endswith((".yaml", ".yml")):
+        try:
+            import yaml
+        except ImportError:
+            raise ValueError("Cenários YAML precisam do PyYAML (pip install pyyaml)")
+        with open(caminho, encoding="utf-8") as arquivo:
+            dados = yaml.safe_load(arquivo) or {}
+    else:
+        if tomllib is None:
+            raise ValueError("Cenários TOML precisam do Python 3.11+ (ou use YAML)")
+        with open(caminho, "rb") as arquivo:
+            dados = tomllib.load(arquivo)
+    if not isinstance(dados, dict):
+        raise ValueError(f"{caminho}: o cenário deve ser um mapeamento de chaves")
+    return dados
+
+def _normalizar(dados):
+    return {chave.replace("-", "_"): valor for chave, valor in dados.items()}
+
+def montar_config(comando, cenario, flags):
+    """Padrões < chaves globais do cenário < seção do subcomando < flags"""
+    padroes = PADROES[comando]
+    cenario = _normalizar(cenario)
+    secao = _normalizar(cenario.get(comando) or cenario.get(comando.replace("_", "-")) or {})
+    desconhecidas = set(secao) - set(padroes)
+    if desconhecidas:
+        raise ValueError(f"Chaves desconhecidas em [{comando}]: {', '.join(sorted(desconhecidas))}")
+    config = dict(padroes)
+    globais = {chave: valor for chave, valor in cenario.items() if chave in padroes}
+    config.update(globais)
+    config.update(secao)
+    config.update(flags)
+    if comando == "simular" and config["modo"] == "unico" and not any(
+            "dispositivos" in fonte for fonte in (globais, secao, flags)):
+        config["dispositivos"] = 1
+    validar_config(comando, config)
+    return config
+
+def validar_config(comando, config):
+    """Erros de configuração detectáveis antes de executar (viram erro de uso, código 2)"""
+    if comando == "simular":
+        modo = config["modo"]
+        dispositivos = _lista(config["dispositivos"], int)
+        _lista(config["intervalo"], float)
+        if modo not in MODOS_SIMULACAO:
+            raise ValueError(f"Modo desconhecido: {modo} (use {', '.join(MODOS_SIMULACAO)})")
+        if config["agendamento_preditivo"]:
+            if config["controle_local"]:
+                raise ValueError("O agendamento preditivo vale só para o controle por polling (use --polling)")
+            if modo not in ("frota", "acelerado", "unico"):
+                raise ValueError(f"O modo '{modo}' não aceita agendamento preditivo")
+        if modo == "vetorizada" and (not config["controle_local"] or config["modelo_fisico"]):
+            raise ValueError("O modo 'vetorizada' só tem controle local e leituras base ± variação "
+                             "(sem --polling nem --modelo-fisico)")
+        if modo == "unico" and dispositivos != [1]:
+            raise ValueError("O modo 'unico' simula exatamente 1 device")
+    elif comando == "tempestade" and config["tipo"] not in TIPOS_TEMPESTADE:
+        raise ValueError(f"Tipo de tempestade desconhecido: {config['tipo']} (use {', '.join(TIPOS_TEMPESTADE)})")
+    elif comando == "carga":
+        if config["modo"] not in ("aberto", "fechado"):
+            raise ValueError(f"Modo desconhecido: {config['modo']} (use aberto ou fechado)")
+        if config["modo"] == "aberto" and config["taxa"] <= 0:
+            raise ValueError(f"--taxa deve ser maior que 0 (recebido {config['taxa']})")
+    elif comando == "sondar" and config["repeticoes"] < 1:
+        raise ValueError(f"--repeticoes deve ser pelo menos 1 (recebido {config['repeticoes']})")
+
+def _lista(valor, tipo):
+    """Aceita um valor, uma lista ou "10,100,1000" (para varreduras)"""
+    if isinstance(valor, (list, tuple)):
+        return [tipo(v) for v in valor]
+    if isinstance(valor, str):
+        return [tipo(v) for v in valor.split(",") if v.strip()]
+    return [tipo(valor)]
+
+def _taxa_falhas(metricas):
+    """(total, falhas) das requisições medidas; falha = erro de conexão ou status >= 400"""
+    total = falhas = 0
+    for (nome, rotulos), valor in metricas.contadores.items():
+        if nome != "requisicoes_total":
+            continue
+        status = dict(rotulos)["status"]
+        total += valor
+        if status == "erro" or int(status) >= 400:
+            falhas += valor
+    return total, falhas
+
+def _requisicoes_por_endpoint(metricas):
+    resultado = {}
+    for (nome, rotulos), valor in metricas.contadores.items():
+        if nome == "requisicoes_total":
+            rotulos = dict(rotulos)
+            resultado.setdefault(rotulos["endpoint"], {})[rotulos["status"]] = valor
+    for (nome, rotulos), histograma in metricas.histogramas.items():
+        if nome == "latencia_requisicao_segundos":
+            resultado.setdefault(dict(rotulos)["endpoint"], {})["latencia"] = histograma.resumo()
+    return resultado
+
+def _executar_simulacao(config, dispositivos, intervalo):
+    """Uma execução do cenário; retorna o resumo com as métricas de requisição"""
+    metricas = RegistroMetricas()
+    controle = ControleHisterese(config["limiar_ativacao"], config["limiar_desativacao"])
+    modelo = None
+    if config["modelo_fisico"]:
+        from gerador_umidade import GeradorUmidade
+        modelo = GeradorUmidade(dt=intervalo, limiar_ativacao=config["limiar_ativacao"],
+                                limiar_desativacao=config["limiar_desativacao"], seed=config["seed"])
+    agendador = None
+    if config["agendamento_preditivo"]:
+        from agendador_preditivo import AgendadorPreditivo
+        agendador = AgendadorPreditivo(controle)
+
+    if config["modo"] == "frota":
+        from frota_esp32 import FrotaESP32
+        from lote_sensores import AgrupadorLeituras
+        agrupador = None
+        if config["lote"]:
+            agrupador = AgrupadorLeituras(max_leituras=config["lote"], max_idade=intervalo * 2)
+        frota = FrotaESP32(config["api_url"], num_dispositivos=dispositivos, intervalo=intervalo,
+                           jitter=min(config["jitter"], intervalo / 2), seed=config["seed"],
+                           agrupador=agrupador, controle_local=config["controle_local"],
+                           modelo_umidade=modelo, metricas=metricas, agendador_controle=agendador)
+        frota.controle = controle
+        resumo = asyncio.run(frota.executar(config["duracao"]))
+        resumo.pop("endpoints")
+    elif config["modo"] == "vetorizada":
+        from estado_frota import FrotaVetorizada
+        frota = FrotaVetorizada(config["api_url"], num_dispositivos=dispositivos, intervalo=intervalo,
+                                jitter=min(config["jitter"], intervalo / 2), seed=config["seed"],
+                                max_leituras_lote=config["lote"] or 500, controle=controle, metricas=metricas)
+        resumo = asyncio.run(frota.executar(config["duracao"]))
+        resumo.pop("endpoints")
+    elif config["modo"] == "acelerado":
+        from eventos_discretos import SimulacaoAcelerada
+        simulacao = SimulacaoAcelerada(config["api_url"], num_dispositivos=dispositivos, intervalo=intervalo,
+                                       jitter=min(config["jitter"], intervalo / 2),
+                                       controle_local=config["controle_local"], modelo_umidade=modelo,
+                                       max_leituras_lote=config["lote"] or None, seed=config["seed"],
+                                       verbose=config["verbosidade"] >= 2, metricas=metricas,
+                                       agendador_controle=agendador)
+        for simulador in simulacao.simuladores:
+            simulador.controle = controle
+            simulador.verbosidade = config["verbosidade"]
+        resumo = simulacao.executar(config["duracao"])
+    elif config["modo"] == "multiprocesso":
+        from frota_multiprocesso import FrotaMultiprocesso
+        frota = FrotaMultiprocesso(config["api_url"], num_dispositivos=dispositivos,
+                                   processos=config["processos"] or None, intervalo=intervalo,
+                                   jitter=min(config["jitter"], intervalo / 2), seed=config["seed"],
+                                   controle_local=config["controle_local"],
+                                   modelo_fisico=config["modelo_fisico"],
+                                   max_leituras_lote=config["lote"] or None,
+                                   limiares=(config["limiar_ativacao"], config["limiar_desativacao"]))
+        resumo = frota.executar(config["duracao"])
+        # As métricas ficam nos processos filhos; o resumo já traz o agregado
+        total, falhas = resumo["total_requisicoes"], resumo["falhas"]
+        resumo.update({"intervalo": intervalo, "taxa_falhas": falhas / total if total else 0.0})
+        return resumo
+    elif config["modo"] == "firmware":
+        from emulador_firmware import INTERVALO_MEDICAO_MS, EmuladorFirmware
+        # Intervalo fixo do main.ino (30 s) e sempre o modelo físico do ADC
+        emulador = EmuladorFirmware(config["api_url"], num_dispositivos=dispositivos,
+                                    janela_boot=config["janela_boot"],
+                                    quedas_por_hora=config["quedas_por_hora"],
+                                    seed=config["seed"], metricas=metricas,
+                                    verbose=config["verbosidade"] >= 2)
+        resumo = emulador.executar(config["duracao"])
+        intervalo = INTERVALO_MEDICAO_MS / 1000
+    elif config["modo"] == "unico":
+        from simulador_esp32 import ESP32Simulator
+        simulador = ESP32Simulator(config["api_url"], controle_local=config["controle_local"],
+                                   fonte_umidade=modelo.fluxo() if modelo else None,
+                                   metricas=metricas, verbosidade=config["verbosidade"],
+                                   agendador_controle=agendador)
+        simulador.intervalo = intervalo
+        simulador.controle = controle
+        simulador.simular_ciclo_completo(config["duracao"] / 60)
+        resumo = {"dispositivos": 1, "ciclos": sum(
+            v for (nome, _), v in metricas.contadores.items() if nome == "ciclos_total")}
+        if agendador is not None:
+            resumo["agendamento"] = agendador.estatisticas()
+    else:
+        raise ValueError(f"Modo desconhecido: {config['modo']} (use {', '.join(MODOS_SIMULACAO)})")
+
+    total, falhas = _taxa_falhas(metricas)
+    resumo.update({
+        "intervalo": intervalo,
+        "falhas": falhas,
+        "taxa_falhas": falhas / total if total else 0.0,
+        "requisicoes_por_endpoint": _requisicoes_por_endpoint(metricas),
+    })
+    return resumo
+
+def comando_simular(config):
+    # Listas em dispositivos/intervalo viram uma varredura (produto cartesiano)
+    execucoes = [
+        _executar_simulacao(config, dispositivos, intervalo)
+        for dispositivos, intervalo in itertools.product(
+            _lista(config["dispositivos"], int), _lista(config["intervalo"], float))
+    ]
+    # Um processo da frota multiprocesso que falhou tira a sua fatia do resultado
+    ok = all(e["taxa_falhas"] <= config["max_falhas"] and not e.get("processos_com_erro") for e in execucoes)
+    resultado = execucoes[0] if len(execucoes) == 1 else {"execucoes": execucoes}
+    return ok, resultado
+
+def comando_teste_rapido(config):
+    import teste_rapido
+    metricas = RegistroMetricas()
+    teste_rapido.testar_api(config["api_url"], config["device_id"], config["verbosidade"], metricas)
+    total, falhas = _taxa_falhas(metricas)
+    return total > 0 and falhas == 0, {
+        "requisicoes": total,
+        "falhas": falhas,
+        "requisicoes_por_endpoint": _requisicoes_por_endpoint(metricas),
+    }
+
+def comando_sondar(config):
+    from teste_api import sondar_api, sondas_padrao
+    relatorio = sondar_api(config["api_url"], sondas_padrao(config["device_id"]),
+                           timeout=config["timeout"], repeticoes=config["repeticoes"])
+    return relatorio["validos"] == len(relatorio["endpoints"]), relatorio
+
+def comando_tempestade(config):
+    from cenarios_tempestade import (descarga_backlog, executar_cenario, implantacao_escalonada,
+                                     particao_parcial, reinicio_sincronizado)
+    inicio, duracao = config["inicio"], config["duracao_queda"]
+    dispersao = config["dispersao_retorno"]
+    cenarios = {
+        "reinicio": lambda: reinicio_sincronizado(inicio, duracao, dispersao),
+        "ondas": lambda: implantacao_escalonada(inicio, config["ondas"], duracao * 2, duracao, dispersao),
+        "particao": lambda: particao_parcial(inicio, duracao, config["fracao"], dispersao),
+        "backlog": lambda: descarga_backlog(inicio, duracao, config["fracao"], dispersao),
+    }
+    relatorio = executar_cenario(config["api_url"], cenarios[config["tipo"]](),
+                                 num_dispositivos=int(config["dispositivos"]), intervalo=config["intervalo"],
+                                 jitter=min(config["jitter"], config["intervalo"] / 2),
+                                 duracao=config["duracao"], seed=config["seed"], tolerancia=config["tolerancia"])
+    recuperacao = relatorio.get("recuperacao_segundos")
+    ok = recuperacao is not None and (config["max_recuperacao"] is None or recuperacao <= config["max_recuperacao"])
+    return ok, relatorio
+
+def comando_carga(config):
+    api_url = config["api_url"].rstrip("/")
+    endpoint = EndpointCarga("POST /sensors", "POST", f"{api_url}/sensors",
+                             lambda: gerar_leitura(config["device_id"]))
+    teste = TesteCarga([endpoint], headers={'Content-Type': 'application/json',
+                                            'User-Agent': 'ESP32-Tester/1.0'}, timeout=config["timeout"])
+    if config["modo"] == "aberto":
+        resumo = teste.executar_aberto(config["taxa"], config["duracao"])
+    elif config["modo"] == "fechado":
+        resumo = teste.executar_fechado(config["workers"], config["duracao"], config["intervalo_esperado"])
+    else:
+        raise ValueError(f"Modo desconhecido: {config['modo']} (use aberto ou fechado)")
+    falhas = sum(e["falhas"] for e in resumo["endpoints"].values())
+    resumo["taxa_falhas"] = falhas / resumo["total_requisicoes"] if resumo["total_requisicoes"] else 1.0
+    return resumo["taxa_falhas"] <= config["max_falhas"], resumo
+
+def comando_historico(config):
+    import time
+
+    from carga_historica import CargaHistorica, FonteCSV, FonteGerada, fonte_de_descricao, ler_checkpoint
+
+    # Com checkpoint existente a fonte é a gravada nele (o período gerado não muda ao retomar)
+    estado = ler_checkpoint(config["checkpoint"]) if config["checkpoint"] else None
+    if estado is not None:
+        fonte = fonte_de_descricao(estado["fonte"])
+    elif config["csv"]:
+        fonte = FonteCSV(config["csv"])
+    else:
+        fim_ms = int(time.time() * 1000)
+        fonte = FonteGerada(int(config["dispositivos"]), fim_ms - int(config["dias"] * 86400 * 1000), fim_ms,
+                            config["intervalo"], seed=config["seed"])
+    carga = CargaHistorica(config["api_url"], fonte, tamanho_lote=int(config["lote"]),
+                           concorrencia=int(config["concorrencia"]), formato_binario=config["binario"],
+                           checkpoint=config["checkpoint"])
+    resumo = carga.executar(config["max_linhas"])
+    ok = resumo["erro"] is None and not resumo["interrompida"] and not resumo["linhas_rejeitadas"]
+    return ok, resumo
+
+COMANDOS = {
+    "simular": comando_simular,
+    "teste_rapido": comando_teste_rapido,
+    "tempestade": comando_tempestade,
+    "sondar": comando_sondar,
+    "carga": comando_carga,
+    "historico": comando_historico,
+}
+
+def criar_parser():
+    # SUPPRESS: só as flags informadas entram no namespace e sobrepõem o cenário
+    comum = argparse.ArgumentParser(add_help=False, argument_default=argparse.SUPPRESS)
+    comum.add_argument("--api-url", dest="api_url", help="URL base da API (ex.: http://localhost:3000/api)")
+
+    parser = argparse.ArgumentParser(description="Simulador e testes da API do regador (não interativo)")
+    parser.add_argument("--cenario", help="Arquivo de cenário TOML ou YAML")
+    parser.add_argument("--saida", help="Grava o resultado JSON neste arquivo em vez do stdout")
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+
+    simular = subparsers.add_parser("simular", aliases=["simulate"], parents=[comum],
+                                    argument_default=argparse.SUPPRESS, help="Simula devices")
+    simular.add_argument("--modo", choices=MODOS_SIMULACAO)
+    simular.add_argument("--processos", type=int, help="Processos no modo multiprocesso (padrão: núcleos)")
+    simular.add_argument("--dispositivos", help="Número de devices (ou lista: 10,100,1000; modo unico: 1)")
+    simular.add_argument("--intervalo", help="Segundos entre ciclos (ou lista: 1,5,30)")
+    simular.add_argument("--duracao", type=float,
+                         help="Segundos de simulação (virtuais nos modos acelerado e firmware)")
+    simular.add_argument("--janela-boot", dest="janela_boot", type=float,
+                         help="Modo firmware: devices ligam ao acaso nesta janela (0 = todos juntos)")
+    simular.add_argument("--quedas-por-hora", dest="quedas_por_hora", type=float,
+                         help="Modo firmware: quedas de WiFi por device por hora")
+    simular.add_argument("--jitter", type=float)
+    simular.add_argument("--limiar-ativacao", dest="limiar_ativacao", type=float)
+    simular.add_argument("--limiar-desativacao", dest="limiar_desativacao", type=float)
+    simular.add_argument("--lote", type=int, help="Leituras por lote (0 = uma por POST)")
+    simular.add_argument("--modelo-fisico", dest="modelo_fisico", action="store_true")
+    simular.add_argument("--polling", dest="controle_local", action="store_false",
+                         help="Controle antigo por polling da API")
+    simular.add_argument("--preditivo", dest="agendamento_preditivo", action="store_true",
+                         help="Com --polling, consulta a API só perto do cruzamento do limiar")
+    simular.add_argument("--seed", type=int)
+    simular.add_argument("--max-falhas", dest="max_falhas", type=float,
+                         help="Fração de requisições com falha tolerada (padrão: 0)")
+    simular.add_argument("--verbosidade", type=int, choices=(0, 1, 2))
+
+    rapido = subparsers.add_parser("teste-rapido", aliases=["quick-test"], parents=[comum],
+                                   argument_default=argparse.SUPPRESS, help="Roteiro do teste_rapido.py")
+    rapido.add_argument("--device-id", dest="device_id")
+    rapido.add_argument("--verbosidade", type=int, choices=(0, 1, 2))
+
+    sondar = subparsers.add_parser("sondar", aliases=["probe"], parents=[comum],
+                                   argument_default=argparse.SUPPRESS,
+                                   help="Verifica os endpoints em paralelo e valida os contratos")
+    sondar.add_argument("--device-id", dest="device_id")
+    sondar.add_argument("--timeout", type=float)
+    sondar.add_argument("--repeticoes", type=int)
+
+    tempestade = subparsers.add_parser("tempestade", aliases=["storm"], parents=[comum],
+                                       argument_default=argparse.SUPPRESS,
+                                       help="Tempestade de reconexão: latência e recuperação do backend")
+    tempestade.add_argument("--tipo", choices=TIPOS_TEMPESTADE)
+    tempestade.add_argument("--dispositivos", type=int)
+    tempestade.add_argument("--intervalo", type=float)
+    tempestade.add_argument("--jitter", type=float)
+    tempestade.add_argument("--duracao", type=float, help="Segundos de execução (tempo real)")
+    tempestade.add_argument("--inicio", type=float, help="Segundo em que a interrupção começa")
+    tempestade.add_argument("--duracao-queda", dest="duracao_queda", type=float)
+    tempestade.add_argument("--fracao", type=float, help="Fração da frota afetada (particao/backlog)")
+    tempestade.add_argument("--dispersao-retorno", dest="dispersao_retorno", type=float,
+                            help="Segundos em que os retornos se espalham (conectarWiFi)")
+    tempestade.add_argument("--ondas", type=int)
+    tempestade.add_argument("--seed", type=int)
+    tempestade.add_argument("--tolerancia", type=float, help="p99 aceito como recuperado, em x o p99 da base")
+    tempestade.add_argument("--max-recuperacao", dest="max_recuperacao", type=float,
+                            help="Falha se a recuperação levar mais que estes segundos")
+
+    carga = subparsers.add_parser("carga", aliases=["load-test"], parents=[comum],
+                                  argument_default=argparse.SUPPRESS, help="Teste de carga em POST /sensors")
+    carga.add_argument("--device-id", dest="device_id")
+    carga.add_argument("--modo", choices=("aberto", "fechado"))
+    carga.add_argument("--taxa", type=float, help="Requisições por segundo (malha aberta)")
+    carga.add_argument("--workers", type=int, help="Workers concorrentes (malha fechada)")
+    carga.add_argument("--duracao", type=float)
+    carga.add_argument("--intervalo-esperado", dest="intervalo_esperado", type=float)
+    carga.add_argument("--timeout", type=float)
+    carga.add_argument("--max-falhas", dest="max_falhas", type=float)
+
+    historico = subparsers.add_parser("historico", aliases=["backfill"], parents=[comum],
+                                      argument_default=argparse.SUPPRESS,
+                                      help="Carga histórica em lote em POST /sensors, com checkpoint")
+    historico.add_argument("--csv", help="CSV com device_id,umidade_solo,timestamp (padrão: modelo físico)")
+    historico.add_argument("--dispositivos", type=int, help="Devices gerados (sem --csv)")
+    historico.add_argument("--dias", type=float, help="Dias de histórico gerado, até agora")
+    historico.add_argument("--intervalo", type=float, help="Segundos entre leituras geradas")
+    historico.add_argument("--seed", type=int)
+    historico.add_argument("--lote", type=int, help="Leituras por POST")
+    historico.add_argument("--concorrencia", type=int, help="Lotes enviados ao mesmo tempo")
+    historico.add_argument("--binario", action="store_true", help="Lotes no formato binário compacto")
+    historico.add_argument("--checkpoint", help="Arquivo de checkpoint; se existir, a carga é retomada")
+    historico.add_argument("--max-linhas", dest="max_linhas", type=int, help="Para após estas linhas")
+    return parser
+
+ALIASES = {"simulate": "simular", "teste-rapido": "teste_rapido", "quick-test": "teste_rapido",
+           "probe": "sondar", "load-test": "carga", "storm": "tempestade",
+           "backfill": "historico"}
+
+def main(argv=None):
+    parser = criar_parser()
+    args = vars(parser.parse_args(argv))
+    nome = args.pop("comando")
+    comando = ALIASES.get(nome, nome)
+    caminho_cenario = args.pop("cenario", None)
+    caminho_saida = args.pop("saida", None)
+
+    try:
+        cenario = carregar_cenario(caminho_cenario) if caminho_cenario else {}
+        config = montar_config(comando, cenario, args)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+
+    # A saída legível dos scripts vai para o stderr; o stdout fica só com o JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        try:
+            ok, resultado = COMANDOS[comando](config)
+        except (OSError, ValueError) as e:
+            # Falha durante a execução (API fora, resposta inválida...): resultado com ok=False
+            print(f"❌ {comando} falhou: {type(e).__name__}: {e}")
+            ok, resultado = False, {"erro": f"{type(e).__name__}: {e}"}
+
+    resultado = {"comando": comando, "ok": ok, "config": config, "resultado": resultado}
+    texto = json.dumps(resultado, indent=2, ensure_ascii=False, default=str)
+    if caminho_saida:
+        with open(caminho_saida, "w", encoding="utf-8") as arquivo:
+            arquivo.write(texto + "\n")
+    else:
+        print(texto)
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
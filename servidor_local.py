@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Servidor local substituto da API do regador
+Implementa os endpoints usados pelos scripts de simulação e teste
+(/sensors, /devices, /pump/{id}/status|control|stats, /health) sobre um
+armazenamento em memória com buffer circular por device
+"""
+
+import argparse
+import hashlib
+import heapq
+import json
+import threading
+import time
+from array import array
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from formato_binario import CONTENT_TYPE_BINARIO, CONTENT_TYPE_JSON, decodificar_leituras
+
+# Timestamps ficam em array('q'): fora do int64 a leitura é recusada com 400
+TIMESTAMP_MIN, TIMESTAMP_MAX = -2 ** 63, 2 ** 63 - 1
+
+class SerieCircular:
+    """Buffer circular de leituras de um device com agregados incrementais"""
+
+    __slots__ = ("capacidade", "umidades", "timestamps", "recebidos",
+                 "inicio", "tamanho", "total", "soma", "minimo", "maximo")
+
+    def __init__(self, capacidade):
+        self.capacidade = capacidade
+        self.umidades = array('b', bytes(capacidade))
+        self.timestamps = array('q', bytes(8 * capacidade))
+        self.recebidos = array('d', bytes(8 * capacidade))
+        self.inicio = 0
+        self.tamanho = 0
+
+        # Agregados de todas as leituras já recebidas, não só as da janela
+        self.total = 0
+        self.soma = 0
+        self.minimo = None
+        self.maximo = None
+
+    def adicionar(self, umidade, timestamp, recebido):
+        """Insere uma leitura, sobrescrevendo a mais antiga se o buffer estiver cheio"""
+        posicao = (self.inicio + self.tamanho) % self.capacidade
+        if self.tamanho == self.capacidade:
+            self.inicio = (self.inicio + 1) % self.capacidade
+        else:
+            self.tamanho += 1
+        self.umidades[posicao] = umidade
+        self.timestamps[posicao] = timestamp
+        self.recebidos[posicao] = recebido
+
+        self.total += 1
+        self.soma += umidade
+        self.minimo = umidade if self.minimo is None else min(self.minimo, umidade)
+        self.maximo = umidade if self.maximo is None else max(self.maximo, umidade)
+
+    def ultimas(self, limite):
+        """Índices físicos das `limite` leituras mais recentes, da mais nova para a mais antiga"""
+        n = min(limite, self.tamanho)
+        fim = self.inicio + self.tamanho - 1
+        return [(fim - i) % self.capacidade for i in range(n)]
+
+    def leitura(self, device_id, posicao):
+        return {
+            "device_id": device_id,
+            "umidade_solo": self.umidades[posicao],
+            "timestamp": self.timestamps[posicao],
+            "created_at": self.recebidos[posicao],
+        }
+
+class EstadoBomba:
+    """Estado e estatísticas acumuladas da bomba de um device"""
+
+    __slots__ = ("is_active", "inicio", "total_activations", "total_duration",
+                 "last_reason", "last_triggered_by")
+
+    def __init__(self):
+        self.is_active = False
+        self.inicio = None
+        self.total_activations = 0
+        self.total_duration = 0.0
+        self.last_reason = None
+        self.last_triggered_by = None
+
+class ArmazemSeries:
+    """Armazenamento em memória de leituras e estado das bombas, por device"""
+
+    def __init__(self, capacidade=1024, relogio=time.time):
+        self.capacidade = capacidade
+        self.relogio = relogio
+        self.series = {}
+        self.bombas = {}
+        self._lock = threading.Lock()
+
+    def adicionar_leitura(self, device_id, umidade, timestamp):
+        with self._lock:
+            serie = self.series.get(device_id)
+            if serie is None:
+                serie = self.series[device_id] = SerieCircular(self.capacidade)
+            serie.adicionar(umidade, timestamp, self.relogio())
+            return serie.leitura(device_id, serie.ultimas(1)[0])
+
+    def listar_leituras(self, device_id=None, limite=50, ordem="desc"):
+        """Leituras mais recentes de um device (ou de todos), em O(limite) por device"""
+        with self._lock:
+            if device_id is not None:
+                serie = self.series.get(device_id)
+                leituras = [serie.leitura(device_id, p) for p in serie.ultimas(limite)] if serie else []
+            else:
+                leituras = heapq.nlargest(limite, (
+                    serie.leitura(did, p)
+                    for did, serie in self.series.items()
+                    for p in serie.ultimas(limite)
+                ), key=lambda l: l["created_at"])
+        if ordem == "asc":
+            leituras.reverse()
+        return leituras
+
+    def listar_dispositivos(self):
+        with self._lock:
+            dispositivos = []
+            for device_id, serie in self.series.items():
+                ultima = serie.ultimas(1)[0]
+                dispositivos.append({
+                    "device_id": device_id,
+                    "total_leituras": serie.total,
+                    "ultima_umidade": serie.umidades[ultima],
+                    "umidade_media": serie.soma / serie.total,
+                    "umidade_minima": serie.minimo,
+                    "umidade_maxima": serie.maximo,
+                    "last_seen": serie.recebidos[ultima],
+                    "pump_active": device_id in self.bombas and self.bombas[device_id].is_active,
+                })
+            return dispositivos
+
+    def _bomba(self, device_id):
+        bomba = self.bombas.get(device_id)
+        if bomba is None:
+            bomba = self.bombas[device_id] = EstadoBomba()
+        return bomba
+
+    def controlar_bomba(self, device_id, action, reason=None, triggered_by=None):
+        """Ativa/desativa a bomba; retorna o status resultante"""
+        with self._lock:
+            bomba = self._bomba(device_id)
+            agora = self.relogio()
+            if action == "activate" and not bomba.is_active:
+                bomba.is_active = True
+                bomba.inicio = agora
+                bomba.total_activations += 1
+            elif action == "deactivate" and bomba.is_active:
+                bomba.is_active = False
+                bomba.total_duration += agora - bomba.inicio
+                bomba.inicio = None
+            bomba.last_reason = reason
+            bomba.last_triggered_by = triggered_by
+            return self._status(device_id, bomba, agora)
+
+    def status_bomba(self, device_id):
+        with self._lock:
+            return self._status(device_id, self._bomba(device_id), self.relogio())
+
+    def _status(self, device_id, bomba, agora):
+        return {
+            "device_id": device_id,
+            "is_active": bomba.is_active,
+            "duration_seconds": int(agora - bomba.inicio) if bomba.is_active else 0,
+            "total_activations": bomba.total_activations,
+            "last_reason": bomba.last_reason,
+            "last_triggered_by": bomba.last_triggered_by,
+        }
+
+    def estatisticas_bomba(self, device_id):
+        with self._lock:
+            bomba = self._bomba(device_id)
+            total = bomba.total_duration
+            if bomba.is_active:
+                total += self.relogio() - bomba.inicio
+            media = total / bomba.total_activations if bomba.total_activations else 0
+            return {
+                "device_id": device_id,
+                "stats": {
+                    "total_activations": bomba.total_activations,
+                    "total_duration_seconds": round(total, 1),
+                    "avg_duration_seconds": round(media, 1),
+                },
+            }
+
+def _validar_leitura(dados):
+    """Valida uma leitura recebida; retorna (device_id, umidade, timestamp) ou None"""
+    if not isinstance(dados, dict):
+        return None
+    device_id = dados.get("device_id")
+    umidade = dados.get("umidade_solo")
+    if not isinstance(device_id, str) or not device_id:
+        return None
+    if isinstance(umidade, bool) or not isinstance(umidade, (int, float)) or not 0 <= umidade <= 100:
+        return None
+    timestamp = dados.get("timestamp")
+    if isinstance(timestamp, bool) or not isinstance(timestamp, int):
+        timestamp = int(time.time() * 1000)
+    elif not TIMESTAMP_MIN <= timestamp <= TIMESTAMP_MAX:
+        return None
+    return device_id, int(umidade), timestamp
+
+class ManipuladorAPI(BaseHTTPRequestHandler):
+    """Roteia as requisições HTTP para o ArmazemSeries do servidor"""
+
+    protocol_version = "HTTP/1.1"
+    server_version = "RegadorLocal/1.0"
+    # Cabeçalho e corpo são escritos separadamente; sem TCP_NODELAY o Nagle
+    # somado ao ACK atrasado do cliente adiciona ~40 ms por resposta keep-alive
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _responder(self, status, corpo):
+        dados = json.dumps(corpo, separators=(',', ':')).encode('utf-8')
+        etag = None
+        if self.command == "GET" and status == 200:
+            # ETag fraco do corpo: o cliente revalida com If-None-Match e recebe 304 sem corpo
+            etag = 'W/"%s"' % hashlib.blake2b(dados, digest_size=8).hexdigest()
+            if etag in (self.headers.get("If-None-Match") or ""):
+                status, dados = 304, b""
+        self.send_response(status)
+        if etag:
+            self.send_header("ETag", etag)
+        self.send_header("Content-Type", "application/json")
+        # Anuncia os formatos aceitos em POST /sensors (negociação do formato binário)
+        self.send_header("Accept-Post", f"{CONTENT_TYPE_JSON}, {CONTENT_TYPE_BINARIO}")
+        self.send_header("Content-Length", str(len(dados)))
+        if self.close_connection:
+            # Cliente pediu Connection: close; sem o eco ele devolve o socket ao pool
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def _erro(self, status, mensagem):
+        self._responder(status, {"success": False, "error": mensagem})
+
+    def _ler_corpo(self):
+        tamanho = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(tamanho) if tamanho else b""
+
+    def _ler_json(self, corpo):
+        try:
+            return json.loads(corpo) if corpo else None
+        except ValueError:
+            return None
+
+    def _rota(self):
+        """Separa o caminho em partes, removendo o prefixo /api"""
+        url = urlsplit(self.path)
+        partes = [p for p in url.path.split("/") if p]
+        if partes and partes[0] == "api":
+            partes = partes[1:]
+        return partes, parse_qs(url.query)
+
+    def do_GET(self):
+        partes, query = self._rota()
+        armazem = self.server.armazem
+
+        if partes in ([], ["health"]):
+            self._responder(200, {"status": "ok", "timestamp": int(time.time() * 1000)})
+        elif partes == ["sensors"]:
+            try:
+                limite = int(query.get("limit", ["50"])[0])
+            except ValueError:
+                return self._erro(400, "limit inválido")
+            device_id = query.get("device_id", [None])[0]
+            ordem = query.get("order", ["desc"])[0]
+            leituras = armazem.listar_leituras(device_id, max(0, limite), ordem)
+            self._responder(200, {"success": True, "data": leituras})
+        elif partes == ["devices"]:
+            self._responder(200, {"success": True, "data": armazem.listar_dispositivos()})
+        elif len(partes) == 3 and partes[0] == "pump" and partes[2] == "status":
+            self._responder(200, {"success": True, "data": armazem.status_bomba(partes[1])})
+        elif len(partes) == 3 and partes[0] == "pump" and partes[2] == "stats":
+            self._responder(200, {"success": True, "data": armazem.estatisticas_bomba(partes[1])})
+        else:
+            self._erro(404, "Endpoint não encontrado")
+
+    def do_POST(self):
+        partes, _ = self._rota()
+        armazem = self.server.armazem
+        corpo = self._ler_corpo()
+        tipo = (self.headers.get("Content-Type") or CONTENT_TYPE_JSON).split(";")[0].strip()
+        if tipo == CONTENT_TYPE_BINARIO:
+            if partes != ["sensors"]:
+                return self._erro(415, "Formato binário só é aceito em POST /sensors")
+            try:
+                dados = decodificar_leituras(corpo)
+            except ValueError as e:
+                return self._erro(400, f"Quadro binário inválido: {e}")
+        else:
+            dados = self._ler_json(corpo)
+
+        if partes == ["sensors"]:
+            # Aceita uma leitura (objeto) ou um lote (array de leituras)
+            lote = dados if isinstance(dados, list) else [dados]
+            validas = [_validar_leitura(item) for item in lote]
+            if not validas or any(v is None for v in validas):
+                return self._erro(400, "Leitura inválida: device_id e umidade_solo (0-100) são obrigatórios "
+                                       "e timestamp, se inteiro, deve caber em 64 bits")
+            inseridas = [armazem.adicionar_leitura(*v) for v in validas]
+            if isinstance(dados, list):
+                self._responder(201, {"success": True, "inserted": len(inseridas)})
+            else:
+                self._responder(201, {"success": True, "data": inseridas[0]})
+        elif len(partes) == 3 and partes[0] == "pump" and partes[2] == "control":
+            if not isinstance(dados, dict) or dados.get("action") not in ("activate", "deactivate"):
+                return self._erro(400, "action deve ser 'activate' ou 'deactivate'")
+            status = armazem.controlar_bomba(
+                partes[1], dados["action"], dados.get("reason"), dados.get("triggered_by")
+            )
+            self._responder(200, {"success": True, "data": status})
+        else:
+            self._erro(404, "Endpoint não encontrado")
+
+def criar_servidor(host="127.0.0.1", porta=3000, capacidade=1024, verbose=False):
+    """Cria o servidor HTTP local (sem iniciar)"""
+    servidor = ThreadingHTTPServer((host, porta), ManipuladorAPI)
+    servidor.daemon_threads = True
+    servidor.armazem = ArmazemSeries(capacidade)
+    servidor.verbose = verbose
+    return servidor
+
+def iniciar_em_thread(host="127.0.0.1", porta=0, capacidade=1024):
+    """Inicia o servidor em uma thread daemon e retorna (servidor, api_url)"""
+    servidor = criar_servidor(host, porta, capacidade)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    host, porta = servidor.server_address[:2]
+    return servidor, f"http://{host}:{porta}/api"
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor local substituto da API do regador")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=3000)
+    parser.add_argument("--capacidade", type=int, default=1024,
+                        help="Leituras mantidas por device (buffer circular)")
+    parser.add_argument("--verbose", action="store_true", help="Mostra cada requisição recebida")
+    args = parser.parse_args()
+
+    servidor = criar_servidor(args.host, args.porta, args.capacidade, args.verbose)
+    print("🖥️  SERVIDOR LOCAL - API REGADOR")
+    print("=" * 60)
+    print(f"🌐 API: http://{args.host}:{args.porta}/api")
+    print(f"💾 Capacidade: {args.capacidade} leituras por device")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        print("\n⏹️  Servidor finalizado")
+    finally:
+        servidor.server_close()
+
+if __name__ == "__main__":
+    main()
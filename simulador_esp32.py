@@ -12,15 +12,61 @@ import random
 from datetime import datetime
 import threading
 
+from cache_status import CacheStatus
+from controle_bomba import ATIVAR, ControleHisterese
+from formato_binario import CONTENT_TYPE_BINARIO, codificar_leituras, negociar_binario
+from lote_sensores import serializar_lote
+from payloads import corpo_controle, corpo_leitura
+from teste_api import SondaEndpoint, sondar_api
+from transporte_http import resumo_conexoes, transporte_padrao
+from transporte_resiliente import SessaoResiliente
+
+API_URL_PADRAO = "https://api-regador.vercel.app/api"
+
+def gerar_leitura(device_id, base_humidity=60, humidity_variation=20, rng=random,
+                  fonte_umidade=None, pump_active=False, agora=None):
+    """Gera uma leitura simulada de umidade para um device
+    
+    Com `fonte_umidade` (gerador_umidade.FluxoUmidade) a umidade segue o modelo
+    físico de secagem/irrigação em vez de ruído uniforme em torno da base.
+    """
+    if fonte_umidade is not None:
+        umidade_solo = fonte_umidade.proximo(pump_active)
+    else:
+        variacao = rng.uniform(-humidity_variation, humidity_variation)
+        umidade_solo = max(0, min(100, int(base_humidity + variacao)))
+    
+    return {
+        "umidade_solo": umidade_solo,
+        "timestamp": int((time.time() if agora is None else agora) * 1000),
+        "device_id": device_id
+    }
+
 class ESP32Simulator:
-    def __init__(self, api_base_url="https://api-regador.vercel.app/api"):
+    def __init__(self, api_base_url=API_URL_PADRAO, agrupador=None, controle_local=True,
+                 fonte_umidade=None, session=None, relogio=time.time, rng=random,
+                 metricas=None, verbosidade=2, formato_binario=False, cache=None, estatisticas_bomba=None,
+                 politica_transmissao=None, transporte=None, agendador_controle=None):
         self.api_base_url = api_base_url
-        self.session = requests.Session()
+        # Sessão com timeouts, retry com backoff, disjuntores e fila offline;
+        # pode ser compartilhada entre vários simuladores. Sem sessão própria,
+        # usa o pool de conexões do transporte (transporte_http.py)
+        if session is None:
+            transporte = transporte or transporte_padrao()
+            session = transporte.instalar(SessaoResiliente())
+        self.session = session
+        self.transporte = transporte
         self.session.headers.update({
             'Content-Type': 'application/json',
             'User-Agent': 'ESP32-Simulator/1.0'
         })
         
+        # Relógio (segundos) e gerador aleatório: trocados por um relógio virtual
+        # e uma semente fixa no modo de eventos discretos
+        self.relogio = relogio
+        self.rng = rng
+        self.intervalo = 5
+        
         # Configurações do simulador
         self.device_id = "ESP32_002"  # Usar um device existente
         self.is_running = False
@@ -31,37 +77,140 @@ class ESP32Simulator:
         self.base_humidity = 60
         self.humidity_variation = 20
         
+        # Modelo físico de umidade (GeradorUmidade.fluxo()); None usa ruído uniforme
+        self.fonte_umidade = fonte_umidade
+        
+        # Envio em lote (AgrupadorLeituras); None envia uma leitura por POST
+        self.agrupador = agrupador
+        
+        # Controle local: decide sobre a própria leitura e só chama a API
+        # quando o estado da bomba muda. False mantém o polling antigo.
+        self.controle_local = controle_local
+        self.controle = ControleHisterese()
+        
+        # Leituras no formato binário compacto (formato_binario.py) em vez de JSON;
+        # só usado se a API anunciar o formato (Accept-Post) e desligado se ela responder 415
+        self.formato_binario = formato_binario
+        self._binario_negociado = False
+        
+        # Saída no console: 0 = silencioso, 1 = erros e resumo final, 2 = cada ciclo.
+        # Métricas (metricas.RegistroMetricas) medem a sessão e os ciclos sem print()
+        self.verbosidade = verbosidade
+        self.metricas = metricas
+        if metricas is not None:
+            metricas.instrumentar_sessao(self.session)
+        
+        # Cache de status/estatísticas (cache_status.CacheStatus); instalado depois
+        # das métricas para que elas só contem o que vai à rede
+        self.cache = cache
+        if cache is not None:
+            cache.instalar(self.session)
+        
+        # Estatísticas locais da bomba (estatisticas_bomba.EstatisticasBomba),
+        # podem ser compartilhadas pela frota
+        self.estatisticas_bomba = estatisticas_bomba
+        
+        # Política de transmissão (politica_transmissao.py): leituras dentro da banda
+        # morta não vão para a API, mas o controle local continua avaliando todas
+        self.politica_transmissao = politica_transmissao
+        
+        # Agendador preditivo (agendador_preditivo.py) do controle por polling;
+        # sem ele a leitura é buscada na API a cada 3 ciclos
+        self.agendador_controle = agendador_controle
+        
+    def _log(self, nivel, mensagem):
+        """Escreve no console só se a verbosidade permitir"""
+        if self.verbosidade >= nivel:
+            print(mensagem)
+    
     def gerar_dados_sensores(self):
         """Gera dados simulados de umidade"""
-        # Simular variação gradual
-        humidity_variation = random.uniform(-self.humidity_variation, self.humidity_variation)
-        
-        umidade_solo = max(0, min(100, int(self.base_humidity + humidity_variation)))
+        return gerar_leitura(self.device_id, self.base_humidity, self.humidity_variation, self.rng,
+                             self.fonte_umidade, self.pump_active, self.relogio())
+    
+    def _post_sensores(self, leituras, serializar_json):
+        """POST /sensors no formato negociado; retorna (response, bytes enviados)
         
-        return {
-            "umidade_solo": umidade_solo,
-            "timestamp": int(time.time() * 1000),
-            "device_id": self.device_id
-        }
+        O binário só é usado depois que a API o anuncia em Accept-Post; se ela
+        responder 415, volta para JSON e reenvia. Um 400 (leitura inválida) não
+        muda o formato.
+        """
+        url = f"{self.api_base_url}/sensors"
+        if self.formato_binario and not self._binario_negociado:
+            aceita = negociar_binario(self.session, self.api_base_url)
+            if aceita is not None:
+                self._binario_negociado = True
+                if not aceita:
+                    self.formato_binario = False
+                    self._log(1, "⚠️  A API não anuncia o formato binário (Accept-Post); usando JSON")
+        if self.formato_binario and self._binario_negociado:
+            try:
+                corpo = codificar_leituras(leituras)
+            except ValueError:
+                corpo = None  # leitura fora dos limites do quadro: vai em JSON
+            if corpo is not None:
+                response = self.session.post(url, data=corpo, headers={'Content-Type': CONTENT_TYPE_BINARIO})
+                if response.status_code != 415:
+                    return response, len(corpo)
+                self.formato_binario = False
+                self._log(1, "⚠️  A API recusou o formato binário (415); voltando para JSON")
+        corpo = serializar_json()
+        return self.session.post(url, data=corpo), len(corpo)
     
     def enviar_dados_sensores(self, dados):
         """Envia dados dos sensores para a API"""
         try:
-            response = self.session.post(f"{self.api_base_url}/sensors", json=dados)
+            # Corpo pré-serializado (payloads.py): evita o json da stdlib a cada ciclo
+            response, _ = self._post_sensores([dados], lambda: corpo_leitura(dados))
             return response
         except requests.exceptions.ConnectionError as e:
-            print(f"❌ Erro de conexão ao enviar dados dos sensores: {e}")
-            print(f"   Verifique se a API está online: {self.api_base_url}")
+            self._log(1, f"❌ Erro de conexão ao enviar dados dos sensores: {e}")
+            self._log(1, f"   Verifique se a API está online: {self.api_base_url}")
             return None
         except requests.exceptions.Timeout as e:
-            print(f"❌ Timeout ao enviar dados dos sensores: {e}")
+            self._log(1, f"❌ Timeout ao enviar dados dos sensores: {e}")
             return None
         except requests.exceptions.RequestException as e:
-            print(f"❌ Erro ao enviar dados dos sensores: {e}")
+            self._log(1, f"❌ Erro ao enviar dados dos sensores: {e}")
             return None
     
-    def controlar_bomba_automatico(self):
-        """Controle automático da bomba baseado na umidade do solo"""
+    def enviar_lote(self, lote):
+        """Envia um lote de leituras no payload em massa de /sensors"""
+        inicio = time.perf_counter()
+        tamanho = 0
+        try:
+            response, tamanho = self._post_sensores(lote, lambda: serializar_lote(lote))
+            sucesso = response.status_code in (200, 201)
+        except requests.exceptions.RequestException as e:
+            self._log(1, f"❌ Erro ao enviar lote de {len(lote)} leituras: {e}")
+            response = None
+            sucesso = False
+        self.agrupador.registrar_envio(lote, time.perf_counter() - inicio, sucesso, tamanho)
+        return response
+    
+    def enfileirar_leitura(self, dados):
+        """Adiciona a leitura ao lote e envia os lotes que ficaram prontos"""
+        for lote in self.agrupador.adicionar(dados) + self.agrupador.vencidos():
+            response = self.enviar_lote(lote)
+            if response is not None and response.status_code in (200, 201):
+                self._log(2, f"📦 Lote enviado: {len(lote)} leituras")
+            else:
+                self._log(1, f"❌ Falha ao enviar lote de {len(lote)} leituras")
+    
+    def controlar_bomba_automatico(self, umidade=None):
+        """Controle automático da bomba baseado na umidade do solo
+        
+        Com `umidade` informada a decisão é local, sem consultar a API;
+        caso contrário busca a leitura mais recente em /sensors.
+        """
+        if umidade is not None:
+            acao = self.controle.decidir(umidade, self.pump_active)
+            if acao == ATIVAR:
+                self.ativar_bomba(self.controle.motivo(acao), "automatic")
+            elif acao:
+                self.desativar_bomba(self.controle.motivo(acao), "automatic")
+            return acao
+        
         try:
             # Buscar dados mais recentes
             response = self.session.get(f"{self.api_base_url}/sensors", params={
@@ -76,39 +225,35 @@ class ESP32Simulator:
                     umidade = data['data'][0]['umidade_solo']
                     
                     # Lógica de controle automático
-                    if umidade < 30 and not self.pump_active:
-                        # Ativar bomba se umidade baixa
-                        self.ativar_bomba("Umidade do solo baixa (< 30%)", "automatic")
-                    elif umidade > 70 and self.pump_active:
-                        # Desativar bomba se umidade alta
-                        self.desativar_bomba("Umidade do solo adequada (> 70%)", "automatic")
+                    return self.controlar_bomba_automatico(umidade)
                         
         except Exception as e:
-            print(f"❌ Erro no controle automático: {e}")
+            self._log(1, f"❌ Erro no controle automático: {e}")
     
     def ativar_bomba(self, reason="Controle manual", triggered_by="manual"):
         """Ativa a bomba via API"""
         try:
             response = self.session.post(
                 f"{self.api_base_url}/pump/{self.device_id}/control",
-                json={
-                    "action": "activate",
-                    "reason": reason,
-                    "triggered_by": triggered_by
-                }
+                data=corpo_controle("activate", reason, triggered_by)
             )
             
             if response.status_code == 200:
                 self.pump_active = True
-                self.pump_start_time = time.time()
-                print(f"✅ Bomba ativada: {reason}")
+                self.pump_start_time = self.relogio()
+                if self.estatisticas_bomba is not None:
+                    self.estatisticas_bomba.ativou(self.device_id, self.pump_start_time)
+                if self.metricas:
+                    self.metricas.incrementar("acionamentos_bomba_total", acao="activate",
+                                              origem=triggered_by, device_id=self.device_id)
+                self._log(2, f"✅ Bomba ativada: {reason}")
                 return True
             else:
-                print(f"❌ Erro ao ativar bomba: {response.status_code}")
+                self._log(1, f"❌ Erro ao ativar bomba: {response.status_code}")
                 return False
                 
         except Exception as e:
-            print(f"❌ Erro ao ativar bomba: {e}")
+            self._log(1, f"❌ Erro ao ativar bomba: {e}")
             return False
     
     def desativar_bomba(self, reason="Controle manual", triggered_by="manual"):
@@ -116,24 +261,27 @@ class ESP32Simulator:
         try:
             response = self.session.post(
                 f"{self.api_base_url}/pump/{self.device_id}/control",
-                json={
-                    "action": "deactivate",
-                    "reason": reason,
-                    "triggered_by": triggered_by
-                }
+                data=corpo_controle("deactivate", reason, triggered_by)
             )
             
             if response.status_code == 200:
                 self.pump_active = False
-                duration = time.time() - self.pump_start_time if self.pump_start_time else 0
-                print(f"✅ Bomba desativada: {reason} (duração: {duration:.1f}s)")
+                agora = self.relogio()
+                duration = agora - self.pump_start_time if self.pump_start_time else 0
+                if self.estatisticas_bomba is not None:
+                    self.estatisticas_bomba.desativou(self.device_id, agora)
+                if self.metricas:
+                    self.metricas.incrementar("acionamentos_bomba_total", acao="deactivate",
+                                              origem=triggered_by, device_id=self.device_id)
+                    self.metricas.observar("duracao_bomba_segundos", duration, device_id=self.device_id)
+                self._log(2, f"✅ Bomba desativada: {reason} (duração: {duration:.1f}s)")
                 return True
             else:
-                print(f"❌ Erro ao desativar bomba: {response.status_code}")
+                self._log(1, f"❌ Erro ao desativar bomba: {response.status_code}")
                 return False
                 
         except Exception as e:
-            print(f"❌ Erro ao desativar bomba: {e}")
+            self._log(1, f"❌ Erro ao desativar bomba: {e}")
             return False
     
     def verificar_status_bomba(self):
@@ -146,15 +294,15 @@ class ESP32Simulator:
                 return data
             return None
         except Exception as e:
-            print(f"❌ Erro ao verificar status da bomba: {e}")
+            self._log(1, f"❌ Erro ao verificar status da bomba: {e}")
             return None
     
     def simular_ciclo_completo(self, duracao_minutos=10):
         """Simula um ciclo completo de monitoramento"""
-        print(f"🚀 Iniciando simulação ESP32 - Device: {self.device_id}")
-        print(f"⏱️  Duração: {duracao_minutos} minutos")
-        print(f"🌐 API: {self.api_base_url}")
-        print("-" * 60)
+        self._log(1, f"🚀 Iniciando simulação ESP32 - Device: {self.device_id}")
+        self._log(1, f"⏱️  Duração: {duracao_minutos} minutos")
+        self._log(1, f"🌐 API: {self.api_base_url}")
+        self._log(1, "-" * 60)
         
         self.is_running = True
         start_time = time.time()
@@ -162,48 +310,131 @@ class ESP32Simulator:
         
         while self.is_running and (time.time() - start_time) < (duracao_minutos * 60):
             ciclo += 1
-            timestamp = datetime.now().strftime("%H:%M:%S")
+            self.executar_ciclo(ciclo)
             
+            # Aguardar próximo ciclo
+            if self.is_running:
+                self._log(2, f"⏳ Aguardando {self.intervalo} segundos...")
+                time.sleep(self.intervalo)
+        
+        self.finalizar_simulacao()
+    
+    def executar_ciclo(self, ciclo):
+        """Executa um ciclo de monitoramento: leitura, envio, controle e eventos"""
+        if self.metricas is None:
+            self._executar_ciclo(ciclo)
+        else:
+            with self.metricas.span("ciclo", device_id=self.device_id, ciclo=ciclo):
+                self._executar_ciclo(ciclo)
+            self.metricas.incrementar("ciclos_total", device_id=self.device_id)
+            self.metricas.definir("bomba_ativa", int(self.pump_active), device_id=self.device_id)
+        # Leituras da fila offline são reenviadas fora das requisições do ciclo
+        if isinstance(self.session, SessaoResiliente):
+            self.session.drenar_fila()
+    
+    def _executar_ciclo(self, ciclo):
+        if self.verbosidade >= 2:
+            timestamp = datetime.fromtimestamp(self.relogio()).strftime("%H:%M:%S")
             print(f"\n🔄 Ciclo {ciclo} - {timestamp}")
-            
-            # 1. Enviar dados dos sensores
-            dados = self.gerar_dados_sensores()
-            print(f"📊 Sensores: {dados['umidade_solo']}% umidade")
-            
+        
+        # 1. Enviar dados dos sensores
+        dados = self.gerar_dados_sensores()
+        self._log(2, f"📊 Sensores: {dados['umidade_solo']}% umidade")
+        if self.metricas:
+            self.metricas.definir("umidade_solo_percentual", dados['umidade_solo'], device_id=self.device_id)
+        
+        if self.politica_transmissao is not None and not self.politica_transmissao.deve_transmitir(
+                self.device_id, self.relogio(), dados['umidade_solo'], self.pump_active):
+            self._log(2, "⏸️  Leitura dentro da banda morta; não enviada")
+            if self.metricas:
+                self.metricas.incrementar("leituras_suprimidas_total", device_id=self.device_id)
+        elif self.agrupador:
+            self.enfileirar_leitura(dados)
+        else:
             response = self.enviar_dados_sensores(dados)
             if response and response.status_code == 201:
-                print("✅ Dados enviados com sucesso")
+                self._log(2, "✅ Dados enviados com sucesso")
             else:
-                print("❌ Falha ao enviar dados")
+                self._log(1, "❌ Falha ao enviar dados")
+        
+        if self.controle_local:
+            # 2. Controle automático sobre a leitura recém-gerada
+            self.controlar_bomba_automatico(dados['umidade_solo'])
             
-            # 2. Controle automático da bomba (a cada 3 ciclos)
-            if ciclo % 3 == 0:
-                print("🤖 Verificando controle automático da bomba...")
+            # 3. Mostrar status local (sem consultar a API)
+            pump_status = "🟢 ATIVA" if self.pump_active else "🔴 INATIVA"
+            self._log(2, f"🚰 Bomba: {pump_status}")
+            if self.pump_active and self.pump_start_time:
+                self._log(2, f"   ⏱️  Duração atual: {int(self.relogio() - self.pump_start_time)}s")
+        else:
+            # 2. Controle automático da bomba: a cada 3 ciclos ou, com o agendador
+            # preditivo, quando a leitura se aproxima do limiar
+            agendador = self.agendador_controle
+            if agendador is not None:
+                agora = self.relogio()
+                agendador.observar(self.device_id, agora, dados['umidade_solo'], self.pump_active)
+                avaliar = agendador.devido(self.device_id, agora)
+            else:
+                avaliar = ciclo % 3 == 0
+            if avaliar:
+                self._log(2, "🤖 Verificando controle automático da bomba...")
                 self.controlar_bomba_automatico()
+                if agendador is not None:
+                    agendador.avaliado(self.device_id, self.relogio())
             
             # 3. Mostrar status atual
             status = self.verificar_status_bomba()
             if status:
                 pump_status = "🟢 ATIVA" if status['is_active'] else "🔴 INATIVA"
-                print(f"🚰 Bomba: {pump_status}")
+                self._log(2, f"🚰 Bomba: {pump_status}")
                 if status['is_active']:
-                    print(f"   ⏱️  Duração atual: {status['duration_seconds']}s")
-            
-            # 4. Simular eventos aleatórios
-            if random.random() < 0.1:  # 10% de chance
-                if not self.pump_active:
-                    self.ativar_bomba("Simulação - evento aleatório", "automatic")
-                else:
-                    self.desativar_bomba("Simulação - evento aleatório", "automatic")
-            
-            # Aguardar próximo ciclo
-            if self.is_running:
-                print("⏳ Aguardando 5 segundos...")
-                time.sleep(5)
+                    self._log(2, f"   ⏱️  Duração atual: {status['duration_seconds']}s")
+        
+        # 4. Simular eventos aleatórios
+        if self.rng.random() < 0.1:  # 10% de chance
+            if not self.pump_active:
+                self.ativar_bomba("Simulação - evento aleatório", "automatic")
+            else:
+                self.desativar_bomba("Simulação - evento aleatório", "automatic")
+    
+    def finalizar_simulacao(self):
+        """Envia o que ficou pendente, desliga a bomba e mostra as estatísticas"""
+        self._log(1, "\n" + "=" * 60)
+        self._log(1, "🏁 SIMULAÇÃO FINALIZADA")
+        self._log(1, "=" * 60)
+        
+        # Enviar leituras que ficaram no buffer
+        if self.agrupador:
+            for lote in self.agrupador.esvaziar():
+                self.enviar_lote(lote)
+            resumo = self.agrupador.resumo()
+            self._log(1, f"📦 Envio em lote:")
+            self._log(1, f"   Leituras: {resumo['leituras']} em {resumo['lotes']} lotes")
+            self._log(1, f"   Requisições economizadas: {resumo['requisicoes_economizadas']}")
+            self._log(1, f"   Tamanho médio do lote: {resumo['tamanho_lote']['medio']:.1f}")
+            self._log(1, f"   Latência de envio p50/p99: {resumo['latencia_envio_ms']['p50']:.1f}"
+                         f"/{resumo['latencia_envio_ms']['p99']:.1f} ms")
+        
+        # Falhas absorvidas pela sessão resiliente
+        if isinstance(self.session, SessaoResiliente):
+            resiliencia = self.session.estatisticas()
+            if resiliencia['falhas'] or resiliencia['recusadas']:
+                self._log(1, f"🛡️  Resiliência:")
+                self._log(1, f"   Falhas: {resiliencia['falhas']} | Repetições: {resiliencia['repeticoes']} | "
+                             f"Incertas (sem repetir): {resiliencia['incertas']}")
+                self._log(1, f"   Recusadas (circuito aberto): {resiliencia['recusadas']}")
+                self._log(1, f"   Fila offline: {resiliencia['drenadas']} drenadas, "
+                             f"{resiliencia['fila_offline']} pendentes, {resiliencia['descartadas']} descartadas")
         
-        print("\n" + "=" * 60)
-        print("🏁 SIMULAÇÃO FINALIZADA")
-        print("=" * 60)
+        if self.transporte is not None:
+            self._log(1, resumo_conexoes(self.transporte.estatisticas()))
+        
+        if self.cache is not None:
+            cache = self.cache.estatisticas()
+            self._log(1, f"🗃️  Cache de status:")
+            self._log(1, f"   Hits: {cache['hits']} | revalidados (304): {cache['revalidados']} | "
+                         f"misses: {cache['misses']} (taxa de acerto {cache['taxa_acerto'] * 100:.0f}%)")
+            self._log(1, f"   Bytes economizados: {cache['bytes_economizados']}")
         
         # Estatísticas finais
         if self.pump_active:
@@ -214,17 +445,33 @@ class ESP32Simulator:
             stats_response = self.session.get(f"{self.api_base_url}/pump/{self.device_id}/stats")
             if stats_response.status_code == 200:
                 stats = stats_response.json()['data']['stats']
-                print(f"📈 Estatísticas da bomba:")
-                print(f"   Total de ativações: {stats['total_activations']}")
-                print(f"   Duração total: {stats['total_duration_seconds']}s")
-                print(f"   Duração média: {stats['avg_duration_seconds']}s")
+                self._log(1, f"📈 Estatísticas da bomba:")
+                self._log(1, f"   Total de ativações: {stats['total_activations']}")
+                self._log(1, f"   Duração total: {stats['total_duration_seconds']}s")
+                self._log(1, f"   Duração média: {stats['avg_duration_seconds']}s")
+                if self.estatisticas_bomba is not None:
+                    self._conferir_estatisticas(stats)
         except Exception as e:
-            print(f"❌ Erro ao buscar estatísticas: {e}")
+            self._log(1, f"❌ Erro ao buscar estatísticas: {e}")
+    
+    def _conferir_estatisticas(self, stats):
+        """Compara as estatísticas locais com as do servidor"""
+        local = self.estatisticas_bomba.resumo_dispositivo(self.device_id, self.relogio())
+        self._log(1, f"   Local: desvio {local['desvio_padrao_segundos']:.1f}s | "
+                     f"ciclo de trabalho {local['ciclo_trabalho'] * 100:.1f}% | "
+                     f"água 1h {local['agua_litros_1h']:.1f} L")
+        divergencias = self.estatisticas_bomba.conferir_servidor(self.device_id, stats, agora=self.relogio())
+        if divergencias:
+            self._log(1, "⚠️  Divergências entre servidor e estatísticas locais:")
+            for divergencia in divergencias:
+                self._log(1, f"   {divergencia}")
+        else:
+            self._log(1, "   ✅ Estatísticas locais conferem com o servidor")
     
     def parar_simulacao(self):
         """Para a simulação"""
         self.is_running = False
-        print("\n⏹️  Parando simulação...")
+        self._log(1, "\n⏹️  Parando simulação...")
 
 def main():
     print("🤖 SIMULADOR ESP32 - SISTEMA DE MONITORAMENTO")
@@ -245,7 +492,7 @@ def main():
         duracao = 10
     
     # Criar simulador
-    simulator = ESP32Simulator(api_url)
+    simulator = ESP32Simulator(api_url, cache=CacheStatus())
     simulator.device_id = device_id
     
     print(f"\n🎯 Configuração:")
@@ -256,25 +503,26 @@ def main():
     # Verificar se API está disponível
     print("🔍 Verificando conectividade com a API...")
     
-    # Tentar diferentes endpoints para verificar conectividade
-    endpoints_to_test = [
-        f"{api_url}/sensors",  # Endpoint principal
-        f"{api_url}/health",  # Endpoint de saúde (se existir)
-        f"{api_url.rsplit('/api', 1)[0]}/"  # Endpoint raiz (remove apenas a última ocorrência de /api)r
+    # Testar em paralelo diferentes endpoints para verificar conectividade
+    sondas = [
+        SondaEndpoint("Sensores", "GET", "/sensors", status_ok=(200, 201, 404)),  # Endpoint principal
+        SondaEndpoint("Saúde", "GET", "/health", status_ok=(200, 201, 404)),  # Endpoint de saúde (se existir)
+        # Endpoint raiz (remove apenas a última ocorrência de /api)
+        SondaEndpoint("Raiz", "GET", f"{api_url.rsplit('/api', 1)[0]}/", status_ok=(200, 201, 404)),
     ]
+    # As sondas usam o pool do simulador: as conexões abertas aqui já servem ao 1º ciclo
+    relatorio = sondar_api(api_url, sondas, timeout=10, repeticoes=1, transporte=simulator.transporte)
     
     api_available = False
-    for endpoint in endpoints_to_test:
-        try:
-            print(f"   Testando: {endpoint}")
-            response = requests.get(endpoint, timeout=10)
-            if response.status_code in [200, 201, 404]:  # 404 também indica que a API está respondendo
-                print(f"✅ API está respondendo (status: {response.status_code})")
-                api_available = True
-                break
-        except requests.exceptions.RequestException as e:
-            print(f"   ❌ Falha: {e}")
-            continue
+    for resultado in relatorio["endpoints"].values():
+        print(f"   Testando: {resultado['url']}")
+        if resultado["ok"]:  # 404 também indica que a API está respondendo
+            print(f"✅ API está respondendo (status: {resultado['status']}, {resultado['primeira_ms']:.0f} ms)")
+            api_available = True
+        elif resultado["erro"]:
+            print(f"   ❌ Falha: {resultado['erro']}")
+        else:
+            print(f"   ❌ Falha: status {resultado['status']}")
     
     if not api_available:
         print("❌ Não foi possível conectar à API")
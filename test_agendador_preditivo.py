@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Testes da comparação entre cadência fixa e agendamento preditivo (pytest)
+"""
+
+import gerador_umidade
+from agendador_preditivo import comparar_agendamentos
+
+class _FluxoRoteiro:
+    """Fluxo de umidade com leituras pré-definidas (repete a última)"""
+
+    def __init__(self, leituras):
+        self.leituras = list(leituras)
+        self.posicao = 0
+
+    def proximo(self, pump_active=False):
+        umidade = self.leituras[min(self.posicao, len(self.leituras) - 1)]
+        self.posicao += 1
+        return umidade
+
+class _GeradorRoteiro:
+    def __init__(self, leituras):
+        self.leituras = leituras
+
+    def __call__(self, dt=5.0, seed=None):
+        return self
+
+    def fluxo(self, seed=None):
+        return _FluxoRoteiro(self.leituras)
+
+def test_cruzamento_ruidoso_nao_infla_atraso_da_cadencia_fixa(monkeypatch):
+    # Uma leitura isolada abaixo de 30% no ciclo 1, depois 40 ciclos normais e
+    # o cruzamento de verdade a partir do ciclo 42
+    leituras = [29.0] + [45.0] * 40 + [25.0] * 20
+    monkeypatch.setattr(gerador_umidade, "GeradorUmidade", _GeradorRoteiro(leituras))
+
+    resultados = comparar_agendamentos(num_dispositivos=1, horas=len(leituras) * 5 / 3600,
+                                       intervalo=5.0, ciclos_fixos=3)
+
+    atraso = resultados["fixo"]["atraso_resposta"]
+    assert atraso["contagem"] == 1
+    # Cadência de 15 s: no máximo dois ciclos entre o cruzamento e a avaliação
+    assert atraso["max_ms"] <= 10_000
@@ -11,10 +11,14 @@ import time
 import random
 from datetime import datetime
 
+import carga_api
+from carga_api import EndpointCarga, imprimir_resumo
+from transporte_http import transporte_padrao
+
 class APITester:
     def __init__(self, api_url):
         self.api_url = api_url
-        self.session = requests.Session()
+        self.session = transporte_padrao().sessao()
         self.session.headers.update({
             'Content-Type': 'application/json',
             'User-Agent': 'ESP32-Tester/1.0'
@@ -86,6 +90,31 @@ class APITester:
         print(f"Falhas: {falhas}")
         print(f"Taxa de sucesso: {(sucessos/num_requisicoes)*100:.1f}%")
 
+    def testar_carga(self, modo="aberto", taxa=10, workers=4, duracao=30,
+                     intervalo_esperado=None, endpoints=None, exportar=None):
+        """Teste de carga com histogramas de latência (malha aberta ou fechada)
+        
+        `exportar` é um caminho base: gera <base>.json e <base>.csv.
+        """
+        if endpoints is None:
+            endpoints = [EndpointCarga("POST " + self.api_url, "POST", self.api_url, self.gerar_dados_simulados)]
+        teste = carga_api.TesteCarga(endpoints, headers=self.session.headers)
+        
+        print(f"Iniciando teste de carga: {self.api_url}")
+        if modo == "aberto":
+            print(f"Malha aberta: {taxa} req/s por {duracao} segundos")
+            resumo = teste.executar_aberto(taxa, duracao)
+        else:
+            print(f"Malha fechada: {workers} workers por {duracao} segundos")
+            resumo = teste.executar_fechado(workers, duracao, intervalo_esperado)
+        
+        imprimir_resumo(resumo)
+        if exportar:
+            teste.exportar_json(f"{exportar}.json")
+            teste.exportar_csv(f"{exportar}.csv")
+            print(f"\nResultados exportados para {exportar}.json e {exportar}.csv")
+        return resumo
+
 def testar_apis_gratuitas():
     """Testa APIs gratuitas para demonstração"""
     print("=== TESTANDO APIs GRATUITAS ===")
@@ -104,8 +133,8 @@ def main():
     print("🧪 TESTADOR DE API - ESP32 MONITORAMENTO")
     print("=" * 50)
     
-    # Configurações
-    api_url = "https://webhook.site/a150e4c3-67ff-488e-8cad-c18219ff498a"
+    # Configurações (para execução sem prompts: python regador_cli.py carga --api-url ...)
+    api_url = input("URL da API (vazio: testar APIs gratuitas de demonstração): ").strip()
     
     if not api_url:
         testar_apis_gratuitas()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Testes das estatísticas locais das bombas (pytest)
+"""
+
+import socket
+import statistics
+
+import pytest
+
+from estatisticas_bomba import EstatisticaCorrente, EstatisticasBomba, SomaJanela, conferir_frota
+
+def _porta_fechada():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def _estatistica(valores):
+    estatistica = EstatisticaCorrente()
+    for valor in valores:
+        estatistica.adicionar(valor)
+    return estatistica
+
+def test_mesclar_equivale_a_uma_passada():
+    valores = [12.0, 30.5, 7.25, 45.0, 30.0, 18.75, 60.0, 3.5]
+    a = _estatistica(valores[:3])
+    a.mesclar(_estatistica(valores[3:]))
+    a.mesclar(EstatisticaCorrente())
+
+    assert a.n == len(valores)
+    assert a.media == pytest.approx(statistics.mean(valores))
+    assert a.variancia == pytest.approx(statistics.variance(valores))
+    assert (a.minimo, a.maximo) == (min(valores), max(valores))
+
+    vazia = EstatisticaCorrente()
+    vazia.mesclar(_estatistica(valores))
+    assert vazia.variancia == pytest.approx(statistics.variance(valores))
+
+def test_soma_janela_expira_eventos_antigos():
+    janela = SomaJanela(3600)
+    janela.adicionar(0.0, 1.5)
+    janela.adicionar(1800.0, 2.0)
+
+    assert janela.total(3599.0) == pytest.approx(3.5)
+    # O evento do instante 0 sai exatamente quando completa a largura da janela
+    assert janela.total(3600.0) == pytest.approx(2.0)
+    assert janela.total(5400.0) == 0.0
+    assert not janela.eventos
+
+def test_agua_da_janela_conta_acionamento_em_andamento():
+    estatisticas = EstatisticasBomba(vazao_litros_por_minuto=1.5, janelas=(3600,), inicio=0.0)
+    estatisticas.ativou("ESP32_001", 0.0)
+    estatisticas.desativou("ESP32_001", 600.0)
+    estatisticas.ativou("ESP32_001", 7000.0)
+
+    resumo = estatisticas.resumo_dispositivo("ESP32_001", agora=7200.0)
+
+    # O acionamento de 10 min desligou há mais de 1 h; só os 200 s em andamento contam
+    assert resumo["agua_litros_1h"] == pytest.approx(200 * 1.5 / 60)
+    assert resumo["total_activations"] == 2
+
+def test_conferir_frota_api_inacessivel():
+    estatisticas = EstatisticasBomba()
+    estatisticas.ativou("ESP32_001", 1000.0)
+    estatisticas.desativou("ESP32_001", 1030.0)
+
+    divergentes = conferir_frota(f"http://127.0.0.1:{_porta_fechada()}/api", estatisticas)
+
+    assert list(divergentes) == ["ESP32_001"]
+    assert divergentes["ESP32_001"][0].startswith("erro ao buscar estatísticas")
@@ -6,72 +6,178 @@ Script de teste para verificar conectividade com a API
 
 import requests
 import json
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-def testar_api(api_url):
-    """Testa diferentes endpoints da API"""
+from transporte_http import TransporteHTTP
+
+class SondaEndpoint:
+    """Um endpoint a verificar: requisição, status aceitos e validação do corpo"""
+
+    def __init__(self, nome, metodo, caminho, payload=None, validar=None, status_ok=(200, 201)):
+        self.nome = nome
+        self.metodo = metodo
+        self.caminho = caminho
+        self.payload = payload
+        self.validar = validar
+        self.status_ok = status_ok
+
+# Validações de contrato: cada uma retorna a lista de problemas encontrados
+
+def _validar_lista(corpo):
+    if not isinstance(corpo, dict) or not isinstance(corpo.get('data'), list):
+        return ["campo 'data' ausente ou não é uma lista"]
+    return []
+
+def _validar_status_bomba(corpo):
+    dados = corpo.get('data') if isinstance(corpo, dict) else None
+    if not isinstance(dados, dict):
+        return ["campo 'data' ausente ou não é um objeto"]
+    problemas = []
+    if not isinstance(dados.get('is_active'), bool):
+        problemas.append("data.is_active ausente ou não é booleano")
+    if not isinstance(dados.get('duration_seconds'), (int, float)):
+        problemas.append("data.duration_seconds ausente ou não é numérico")
+    return problemas
+
+def _validar_stats_bomba(corpo):
+    dados = corpo.get('data') if isinstance(corpo, dict) else None
+    stats = dados.get('stats') if isinstance(dados, dict) else None
+    if not isinstance(stats, dict):
+        return ["campo 'data.stats' ausente ou não é um objeto"]
+    return [f"data.stats.{campo} ausente ou não é numérico"
+            for campo in ('total_activations', 'total_duration_seconds', 'avg_duration_seconds')
+            if not isinstance(stats.get(campo), (int, float))]
+
+def _validar_criacao(corpo):
+    if not isinstance(corpo, dict) or not ('data' in corpo or 'inserted' in corpo):
+        return ["resposta sem 'data' nem 'inserted'"]
+    return []
+
+def sondas_padrao(device_id="ESP32_001"):
+    """Endpoints usados pelo simulador e pelo app, com seus contratos"""
+    return [
+        SondaEndpoint("Saúde da API", "GET", "/health", status_ok=(200, 404)),
+        SondaEndpoint("Listar sensores", "GET", "/sensors", validar=_validar_lista),
+        SondaEndpoint("Listar devices", "GET", "/devices", validar=_validar_lista),
+        SondaEndpoint("Status da bomba", "GET", f"/pump/{device_id}/status", validar=_validar_status_bomba),
+        SondaEndpoint("Estatísticas da bomba", "GET", f"/pump/{device_id}/stats", validar=_validar_stats_bomba),
+        SondaEndpoint("Enviar dados de sensor (teste)", "POST", "/sensors",
+                      payload={"umidade_solo": 65, "timestamp": 1234567890, "device_id": device_id},
+                      validar=_validar_criacao),
+    ]
+
+def _executar_sonda(api_url, sonda, timeout, repeticoes, transporte=None):
+    """Executa uma sonda numa sessão própria: a 1ª requisição é a fria
+    (conexão nova, possível cold start), as seguintes reaproveitam a conexão
+
+    Sem `transporte` a sonda tem um pool só dela e o tempo de handshake da
+    conexão fria vai para `handshake_ms`; com um transporte compartilhado as
+    conexões abertas ficam no pool para quem vier depois.
+    """
+    # Caminhos absolutos (http...) permitem sondar fora do prefixo da API
+    url = sonda.caminho if sonda.caminho.startswith("http") else f"{api_url}{sonda.caminho}"
+    resultado = {"metodo": sonda.metodo, "url": url, "status": None,
+                 "ok": False, "problemas": [], "latencias_ms": [], "erro": None, "handshake_ms": None}
+    proprio = transporte is None
+    transporte = TransporteHTTP(tamanho_pool=1) if proprio else transporte
+    with transporte.sessao() as session:
+        session.headers.update({'Content-Type': 'application/json', 'User-Agent': 'API-Tester/1.0'})
+        # Só GETs são repetidos; um POST repetido gravaria dados de teste a mais
+        for _ in range(repeticoes if sonda.metodo == "GET" else 1):
+            inicio = time.perf_counter()
+            try:
+                response = session.request(sonda.metodo, resultado["url"], json=sonda.payload, timeout=timeout)
+            except requests.exceptions.RequestException as e:
+                resultado["erro"] = f"{type(e).__name__}: {e}"
+                # Sem resposta não adianta repetir: o tempo total fica em ~1 timeout
+                break
+            resultado["latencias_ms"].append((time.perf_counter() - inicio) * 1000)
+            resultado["status"] = response.status_code
+            resultado["ok"] = response.status_code in sonda.status_ok
+            if not resultado["ok"]:
+                break
+        else:
+            if sonda.validar and resultado["latencias_ms"] and response.status_code < 300:
+                try:
+                    resultado["problemas"] = sonda.validar(response.json())
+                except ValueError:
+                    resultado["problemas"] = ["resposta não é JSON válido"]
+    if proprio:
+        handshake = transporte.estatisticas()["handshake"]
+        resultado["handshake_ms"] = handshake["p50_ms"] if handshake["contagem"] else None
+        transporte.fechar()
+
+    latencias = resultado["latencias_ms"]
+    resultado["primeira_ms"] = latencias[0] if latencias else None
+    resultado["aquecida_ms"] = statistics.median(latencias[1:]) if len(latencias) > 1 else None
+    resultado["cold_start_ms"] = (resultado["primeira_ms"] - resultado["aquecida_ms"]
+                                  if resultado["aquecida_ms"] is not None else None)
+    resultado["valido"] = resultado["ok"] and not resultado["problemas"]
+    return resultado
+
+def sondar_api(api_url, sondas=None, timeout=10, repeticoes=3, transporte=None):
+    """Verifica todos os endpoints em paralelo e valida os contratos
+
+    Cada sonda roda na sua própria thread, então uma API fora do ar é
+    detectada em cerca de um timeout, qualquer que seja o número de endpoints.
+    Com `transporte` (transporte_http.TransporteHTTP) as sondas aquecem o pool
+    de quem vai usar a API em seguida.
+    """
+    if repeticoes < 1:
+        raise ValueError(f"repeticoes deve ser pelo menos 1 (recebido {repeticoes})")
+    api_url = api_url.rstrip("/")
+    sondas = sondas if sondas is not None else sondas_padrao()
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(sondas) or 1) as executor:
+        futuros = [executor.submit(_executar_sonda, api_url, sonda, timeout, repeticoes, transporte)
+                    for sonda in sondas]
+        endpoints = {sonda.nome: futuro.result() for sonda, futuro in zip(sondas, futuros)}
+    return {
+        "api_url": api_url,
+        "duracao_segundos": time.perf_counter() - inicio,
+        "disponivel": any(r["status"] is not None for r in endpoints.values()),
+        "validos": sum(r["valido"] for r in endpoints.values()),
+        "endpoints": endpoints,
+    }
+
+def imprimir_relatorio(relatorio):
+    """Relatório por endpoint: status, contrato e latência fria x aquecida"""
+    for nome, r in relatorio["endpoints"].items():
+        print(f"\n📡 {nome}")
+        print(f"   {r['metodo']} {r['url']}")
+        if r["erro"]:
+            print(f"   ❌ {r['erro']}")
+            continue
+        if r["valido"]:
+            print(f"   ✅ Status {r['status']} - contrato OK")
+        elif r["ok"]:
+            print(f"   ⚠️  Status {r['status']} - contrato inválido:")
+            for problema in r["problemas"]:
+                print(f"      - {problema}")
+        elif r["status"] == 404:
+            print("   ⚠️  Endpoint não encontrado (404)")
+        else:
+            print(f"   ❌ Status inesperado: {r['status']}")
+        linha = f"   ⏱️  1ª requisição: {r['primeira_ms']:.1f} ms"
+        if r["aquecida_ms"] is not None:
+            linha += f" | aquecida: {r['aquecida_ms']:.1f} ms | cold start: {r['cold_start_ms']:.1f} ms"
+        if r["handshake_ms"] is not None:
+            linha += f" | handshake: {r['handshake_ms']:.1f} ms"
+        print(linha)
+
+    print(f"\n📋 {relatorio['validos']}/{len(relatorio['endpoints'])} endpoints válidos "
+          f"em {relatorio['duracao_segundos']:.2f}s")
+
+def testar_api(api_url, device_id="ESP32_001", timeout=10):
+    """Testa os endpoints da API em paralelo"""
     print(f"🔍 Testando API: {api_url}")
     print("=" * 60)
     
-    # Configurar sessão
-    session = requests.Session()
-    session.headers.update({
-        'Content-Type': 'application/json',
-        'User-Agent': 'API-Tester/1.0'
-    })
-    
-    # Lista de endpoints para testar
-    endpoints = [
-        ("GET", f"{api_url}/sensors", "Listar sensores"),
-        ("GET", f"{api_url}/devices", "Listar devices"),
-        ("GET", f"{api_url}/pump/ESP32_001/status", "Status da bomba"),
-        ("POST", f"{api_url}/sensors", "Enviar dados de sensor (teste)"),
-    ]
-    
-    for method, endpoint, description in endpoints:
-        print(f"\n📡 {description}")
-        print(f"   {method} {endpoint}")
-        
-        response = None
-        try:
-            if method == "GET":
-                response = session.get(endpoint, timeout=10)
-            elif method == "POST":
-                # Dados de teste para POST
-                test_data = {
-                    "umidade_solo": 65,
-                    "timestamp": 1234567890,
-                    "device_id": "ESP32_001"
-                }
-                response = session.post(endpoint, json=test_data, timeout=10)
-            
-            if response:
-                print(f"   Status: {response.status_code}")
-                
-                if response.status_code in [200, 201]:
-                    print("   ✅ Sucesso")
-                    try:
-                        data = response.json()
-                        if isinstance(data, dict) and 'data' in data:
-                            print(f"   📊 Dados recebidos: {len(data['data'])} registros")
-                        else:
-                            print(f"   📊 Resposta: {type(data)}")
-                    except:
-                        print("   📊 Resposta não é JSON válido")
-                elif response.status_code == 404:
-                    print("   ⚠️  Endpoint não encontrado (404)")
-                elif response.status_code == 500:
-                    print("   ❌ Erro interno do servidor (500)")
-                else:
-                    print(f"   ⚠️  Status inesperado: {response.status_code}")
-                
-        except requests.exceptions.ConnectionError as e:
-            print(f"   ❌ Erro de conexão: {e}")
-        except requests.exceptions.Timeout as e:
-            print(f"   ❌ Timeout: {e}")
-        except requests.exceptions.RequestException as e:
-            print(f"   ❌ Erro: {e}")
-        except Exception as e:
-            print(f"   ❌ Erro inesperado: {e}")
+    relatorio = sondar_api(api_url, sondas_padrao(device_id), timeout=timeout)
+    imprimir_relatorio(relatorio)
+    return relatorio
 
 def main():
     print("🧪 TESTE DE CONECTIVIDADE - API REGADOR")
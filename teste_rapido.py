@@ -5,38 +5,56 @@ Teste Rápido - Simulador ESP32
 Script simples para testar a API rapidamente
 """
 
-import requests
 import json
 import time
 import random
 from datetime import datetime
 
-def testar_api():
-    """Teste rápido da API"""
-    api_url = "http://localhost:3000/api"
-    device_id = "ESP32_002"
+from transporte_http import resumo_conexoes, transporte_padrao
+
+def testar_api(api_url="http://localhost:3000/api", device_id="ESP32_002", verbosidade=2, metricas=None,
+               cache=None, transporte=None):
+    """Teste rápido da API
+    
+    `verbosidade`: 0 = silencioso, 1 = só erros e resultado, 2 = passo a passo.
+    Com `metricas` (metricas.RegistroMetricas) cada requisição é medida por endpoint.
+    Com `cache` (cache_status.CacheStatus) os GETs de status/estatísticas passam pelo
+    cache; os POSTs em /control invalidam o status, então as leituras seguem corretas.
+    Todas as etapas usam o pool de `transporte` (padrão: transporte_http.transporte_padrao()),
+    então só a primeira paga o handshake TCP/TLS.
+    """
+    def log(nivel, mensagem):
+        if verbosidade >= nivel:
+            print(mensagem)
+    
+    transporte = transporte or transporte_padrao()
+    sessao = transporte.sessao()
+    if metricas is not None:
+        metricas.instrumentar_sessao(sessao)
+    if cache is not None:
+        cache.instalar(sessao)
     
-    print("🚀 TESTE RÁPIDO - SIMULADOR ESP32")
-    print("=" * 50)
-    print(f"API: {api_url}")
-    print(f"Device: {device_id}")
-    print()
+    log(2, "🚀 TESTE RÁPIDO - SIMULADOR ESP32")
+    log(2, "=" * 50)
+    log(2, f"API: {api_url}")
+    log(2, f"Device: {device_id}")
+    log(2, "")
     
     # Verificar se API está rodando
     try:
-        health = requests.get("http://localhost:3000/health", timeout=5)
+        health = sessao.get(f"{api_url.rsplit('/api', 1)[0]}/health", timeout=5)
         if health.status_code == 200:
-            print("✅ API está funcionando")
+            log(2, "✅ API está funcionando")
         else:
-            print("❌ API não está respondendo corretamente")
+            log(1, "❌ API não está respondendo corretamente")
             return
     except:
-        print("❌ Não foi possível conectar à API")
-        print("   Execute: cd api && npm run dev")
+        log(1, "❌ Não foi possível conectar à API")
+        log(1, "   Execute: cd api && npm run dev")
         return
     
     # 1. Enviar dados dos sensores
-    print("\n📊 Enviando dados dos sensores...")
+    log(2, "\n📊 Enviando dados dos sensores...")
     dados = {
         "umidade_solo": random.randint(30, 80),
         "timestamp": int(time.time() * 1000),
@@ -44,32 +62,32 @@ def testar_api():
     }
     
     try:
-        response = requests.post(f"{api_url}/sensors", json=dados)
+        response = sessao.post(f"{api_url}/sensors", json=dados)
         if response.status_code == 201:
-            print(f"✅ Dados enviados: {dados['umidade_solo']}%")
+            log(2, f"✅ Dados enviados: {dados['umidade_solo']}%")
         else:
-            print(f"❌ Erro ao enviar dados: {response.status_code}")
+            log(1, f"❌ Erro ao enviar dados: {response.status_code}")
     except Exception as e:
-        print(f"❌ Erro: {e}")
+        log(1, f"❌ Erro: {e}")
     
     # 2. Verificar status da bomba
-    print("\n🚰 Verificando status da bomba...")
+    log(2, "\n🚰 Verificando status da bomba...")
     try:
-        response = requests.get(f"{api_url}/pump/{device_id}/status")
+        response = sessao.get(f"{api_url}/pump/{device_id}/status")
         if response.status_code == 200:
             status = response.json()['data']
             pump_status = "🟢 ATIVA" if status['is_active'] else "🔴 INATIVA"
-            print(f"✅ Status da bomba: {pump_status}")
-            print(f"   Total de ativações: {status['total_activations']}")
+            log(2, f"✅ Status da bomba: {pump_status}")
+            log(2, f"   Total de ativações: {status['total_activations']}")
         else:
-            print(f"❌ Erro ao verificar status: {response.status_code}")
+            log(1, f"❌ Erro ao verificar status: {response.status_code}")
     except Exception as e:
-        print(f"❌ Erro: {e}")
+        log(1, f"❌ Erro: {e}")
     
     # 3. Ativar bomba
-    print("\n🚰 Ativando bomba...")
+    log(2, "\n🚰 Ativando bomba...")
     try:
-        response = requests.post(
+        response = sessao.post(
             f"{api_url}/pump/{device_id}/control",
             json={
                 "action": "activate",
@@ -78,35 +96,35 @@ def testar_api():
             }
         )
         if response.status_code == 200:
-            print("✅ Bomba ativada com sucesso")
+            log(2, "✅ Bomba ativada com sucesso")
         else:
-            print(f"❌ Erro ao ativar bomba: {response.status_code}")
+            log(1, f"❌ Erro ao ativar bomba: {response.status_code}")
     except Exception as e:
-        print(f"❌ Erro: {e}")
+        log(1, f"❌ Erro: {e}")
     
     # Aguardar 3 segundos
-    print("\n⏳ Aguardando 3 segundos...")
+    log(2, "\n⏳ Aguardando 3 segundos...")
     time.sleep(3)
     
     # 4. Verificar status novamente
-    print("\n🚰 Verificando status após ativação...")
+    log(2, "\n🚰 Verificando status após ativação...")
     try:
-        response = requests.get(f"{api_url}/pump/{device_id}/status")
+        response = sessao.get(f"{api_url}/pump/{device_id}/status")
         if response.status_code == 200:
             status = response.json()['data']
             pump_status = "🟢 ATIVA" if status['is_active'] else "🔴 INATIVA"
-            print(f"✅ Status da bomba: {pump_status}")
+            log(2, f"✅ Status da bomba: {pump_status}")
             if status['is_active']:
-                print(f"   Duração atual: {status['duration_seconds']}s")
+                log(2, f"   Duração atual: {status['duration_seconds']}s")
         else:
-            print(f"❌ Erro ao verificar status: {response.status_code}")
+            log(1, f"❌ Erro ao verificar status: {response.status_code}")
     except Exception as e:
-        print(f"❌ Erro: {e}")
+        log(1, f"❌ Erro: {e}")
     
     # 5. Desativar bomba
-    print("\n🚰 Desativando bomba...")
+    log(2, "\n🚰 Desativando bomba...")
     try:
-        response = requests.post(
+        response = sessao.post(
             f"{api_url}/pump/{device_id}/control",
             json={
                 "action": "deactivate",
@@ -115,30 +133,31 @@ def testar_api():
             }
         )
         if response.status_code == 200:
-            print("✅ Bomba desativada com sucesso")
+            log(2, "✅ Bomba desativada com sucesso")
         else:
-            print(f"❌ Erro ao desativar bomba: {response.status_code}")
+            log(1, f"❌ Erro ao desativar bomba: {response.status_code}")
     except Exception as e:
-        print(f"❌ Erro: {e}")
+        log(1, f"❌ Erro: {e}")
     
     # 6. Buscar estatísticas
-    print("\n📈 Buscando estatísticas...")
+    log(2, "\n📈 Buscando estatísticas...")
     try:
-        response = requests.get(f"{api_url}/pump/{device_id}/stats")
+        response = sessao.get(f"{api_url}/pump/{device_id}/stats")
         if response.status_code == 200:
             stats = response.json()['data']['stats']
-            print(f"✅ Estatísticas da bomba:")
-            print(f"   Total de ativações: {stats['total_activations']}")
-            print(f"   Duração total: {stats['total_duration_seconds']}s")
-            print(f"   Duração média: {stats['avg_duration_seconds']}s")
+            log(2, f"✅ Estatísticas da bomba:")
+            log(2, f"   Total de ativações: {stats['total_activations']}")
+            log(2, f"   Duração total: {stats['total_duration_seconds']}s")
+            log(2, f"   Duração média: {stats['avg_duration_seconds']}s")
         else:
-            print(f"❌ Erro ao buscar estatísticas: {response.status_code}")
+            log(1, f"❌ Erro ao buscar estatísticas: {response.status_code}")
     except Exception as e:
-        print(f"❌ Erro: {e}")
+        log(1, f"❌ Erro: {e}")
     
-    print("\n" + "=" * 50)
-    print("✅ TESTE CONCLUÍDO!")
-    print("=" * 50)
+    log(1, "\n" + "=" * 50)
+    log(1, "✅ TESTE CONCLUÍDO!")
+    log(1, resumo_conexoes(transporte.estatisticas()))
+    log(1, "=" * 50)
 
 if __name__ == "__main__":
     testar_api() 
\ No newline at end of file
@@ -0,0 +1,479 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Transporte HTTP compartilhado pelos scripts
+Pool de conexões por host com keep-alive e cache de DNS, instalado nas
+sessões de todos os scripts para que elas reaproveitem as mesmas conexões.
+Conta quantas requisições reutilizaram uma conexão aberta e quantas pagaram
+um handshake TCP/TLS novo, e quanto ele custou. HTTP/2 (várias requisições
+multiplexadas numa conexão) é opcional: usa httpx quando instalado
+(pip install "httpx[http2]"), senão fica no HTTP/1.1 com keep-alive.
+
+    from transporte_http import transporte_padrao
+
+    sessao = transporte_padrao().sessao()
+    sessao.get("https://api-regador.vercel.app/api/sensors")
+    print(transporte_padrao().estatisticas())
+"""
+
+import argparse
+import socket
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NameResolutionError
+from urllib3.poolmanager import PoolManager
+from urllib3.util.connection import allowed_gai_family
+
+from histograma import HistogramaLatencia
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+TAMANHO_POOL_PADRAO = 10
+TTL_DNS_PADRAO = 300.0
+EXPIRACAO_OCIOSA_PADRAO = 60.0
+
+# SO_KEEPALIVE mantém vivas (atrás de NAT) as conexões paradas no pool
+OPCOES_SOCKET = HTTPConnection.default_socket_options + [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+
+# Cabeçalhos de conexão do HTTP/1.1, proibidos no HTTP/2
+CABECALHOS_CONEXAO = ("connection", "keep-alive", "proxy-connection", "transfer-encoding", "upgrade")
+
+class CacheDNS:
+    """getaddrinfo com TTL: conexões novas para o mesmo host não repetem a consulta"""
+
+    def __init__(self, ttl=TTL_DNS_PADRAO, relogio=time.monotonic):
+        self.ttl = ttl
+        self.relogio = relogio
+        self.consultas = 0
+        self.acertos = 0
+        self._enderecos = {}
+        self._lock = threading.Lock()
+
+    def resolver(self, host, porta):
+        """IPs do host, na ordem do resolvedor (o DNS só é consultado quando o TTL vence)"""
+        agora = self.relogio()
+        with self._lock:
+            entrada = self._enderecos.get((host, porta))
+            if entrada is not None and entrada[0] > agora:
+                self.acertos += 1
+                return entrada[1]
+        infos = socket.getaddrinfo(host, porta, allowed_gai_family(), socket.SOCK_STREAM)
+        enderecos = list(dict.fromkeys(info[4][0] for info in infos))
+        with self._lock:
+            self.consultas += 1
+            if self.ttl > 0:
+                self._enderecos[(host, porta)] = (agora + self.ttl, enderecos)
+        return enderecos
+
+    def invalidar(self, host, porta):
+        with self._lock:
+            self._enderecos.pop((host, porta), None)
+
+    def contar(self, acerto):
+        """Registra uma consulta feita fora daqui (cache de DNS do aiohttp)"""
+        with self._lock:
+            if acerto:
+                self.acertos += 1
+            else:
+                self.consultas += 1
+
+    def resumo(self):
+        with self._lock:
+            return {"consultas": self.consultas, "acertos": self.acertos, "hosts": len(self._enderecos)}
+
+class _ConexaoMedida:
+    """Resolve pelo CacheDNS e mede cada conexão nova: TCP e handshake completo (TCP + TLS)"""
+
+    def __init__(self, *args, transporte=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.transporte = transporte
+        self._tcp_segundos = None
+
+    def _new_conn(self):
+        inicio = time.perf_counter()
+        if self.transporte is None:
+            sock = super()._new_conn()
+        else:
+            host = self._dns_host
+            try:
+                enderecos = self.transporte.dns.resolver(host, self.port)
+            except socket.gaierror as e:
+                raise NameResolutionError(self.host, self, e) from e
+            # Como create_connection: tenta os endereços em ordem; a mensagem de
+            # erro continua citando o nome do host, não o IP
+            sock = erro = None
+            for endereco in enderecos:
+                self._dns_host = endereco
+                try:
+                    sock = super()._new_conn()
+                    break
+                except ConnectTimeoutError as e:
+                    erro = e
+                finally:
+                    self._dns_host = host
+            if sock is None:
+                self.transporte.dns.invalidar(host, self.port)
+                raise erro
+        self._tcp_segundos = time.perf_counter() - inicio
+        return sock
+
+    def connect(self):
+        inicio = time.perf_counter()
+        super().connect()
+        if self.transporte is not None:
+            self.transporte._registrar_conexao(self.host, time.perf_counter() - inicio, self._tcp_segundos)
+
+class ConexaoHTTP(_ConexaoMedida, HTTPConnection):
+    pass
+
+class ConexaoHTTPS(_ConexaoMedida, HTTPSConnection):
+    pass
+
+class _PoolHTTP(HTTPConnectionPool):
+    ConnectionCls = ConexaoHTTP
+
+class _PoolHTTPS(HTTPSConnectionPool):
+    ConnectionCls = ConexaoHTTPS
+
+class _GerenciadorPools(PoolManager):
+    """PoolManager com o tamanho do pool definido por host"""
+
+    def __init__(self, transporte, **kwargs):
+        super().__init__(**kwargs)
+        self.transporte = transporte
+        self.pool_classes_by_scheme = {"http": _PoolHTTP, "https": _PoolHTTPS}
+
+    def _new_pool(self, scheme, host, port, request_context=None):
+        contexto = dict(self.connection_pool_kw if request_context is None else request_context)
+        contexto["maxsize"] = self.transporte.tamanho_pool_host(host)
+        # Vai para conn_kw do pool e daí para cada conexão criada
+        contexto["transporte"] = self.transporte
+        return super()._new_pool(scheme, host, port, contexto)
+
+class AdaptadorPool(HTTPAdapter):
+    """HTTPAdapter do transporte, montado em várias sessões ao mesmo tempo"""
+
+    def __init__(self, transporte, **kwargs):
+        self.transporte = transporte
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        self._pool_connections = connections
+        self._pool_maxsize = maxsize
+        self._pool_block = block
+        pool_kwargs.setdefault("socket_options", OPCOES_SOCKET)
+        self.poolmanager = _GerenciadorPools(self.transporte, num_pools=connections, maxsize=maxsize,
+                                             block=block, **pool_kwargs)
+
+    def send(self, request, **kwargs):
+        self.transporte._registrar_requisicao(urlsplit(request.url).hostname)
+        return super().send(request, **kwargs)
+
+    def close(self):
+        # Session.close() fecha os adaptadores montados; o pool é de todas as
+        # sessões e só fecha em TransporteHTTP.fechar()
+        pass
+
+    def fechar(self):
+        super().close()
+
+def _timeout_httpx(timeout):
+    """Timeout no formato do requests (número ou (conexão, leitura)) para o httpx"""
+    if isinstance(timeout, tuple):
+        conexao, leitura = timeout
+        return httpx.Timeout(leitura, connect=conexao)
+    return httpx.Timeout(timeout)
+
+class AdaptadorHTTP2(BaseAdapter):
+    """Envia pelo httpx em HTTP/2: requisições simultâneas ao mesmo host dividem uma conexão TLS
+
+    Cai para HTTP/1.1 sozinho quando o servidor não negocia h2 (ALPN).
+    Cookies e `verify`/`cert` por requisição não são repassados.
+    """
+
+    def __init__(self, transporte):
+        super().__init__()
+        self.transporte = transporte
+        limites = httpx.Limits(max_connections=transporte.num_hosts * transporte.tamanho_pool,
+                               max_keepalive_connections=transporte.num_hosts * transporte.tamanho_pool,
+                               keepalive_expiry=transporte.expiracao_ociosa)
+        # Sem o pacote h2 o httpx levanta ImportError aqui
+        self.cliente = httpx.Client(http2=True, limits=limites)
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        partes = urlsplit(request.url)
+        fim_handshake = "connection.start_tls.complete" if partes.scheme == "https" else \
+            "connection.connect_tcp.complete"
+        marcas = {}
+
+        def trace(evento, info):
+            marcas[evento] = time.perf_counter()
+            if evento == fim_handshake:
+                inicio = marcas.get("connection.connect_tcp.started", marcas[evento])
+                tcp = marcas.get("connection.connect_tcp.complete", marcas[evento]) - inicio
+                self.transporte._registrar_conexao(partes.hostname, marcas[evento] - inicio, tcp)
+
+        self.transporte._registrar_requisicao(partes.hostname)
+        cabecalhos = {k: v for k, v in request.headers.items() if k.lower() not in CABECALHOS_CONEXAO}
+        try:
+            resposta = self.cliente.request(request.method, request.url, headers=cabecalhos, content=request.body,
+                                            timeout=_timeout_httpx(timeout), extensions={"trace": trace})
+        except httpx.TimeoutException as e:
+            raise requests.exceptions.Timeout(e, request=request)
+        except httpx.TransportError as e:
+            raise requests.exceptions.ConnectionError(e, request=request)
+
+        response = requests.Response()
+        response.status_code = resposta.status_code
+        response.headers = CaseInsensitiveDict(resposta.headers.items())
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.reason = resposta.reason_phrase
+        response._content = resposta.content
+        response.url = request.url
+        response.request = request
+        response.elapsed = resposta.elapsed
+        return response
+
+    def close(self):
+        pass
+
+    def fechar(self):
+        self.cliente.close()
+
+class TransporteHTTP:
+    """Pool de conexões compartilhado, com keep-alive, cache de DNS e estatísticas de reuso
+
+    `tamanho_pool` é o máximo de conexões mantidas abertas por host e
+    `tamanhos_por_host` ajusta hosts específicos ({"api-regador.vercel.app": 32}).
+    `keep_alive=False` manda "Connection: close" (uma conexão por requisição,
+    útil para medir o custo do handshake). Instale o transporte antes de
+    métricas, cache ou gravação: `instalar` substitui os adaptadores da sessão.
+    """
+
+    def __init__(self, tamanho_pool=TAMANHO_POOL_PADRAO, tamanhos_por_host=None, num_hosts=10, keep_alive=True,
+                 http2=False, ttl_dns=TTL_DNS_PADRAO, expiracao_ociosa=EXPIRACAO_OCIOSA_PADRAO, metricas=None):
+        self.tamanho_pool = tamanho_pool
+        self.tamanhos_por_host = dict(tamanhos_por_host or {})
+        self.num_hosts = num_hosts
+        self.keep_alive = keep_alive
+        self.expiracao_ociosa = expiracao_ociosa
+        self.metricas = metricas
+        self.dns = CacheDNS(ttl_dns)
+        self.handshakes = HistogramaLatencia()
+        self.conexoes_tcp = HistogramaLatencia()
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+        self.adaptador = AdaptadorPool(self, pool_connections=num_hosts, pool_maxsize=tamanho_pool)
+        self.adaptador_http2 = None
+        if http2:
+            try:
+                if httpx is None:
+                    raise ImportError("httpx")
+                self.adaptador_http2 = AdaptadorHTTP2(self)
+            except ImportError:
+                print('⚠️  HTTP/2 indisponível (pip install "httpx[http2]"); usando HTTP/1.1 com keep-alive')
+        self.http2 = self.adaptador_http2 is not None
+
+    def tamanho_pool_host(self, host):
+        return self.tamanhos_por_host.get(host, self.tamanho_pool)
+
+    def instalar(self, sessao):
+        """Monta o pool do transporte numa requests.Session (ou SessaoResiliente)"""
+        sessao.mount("http://", self.adaptador)
+        sessao.mount("https://", self.adaptador_http2 or self.adaptador)
+        if not self.keep_alive:
+            sessao.headers["Connection"] = "close"
+        return sessao
+
+    def sessao(self, classe=requests.Session, **kwargs):
+        """Nova sessão (`classe(**kwargs)`) já usando o pool do transporte"""
+        return self.instalar(classe(**kwargs))
+
+    def conector_aiohttp(self, limite=100, host=None):
+        """TCPConnector do aiohttp com o mesmo keep-alive e TTL de DNS (o aiohttp não fala HTTP/2)"""
+        import aiohttp
+
+        conexao = {"keepalive_timeout": self.expiracao_ociosa} if self.keep_alive else {"force_close": True}
+        return aiohttp.TCPConnector(limit=limite, limit_per_host=self.tamanhos_por_host.get(host, 0),
+                                    use_dns_cache=self.dns.ttl > 0, ttl_dns_cache=self.dns.ttl or None,
+                                    **conexao)
+
+    def trace_aiohttp(self):
+        """TraceConfig que alimenta as estatísticas do transporte a partir de uma aiohttp.ClientSession"""
+        import aiohttp
+
+        async def inicio_requisicao(sessao, contexto, params):
+            contexto.host = params.url.host
+            self._registrar_requisicao(contexto.host)
+
+        async def inicio_conexao(sessao, contexto, params):
+            contexto.inicio_conexao = time.perf_counter()
+
+        async def fim_conexao(sessao, contexto, params):
+            self._registrar_conexao(getattr(contexto, "host", None), time.perf_counter() - contexto.inicio_conexao)
+
+        async def acerto_dns(sessao, contexto, params):
+            self.dns.contar(True)
+
+        async def falta_dns(sessao, contexto, params):
+            self.dns.contar(False)
+
+        config = aiohttp.TraceConfig()
+        config.on_request_start.append(inicio_requisicao)
+        config.on_connection_create_start.append(inicio_conexao)
+        config.on_connection_create_end.append(fim_conexao)
+        config.on_dns_cache_hit.append(acerto_dns)
+        config.on_dns_cache_miss.append(falta_dns)
+        return config
+
+    def _contadores_host(self, host):
+        contadores = self._hosts.get(host)
+        if contadores is None:
+            contadores = self._hosts[host] = {"requisicoes": 0, "conexoes_novas": 0}
+        return contadores
+
+    def _registrar_requisicao(self, host):
+        host = host or ""
+        with self._lock:
+            self._contadores_host(host)["requisicoes"] += 1
+        if self.metricas is not None:
+            self.metricas.incrementar("http_requisicoes_total", host=host)
+
+    def _registrar_conexao(self, host, handshake_segundos, tcp_segundos=None):
+        host = host or ""
+        with self._lock:
+            self._contadores_host(host)["conexoes_novas"] += 1
+            self.handshakes.registrar(handshake_segundos)
+            if tcp_segundos is not None:
+                self.conexoes_tcp.registrar(tcp_segundos)
+        if self.metricas is not None:
+            self.metricas.incrementar("http_conexoes_novas_total", host=host)
+            self.metricas.observar("http_handshake_segundos", handshake_segundos, host=host)
+
+    def estatisticas(self):
+        """Reuso de conexões (total e por host), tempo de handshake e cache de DNS
+
+        Uma requisição que não abriu conexão reaproveitou uma do pool; com
+        HTTP/2 isso inclui as que foram multiplexadas na mesma conexão.
+        """
+        with self._lock:
+            por_host = {
+                host: {**c, "reutilizadas": max(0, c["requisicoes"] - c["conexoes_novas"]),
+                       "tamanho_pool": self.tamanho_pool_host(host)}
+                for host, c in self._hosts.items()
+            }
+            handshake = self.handshakes.resumo()
+            tcp = self.conexoes_tcp.resumo()
+        requisicoes = sum(c["requisicoes"] for c in por_host.values())
+        novas = sum(c["conexoes_novas"] for c in por_host.values())
+        reutilizadas = max(0, requisicoes - novas)
+        return {
+            "requisicoes": requisicoes,
+            "conexoes_novas": novas,
+            "reutilizadas": reutilizadas,
+            "taxa_reuso": reutilizadas / requisicoes if requisicoes else 0.0,
+            "handshake": handshake,
+            "tcp": tcp,
+            "dns": self.dns.resumo(),
+            "http2": self.http2,
+            "keep_alive": self.keep_alive,
+            "por_host": por_host,
+        }
+
+    def fechar(self):
+        """Fecha as conexões abertas de todas as sessões que usam o transporte"""
+        self.adaptador.fechar()
+        if self.adaptador_http2 is not None:
+            self.adaptador_http2.fechar()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+_padrao = None
+_lock_padrao = threading.Lock()
+
+def transporte_padrao():
+    """Transporte único do processo: as sessões de todos os scripts dividem o mesmo pool"""
+    global _padrao
+    with _lock_padrao:
+        if _padrao is None:
+            _padrao = TransporteHTTP()
+        return _padrao
+
+def resumo_conexoes(estatisticas):
+    """Uma linha com reuso e handshake, para o fim dos relatórios"""
+    linha = (f"🔌 Conexões: {estatisticas['conexoes_novas']} novas, {estatisticas['reutilizadas']} reutilizadas "
+             f"({estatisticas['taxa_reuso']:.0%} de reuso)")
+    if estatisticas["handshake"]["contagem"]:
+        linha += f", handshake p50 {estatisticas['handshake']['p50_ms']:.1f} ms"
+    return linha
+
+def imprimir_estatisticas(estatisticas):
+    print(resumo_conexoes(estatisticas))
+    handshake, tcp, dns = estatisticas["handshake"], estatisticas["tcp"], estatisticas["dns"]
+    if handshake["contagem"]:
+        print(f"   Handshake p50/p90/max: {handshake['p50_ms']:.1f}/{handshake['p90_ms']:.1f}/"
+              f"{handshake['max_ms']:.1f} ms (TCP p50 {tcp['p50_ms']:.1f} ms)")
+    print(f"   DNS: {dns['consultas']} consultas, {dns['acertos']} no cache | "
+          f"HTTP/2: {'sim' if estatisticas['http2'] else 'não'}")
+    for host, dados in estatisticas["por_host"].items():
+        print(f"   {host}: {dados['requisicoes']} req, {dados['conexoes_novas']} conexões "
+              f"(pool {dados['tamanho_pool']})")
+
+def comparar_keep_alive(url, requisicoes=20, http2=False, timeout=10):
+    """GETs sequenciais com e sem keep-alive: quanto da latência é handshake"""
+    resultados = {}
+    for keep_alive in (False, True):
+        with TransporteHTTP(keep_alive=keep_alive, http2=http2 and keep_alive) as transporte:
+            sessao = transporte.sessao()
+            latencias = HistogramaLatencia()
+            for _ in range(requisicoes):
+                inicio = time.perf_counter()
+                try:
+                    sessao.get(url, timeout=timeout)
+                except requests.exceptions.RequestException as e:
+                    print(f"❌ {type(e).__name__}: {e}")
+                    break
+                latencias.registrar(time.perf_counter() - inicio)
+            resultados["keep_alive" if keep_alive else "sem_keep_alive"] = {
+                "latencia": latencias.resumo(), "transporte": transporte.estatisticas()}
+    return resultados
+
+def main():
+    parser = argparse.ArgumentParser(description="Mede o ganho do keep-alive (e do HTTP/2) contra a API")
+    parser.add_argument("--url", default="https://api-regador.vercel.app/api/sensors")
+    parser.add_argument("--requisicoes", type=int, default=20)
+    parser.add_argument("--http2", action="store_true", help="Usa HTTP/2 na rodada com keep-alive (requer httpx[http2])")
+    args = parser.parse_args()
+
+    print("🔌 TRANSPORTE HTTP - KEEP-ALIVE x CONEXÃO NOVA")
+    print("=" * 60)
+    print(f"URL: {args.url} | {args.requisicoes} requisições por rodada\n")
+    resultados = comparar_keep_alive(args.url, args.requisicoes, args.http2)
+    for nome, dados in resultados.items():
+        latencia = dados["latencia"]
+        print(f"📡 {nome}: p50 {latencia['p50_ms']:.1f} ms | média {latencia['media_ms']:.1f} ms")
+        imprimir_estatisticas(dados["transporte"])
+        print()
+    if len(resultados) == 2 and resultados["keep_alive"]["latencia"]["contagem"]:
+        sem, com = resultados["sem_keep_alive"]["latencia"], resultados["keep_alive"]["latencia"]
+        if com["media_ms"]:
+            print(f"🚀 Keep-alive: {sem['media_ms'] / com['media_ms']:.1f}x menos latência média por requisição")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Sessão HTTP resiliente para o simulador
+Timeouts explícitos, novas tentativas com backoff exponencial e jitter,
+disjuntor (circuit breaker) por endpoint e fila offline limitada que é
+drenada quando a API volta a responder
+
+O envio de leituras (POST) grava uma linha no servidor, então só é repetido
+ou enfileirado quando certamente não foi processado: falha ao conectar ou
+429/503 com Retry-After. Depois de um timeout de leitura o servidor pode já
+ter gravado a leitura, e reenviar criaria uma duplicata.
+"""
+
+import random
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+import requests
+from urllib3.exceptions import NewConnectionError
+
+# Status que indicam sobrecarga/indisponibilidade temporária
+STATUS_REPETIVEIS = (429, 502, 503, 504)
+METODOS_IDEMPOTENTES = ("GET", "HEAD", "OPTIONS")
+# Recusas explícitas: com Retry-After o servidor não processou a requisição
+STATUS_RECUSA = (429, 503)
+
+FECHADO = "fechado"
+ABERTO = "aberto"
+MEIO_ABERTO = "meio_aberto"
+
+class CircuitoAberto(requests.exceptions.ConnectionError):
+    """Requisição recusada localmente porque o disjuntor do endpoint está aberto"""
+
+class Disjuntor:
+    """Abre após `limite_falhas` falhas seguidas; após `tempo_abertura` libera uma tentativa"""
+
+    def __init__(self, limite_falhas=5, tempo_abertura=30.0, relogio=time.monotonic):
+        self.limite_falhas = limite_falhas
+        self.tempo_abertura = tempo_abertura
+        self.relogio = relogio
+        self.estado = FECHADO
+        self.falhas = 0
+        self.aberto_em = None
+        self.aberturas = 0
+
+    def permitir(self):
+        if self.estado == ABERTO and self.relogio() - self.aberto_em >= self.tempo_abertura:
+            self.estado = MEIO_ABERTO
+        return self.estado != ABERTO
+
+    def registrar_sucesso(self):
+        self.estado = FECHADO
+        self.falhas = 0
+
+    def registrar_falha(self):
+        self.falhas += 1
+        if self.estado == MEIO_ABERTO or self.falhas >= self.limite_falhas:
+            if self.estado != ABERTO:
+                self.aberturas += 1
+            self.estado = ABERTO
+            self.aberto_em = self.relogio()
+
+def chave_endpoint(metodo, url):
+    """Método + caminho com o device trocado por {id}, para agrupar os disjuntores"""
+    segmentos = [s for s in urlsplit(url).path.split("/") if s]
+    if "pump" in segmentos and segmentos.index("pump") + 1 < len(segmentos):
+        segmentos[segmentos.index("pump") + 1] = "{id}"
+    return f"{metodo.upper()} /" + "/".join(segmentos)
+
+def nao_processada(erro=None, response=None):
+    """True se a requisição certamente não chegou a ser processada pelo servidor
+
+    Vale para falhas antes do envio (DNS, conexão recusada, timeout de conexão,
+    disjuntor aberto) e para 429/503 com Retry-After.
+    """
+    if response is not None:
+        return response.status_code in STATUS_RECUSA and "Retry-After" in response.headers
+    if isinstance(erro, (requests.exceptions.ConnectTimeout, CircuitoAberto)):
+        return True
+    motivo = getattr(erro.args[0], "reason", None) if erro is not None and erro.args else None
+    return isinstance(motivo, NewConnectionError)
+
+class SessaoResiliente(requests.Session):
+    """requests.Session com timeout, retry com backoff, disjuntores e fila offline"""
+
+    def __init__(self, timeout=(3.05, 10), tentativas=3, backoff_base=0.5, backoff_max=10.0,
+                 limite_falhas=5, tempo_abertura=30.0, tamanho_fila=1000,
+                 caminhos_fila=("/sensors",), drenar_por_vez=50,
+                 relogio=time.monotonic, dormir=time.sleep, rng=random):
+        super().__init__()
+        self.timeout = timeout
+        self.tentativas = tentativas
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.limite_falhas = limite_falhas
+        self.tempo_abertura = tempo_abertura
+        self.caminhos_fila = caminhos_fila
+        self.drenar_por_vez = drenar_por_vez
+        self.relogio = relogio
+        self.dormir = dormir
+        self.rng = rng
+
+        self.disjuntores = {}
+        self.fila_offline = deque(maxlen=tamanho_fila)
+        # `incertas`: POSTs sem resposta que o servidor pode ter processado;
+        # não são repetidos nem enfileirados
+        self.contadores = {"repeticoes": 0, "falhas": 0, "recusadas": 0, "incertas": 0,
+                           "enfileiradas": 0, "drenadas": 0, "descartadas": 0}
+        # A fila só é drenada depois que a API voltou a responder
+        self._api_respondeu = False
+
+    def _disjuntor(self, chave):
+        disjuntor = self.disjuntores.get(chave)
+        if disjuntor is None:
+            disjuntor = self.disjuntores[chave] = Disjuntor(self.limite_falhas, self.tempo_abertura, self.relogio)
+        return disjuntor
+
+    def _caminho_api(self, url):
+        caminho = urlsplit(url).path.rstrip("/")
+        return next((c for c in self.caminhos_fila if caminho.endswith(c)), None)
+
+    def _repetivel(self, metodo, url):
+        """GETs são repetidos em qualquer falha; o envio de leituras, só se não foi processado"""
+        return metodo.upper() in METODOS_IDEMPOTENTES or self._caminho_api(url) is not None
+
+    def _espera(self, tentativa, response=None):
+        """Backoff exponencial com jitter completo, respeitando Retry-After"""
+        if response is not None:
+            try:
+                return min(self.backoff_max, float(response.headers.get("Retry-After")))
+            except (TypeError, ValueError):
+                pass
+        return self.rng.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** tentativa)))
+
+    def _enfileirar(self, metodo, url, kwargs):
+        if metodo.upper() == "POST" and self._caminho_api(url):
+            if len(self.fila_offline) == self.fila_offline.maxlen:
+                self.contadores["descartadas"] += 1
+            self.fila_offline.append((metodo, url, kwargs))
+            self.contadores["enfileiradas"] += 1
+
+    def drenar_fila(self):
+        """Reenvia até `drenar_por_vez` itens da fila offline; retorna quantos foram entregues
+
+        Não roda dentro de request(): quem usa a sessão chama entre as suas
+        requisições (o simulador, ao fim de cada ciclo), para o reenvio não
+        somar à latência de outra chamada. Só faz algo depois que a API voltou
+        a responder.
+        """
+        if not self._api_respondeu:
+            return 0
+        self._api_respondeu = False
+        drenadas = 0
+        for _ in range(min(self.drenar_por_vez, len(self.fila_offline))):
+            metodo, url, kwargs = self.fila_offline[0]
+            disjuntor = self._disjuntor(chave_endpoint(metodo, url))
+            # Itens de um endpoint com o disjuntor aberto esperam ele liberar
+            if not disjuntor.permitir():
+                break
+            try:
+                response = super().request(metodo, url, **kwargs)
+            except requests.exceptions.RequestException as e:
+                disjuntor.registrar_falha()
+                if not nao_processada(e):
+                    # Pode ter sido gravada: reenviar de novo duplicaria
+                    self.fila_offline.popleft()
+                    self.contadores["incertas"] += 1
+                break
+            if response.status_code >= 500 or response.status_code in STATUS_REPETIVEIS:
+                disjuntor.registrar_falha()
+                break
+            disjuntor.registrar_sucesso()
+            self.fila_offline.popleft()
+            self.contadores["drenadas"] += 1
+            drenadas += 1
+        return drenadas
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        chave = chave_endpoint(method, url)
+        disjuntor = self._disjuntor(chave)
+
+        if not disjuntor.permitir():
+            self.contadores["recusadas"] += 1
+            self._enfileirar(method, url, kwargs)
+            raise CircuitoAberto(f"Circuito aberto para {chave}")
+
+        tentativas = self.tentativas if self._repetivel(method, url) else 1
+        idempotente = method.upper() in METODOS_IDEMPOTENTES
+        erro = None
+        response = None
+        for tentativa in range(tentativas):
+            try:
+                response = super().request(method, url, **kwargs)
+                erro = None
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                erro = e
+                response = None
+            else:
+                if response.status_code not in STATUS_REPETIVEIS and response.status_code < 500:
+                    disjuntor.registrar_sucesso()
+                    if self.fila_offline:
+                        self._api_respondeu = True
+                    return response
+
+            self.contadores["falhas"] += 1
+            disjuntor.registrar_falha()
+            if not idempotente and not nao_processada(erro, response):
+                # Pode ter sido processada: nem repete nem enfileira
+                if erro is not None:
+                    self.contadores["incertas"] += 1
+                break
+            if tentativa + 1 >= tentativas or not disjuntor.permitir():
+                break
+            self.contadores["repeticoes"] += 1
+            self.dormir(self._espera(tentativa, response))
+
+        if idempotente or nao_processada(erro, response):
+            self._enfileirar(method, url, kwargs)
+        if erro is not None:
+            raise erro
+        return response
+
+    def estatisticas(self):
+        return {
+            **self.contadores,
+            "fila_offline": len(self.fila_offline),
+            "circuitos": {chave: d.estado for chave, d in self.disjuntores.items()},
+            "aberturas": sum(d.aberturas for d in self.disjuntores.values()),
+        }